@@ -0,0 +1,45 @@
+#!/usr/bin/python3
+"""Compare 10k updates saved one by one and inside a single batch.
+
+Usage (from the repository root):
+    python3 -m benchmarks.bench_batch [UPDATES] [OBJECTS]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from models.base_model import BaseModel
+from models.engine.log_storage import LogStorage
+from models.engine.sqlite_storage import SQLiteStorage
+
+UPDATES = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+OBJECTS = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+
+
+def run(storage, batched):
+    """Apply UPDATES attribute updates, each followed by a save."""
+    objs = BaseModel.create_many(OBJECTS)
+    for obj in objs:
+        storage.new(obj)
+    storage.save()
+    start = time.perf_counter()
+    if batched:
+        storage.begin()
+    for i in range(UPDATES):
+        objs[i % OBJECTS].number = i
+        storage.save()
+    if batched:
+        storage.commit()
+    return time.perf_counter() - start
+
+
+with tempfile.TemporaryDirectory() as tmp:
+    for label, make in (
+            ("LogStorage", lambda n: LogStorage(os.path.join(tmp, n))),
+            ("SQLiteStorage",
+             lambda n: SQLiteStorage(os.path.join(tmp, n + '.db')))):
+        plain = run(make('plain'), False)
+        batched = run(make('batched'), True)
+        print("{:<14} unbatched: {:7.3f}s  batched: {:7.3f}s  ({:.0f}x)"
+              .format(label, plain, batched, plain / batched))
@@ -0,0 +1,72 @@
+#!/usr/bin/python3
+"""Compare the size and reload time of JSON and binary LogStorage logs.
+
+The objects look like AirBnB places: foreign keys, a name, a few numbers
+and a list of amenity ids. Each log is reloaded once as a snapshot, then
+again after every object was updated three times: binary records are
+only decoded for the latest version of each object.
+
+Usage (from the repository root):
+    python3 -m benchmarks.bench_binary [N]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+
+from models.base_model import BaseModel
+from models.engine.codec import available
+from models.engine.log_storage import LogStorage
+
+N = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+
+class Place(BaseModel):
+    """A place."""
+
+
+rand = random.Random(0)
+cities = [str(uuid.uuid4()) for _ in range(100)]
+amenities = [str(uuid.uuid4()) for _ in range(20)]
+places = Place.create_many(N)
+for i, place in enumerate(places):
+    place.city_id = rand.choice(cities)
+    place.user_id = str(uuid.uuid4())
+    place.name = "Place {}".format(i)
+    place.number_rooms = rand.randint(1, 6)
+    place.price_by_night = rand.randint(20, 500)
+    place.latitude = rand.uniform(-90, 90)
+    place.amenity_ids = rand.sample(amenities, 3)
+
+with tempfile.TemporaryDirectory() as tmp:
+    setups = [('json/' + name, {'codec': name}) for name in available()]
+    setups.append(('binary', {'record_format': 'binary'}))
+    for label, options in setups:
+        path = os.path.join(tmp, label.replace('/', '-') + '.log')
+        storage = LogStorage(path, compact_min=float('inf'), **options)
+        for place in places:
+            storage.new(place)
+        start = time.perf_counter()
+        storage.save()
+        saving = time.perf_counter() - start
+        size = os.path.getsize(path)
+        storage.close()
+        start = time.perf_counter()
+        storage = LogStorage(path, compact_min=float('inf'), **options)
+        storage.reload()
+        loading = time.perf_counter() - start
+        for _ in range(3):
+            for place in storage.all().values():
+                place.price_by_night += 1
+            storage.save()
+        storage.close()
+        start = time.perf_counter()
+        storage = LogStorage(path, **options)
+        storage.reload()
+        updated = time.perf_counter() - start
+        storage.close()
+        print("{:<12} {:6.1f} MB  save {:6.3f}s  reload {:6.3f}s  "
+              "after updates {:6.3f}s".format(
+                  label, size / 1e6, saving, loading, updated))
@@ -0,0 +1,53 @@
+#!/usr/bin/python3
+"""Compare `all <class>` / `count <class>` by key prefix and by class index.
+
+Usage (from the repository root):
+    python3 -m benchmarks.bench_class_index [N]
+"""
+import sys
+import time
+
+from models.base_model import BaseModel
+from models.engine.log_storage import LogStorage
+
+N = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+
+
+class User(BaseModel):
+    """A user."""
+
+
+class City(BaseModel):
+    """A city."""
+
+
+class Place(BaseModel):
+    """A place."""
+
+
+class Review(BaseModel):
+    """A review."""
+
+
+storage = LogStorage('/dev/null')
+for cls, share in ((User, 0.3), (City, 0.01), (Place, 0.19), (Review, 0.5)):
+    for obj in cls.create_many(int(N * share)):
+        storage.new(obj)
+objects = storage.all()
+
+
+def timed(label, func, repeat=5):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    elapsed = (time.perf_counter() - start) / repeat
+    print("{:<28} {:10.6f}s  -> {}".format(label, elapsed, result))
+
+
+print("{:,} objects, {:,} City".format(len(objects), storage.count(City)))
+timed("count City (prefix scan):", lambda: sum(
+    1 for k in objects if k.startswith('City.')))
+timed("count City (index):", lambda: storage.count(City))
+timed("all City (prefix scan):", lambda: len(
+    {k: v for k, v in objects.items() if k.startswith('City.')}))
+timed("all City (index):", lambda: len(storage.all(City)))
@@ -0,0 +1,109 @@
+#!/usr/bin/python3
+"""Compare the installed JSON codecs on a mix of AirBnB objects.
+
+The mix holds users, states, cities, amenities, places and reviews in
+the proportions of a small listing site. Each codec encodes and decodes
+the `to_dict()` output of every object, then saves them to a LogStorage.
+
+Usage (from the repository root):
+    python3 -m benchmarks.bench_codec [N]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+from models.base_model import BaseModel
+from models.engine.codec import available, get_codec
+from models.engine.log_storage import LogStorage
+
+N = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+
+class User(BaseModel):
+    """A user."""
+
+
+class State(BaseModel):
+    """A state."""
+
+
+class City(BaseModel):
+    """A city."""
+
+
+class Amenity(BaseModel):
+    """An amenity."""
+
+
+class Place(BaseModel):
+    """A place."""
+
+
+class Review(BaseModel):
+    """A review."""
+
+
+def mix(n):
+    """Return about `n` objects with realistic attributes."""
+    rand = random.Random(0)
+    states = State.create_many(max(1, n // 200))
+    for i, state in enumerate(states):
+        state.name = "State {}".format(i)
+    cities = City.create_many(max(1, n // 40))
+    for i, city in enumerate(cities):
+        city.state_id = rand.choice(states).id
+        city.name = "City {}".format(i)
+    amenities = Amenity.create_many(50)
+    for i, amenity in enumerate(amenities):
+        amenity.name = "Amenity {}".format(i)
+    users = User.create_many(n // 4)
+    for i, user in enumerate(users):
+        user.email = "user{}@example.com".format(i)
+        user.password = "{:032x}".format(rand.getrandbits(128))
+        user.first_name = "First{}".format(i)
+        user.last_name = "Last{}".format(i)
+    places = Place.create_many(n // 4)
+    for i, place in enumerate(places):
+        place.city_id = rand.choice(cities).id
+        place.user_id = rand.choice(users).id
+        place.name = "Place {}".format(i)
+        place.description = "A quiet place near the center. " * 4
+        place.number_rooms = rand.randint(1, 6)
+        place.number_bathrooms = rand.randint(1, 3)
+        place.max_guest = rand.randint(1, 12)
+        place.price_by_night = rand.randint(20, 500)
+        place.latitude = rand.uniform(-90, 90)
+        place.longitude = rand.uniform(-180, 180)
+        place.amenity_ids = [a.id for a in rand.sample(amenities, 5)]
+    reviews = Review.create_many(n - len(users) - len(places))
+    for review in reviews:
+        review.place_id = rand.choice(places).id
+        review.user_id = rand.choice(users).id
+        review.text = "Great stay, would come back. " * 3
+    return states + cities + amenities + users + places + reviews
+
+
+objs = mix(N)
+dicts = [obj.to_dict() for obj in objs]
+print("{} objects".format(len(objs)))
+with tempfile.TemporaryDirectory() as tmp:
+    for name in available():
+        codec = get_codec(name)
+        start = time.perf_counter()
+        encoded = [codec.encode(d) for d in dicts]
+        encoding = time.perf_counter() - start
+        start = time.perf_counter()
+        for data in encoded:
+            codec.decode(data)
+        decoding = time.perf_counter() - start
+        storage = LogStorage(os.path.join(tmp, name + '.log'), codec=name)
+        for obj in objs:
+            storage.new(obj)
+        start = time.perf_counter()
+        storage.save()
+        saving = time.perf_counter() - start
+        storage.close()
+        print("{:<7} encode {:7.3f}s  decode {:7.3f}s  save {:7.3f}s".format(
+            name, encoding, decoding, saving))
@@ -0,0 +1,85 @@
+#!/usr/bin/python3
+"""Compare reporting over model instances and over a ColumnStore.
+
+Places get a city, a price and a latitude. The report is the number of
+places, the mean price, the mean price by city and the highest latitude
+by city. Over the columns, it runs with NumPy when it is installed, and
+with the loops used without it.
+
+Usage (from the repository root):
+    python3 -m benchmarks.bench_columnar [N]
+"""
+import random
+import sys
+import time
+import tracemalloc
+import uuid
+from unittest import mock
+
+from models.base_model import BaseModel
+from models.engine import columnar
+from models.engine.columnar import ColumnStore
+
+N = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+
+
+class Place(BaseModel):
+    """A place."""
+
+
+def report_instances(places):
+    """Compute the report with one attribute read per instance."""
+    total = sum(p.price_by_night for p in places)
+    sums = {}
+    counts = {}
+    north = {}
+    for p in places:
+        sums[p.city_id] = sums.get(p.city_id, 0) + p.price_by_night
+        counts[p.city_id] = counts.get(p.city_id, 0) + 1
+        north[p.city_id] = max(north.get(p.city_id, p.latitude),
+                               p.latitude)
+    return (len(places), total / len(places),
+            {c: s / counts[c] for c, s in sums.items()}, north)
+
+
+def report_columns(store):
+    """Compute the report over the columns."""
+    return (store.count(Place), store.mean(Place, 'price_by_night'),
+            store.group_by(Place, 'city_id', 'price_by_night', 'mean'),
+            store.group_by(Place, 'city_id', 'latitude', 'max'))
+
+
+rand = random.Random(0)
+cities = [str(uuid.uuid4()) for _ in range(100)]
+
+tracemalloc.start()
+places = Place.create_many(N)
+for place in places:
+    place.city_id = rand.choice(cities)
+    place.price_by_night = rand.randint(20, 500)
+    place.latitude = rand.uniform(-90, 90)
+instances = tracemalloc.get_traced_memory()[0]
+tracemalloc.stop()
+
+tracemalloc.start()
+store = ColumnStore()
+store.extend(places)
+columns = tracemalloc.get_traced_memory()[0]
+tracemalloc.stop()
+
+start = time.perf_counter()
+expected = report_instances(places)
+by_instance = time.perf_counter() - start
+print("instances      {:7.1f} MB  report {:6.3f}s".format(
+    instances / 1e6, by_instance))
+for label, numpy in (("columns/numpy", columnar.numpy),
+                     ("columns/loops", None)):
+    if label == "columns/numpy" and numpy is None:
+        continue
+    with mock.patch.object(columnar, 'numpy', numpy):
+        start = time.perf_counter()
+        result = report_columns(store)
+        by_column = time.perf_counter() - start
+    assert result[0] == expected[0] and result[2:] == expected[2:]
+    print("{:14} {:7.1f} MB  report {:6.3f}s".format(
+        label, columns / 1e6, by_column))
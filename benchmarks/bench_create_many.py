@@ -0,0 +1,19 @@
+#!/usr/bin/python3
+"""Compare BaseModel.create_many() with a plain loop of BaseModel().
+
+Usage (from the repository root):
+    python3 -m benchmarks.bench_create_many
+"""
+import timeit
+
+from models.base_model import BaseModel
+
+N = 100000
+
+loop = min(timeit.repeat(lambda: [BaseModel() for _ in range(N)],
+                         number=1, repeat=3))
+bulk = min(timeit.repeat(lambda: BaseModel.create_many(N),
+                         number=1, repeat=3))
+print("BaseModel() loop:  {:.3f}s ({:,.0f} obj/s)".format(loop, N / loop))
+print("create_many():     {:.3f}s ({:,.0f} obj/s)".format(bulk, N / bulk))
+print("speedup:           {:.1f}x".format(loop / bulk))
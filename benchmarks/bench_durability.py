@@ -0,0 +1,58 @@
+#!/usr/bin/python3
+"""Measure LogStorage save throughput at each durability level.
+
+Every operation updates one object and saves. The operations run from
+one thread, then from THREADS threads, whose batch saves share fsyncs.
+A single thread's batch saves each wait for their own fsync, so 'batch'
+only beats 'save' with several writers.
+
+Usage (from the repository root):
+    python3 -m benchmarks.bench_durability [OPS] [THREADS]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from models.base_model import BaseModel
+from models.engine.log_storage import LogStorage
+
+OPS = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+THREADS = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+
+
+def run(storage, objs, threads):
+    """Return the seconds taken by OPS saves spread over `threads`."""
+    def work(n):
+        for i in range(OPS // threads):
+            objs[n].number = i
+            storage.save()
+    workers = [threading.Thread(target=work, args=(n,))
+               for n in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - start
+
+
+with tempfile.TemporaryDirectory() as tmp:
+    for level in ('none', 'batch', 'save'):
+        rates = []
+        for threads in (1, THREADS):
+            storage = LogStorage(
+                os.path.join(tmp, '{}-{}.log'.format(level, threads)),
+                durability=level)
+            objs = BaseModel.create_many(threads)
+            for obj in objs:
+                storage.new(obj)
+            storage.save()
+            elapsed = run(storage, objs, threads)
+            storage.close()
+            rates.append(OPS / elapsed)
+        print("{:<6} {:10,.0f} ops/s  {:10,.0f} ops/s with {} threads"
+              .format(level, rates[0], rates[1], THREADS))
+    print("batch shares fsyncs between concurrent saves only: one thread"
+          " syncs every save.")
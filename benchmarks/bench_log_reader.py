@@ -0,0 +1,47 @@
+#!/usr/bin/python3
+"""Compare looking up one object by replaying a log or through LogReader.
+
+The reader is timed twice: once building the offset index, once opening
+the index persisted by the first run.
+
+Usage (from the repository root):
+    python3 -m benchmarks.bench_log_reader [N]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from models.base_model import BaseModel
+from models.engine.log_reader import LogReader
+from models.engine.log_storage import LogStorage
+
+N = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+with tempfile.TemporaryDirectory() as tmp:
+    path = os.path.join(tmp, 'file.log')
+    storage = LogStorage(path)
+    objs = BaseModel.create_many(N, name="object", number=1)
+    for obj in objs:
+        storage.new(obj)
+    storage.save()
+    storage.close()
+    target = objs[N // 2].id
+
+    start = time.perf_counter()
+    storage = LogStorage(path)
+    storage.reload()
+    storage.get(BaseModel, target)
+    print("replay       {:8.3f}s".format(time.perf_counter() - start))
+
+    for label in ('index build', 'index reuse'):
+        start = time.perf_counter()
+        reader = LogReader(path)
+        reader.get(BaseModel, target)
+        print("{:<12} {:8.3f}s".format(label, time.perf_counter() - start))
+        reader.close()
+
+    start = time.perf_counter()
+    for obj in objs[:1000]:
+        reader.get(BaseModel, obj.id)
+    print("1000 gets    {:8.3f}s".format(time.perf_counter() - start))
@@ -0,0 +1,41 @@
+#!/usr/bin/python3
+"""Report the memory cost per instance of regular and compact models.
+
+Usage (from the repository root):
+    python3 -m benchmarks.bench_memory [N]
+"""
+import sys
+import tracemalloc
+
+from models.base_model import BaseModel, compact
+
+N = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+
+class Regular(BaseModel):
+    """A model keeping every attribute in __dict__."""
+
+
+@compact
+class Compact(BaseModel):
+    """A model keeping its core fields in slots."""
+
+
+def per_instance(cls, **extra):
+    """Return the bytes allocated per instance of `cls`."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objs = [cls(**extra) for _ in range(N)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objs
+    return (after - before) / N
+
+
+for label, extra in (("core fields only", {}),
+                     ("with ad-hoc attrs", {'name': 'x', 'number': 1})):
+    regular = per_instance(Regular, **extra)
+    small = per_instance(Compact, **extra)
+    print("{:<18} regular: {:6.0f} B  compact: {:6.0f} B  ({:+.0%})".format(
+        label, regular, small, small / regular - 1))
+    assert small < regular, "compact instances are not smaller"
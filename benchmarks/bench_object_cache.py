@@ -0,0 +1,37 @@
+#!/usr/bin/python3
+"""Measure repeated SQLiteStorage lookups of hot ids with and without the
+object cache.
+
+Usage (from the repository root):
+    python3 -m benchmarks.bench_object_cache [OPS]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from models.base_model import BaseModel
+from models.engine.sqlite_storage import SQLiteStorage
+
+OPS = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+with tempfile.TemporaryDirectory() as tmp:
+    path = os.path.join(tmp, 'file.db')
+    storage = SQLiteStorage(path)
+    objs = BaseModel.create_many(10000, name="object", number=1)
+    for obj in objs:
+        storage.new(obj)
+    storage.save()
+    storage.close()
+    hot = [obj.id for obj in objs[:100]]
+    del objs
+
+    for size in (0, 1024):
+        storage = SQLiteStorage(path, cache_size=size)
+        start = time.perf_counter()
+        for i in range(OPS):
+            storage.get(BaseModel, hot[i % 100]).number
+        elapsed = time.perf_counter() - start
+        print("cache_size={:<5} {:10,.0f} gets/s  hits={} misses={}".format(
+            size, OPS / elapsed, storage.cache.hits, storage.cache.misses))
+        storage.close()
@@ -0,0 +1,42 @@
+#!/usr/bin/python3
+"""Measure BaseModel(**d) reload throughput.
+
+Compares the memoized `fromisoformat` parser used by BaseModel with the
+previous `strptime` call, then times a full reload of N dicts.
+
+Usage (from the repository root):
+    python3 -m benchmarks.bench_reload [N]
+"""
+import datetime
+import sys
+import time
+
+from models.base_model import BaseModel, parse_datetime
+
+N = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+
+# Objects seeded with create_many() share one timestamp per batch.
+base = datetime.datetime(2024, 1, 1)
+dicts = []
+for i in range(N):
+    d = BaseModel().to_dict()
+    ts = (base + datetime.timedelta(microseconds=1 + i // 1000)).isoformat()
+    d['created_at'] = d['updated_at'] = ts
+    dicts.append(d)
+stamps = [d['created_at'] for d in dicts]
+
+
+def timed(label, func):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print("{:<22} {:.3f}s ({:,.0f}/s)".format(label, elapsed, N / elapsed))
+
+
+timed("strptime:", lambda: [
+    datetime.datetime.strptime(s, '%Y-%m-%dT%H:%M:%S.%f') for s in stamps])
+timed("fromisoformat:", lambda: [
+    datetime.datetime.fromisoformat(s) for s in stamps])
+parse_datetime.cache_clear()
+timed("parse_datetime:", lambda: [parse_datetime(s) for s in stamps])
+timed("BaseModel(**d) reload:", lambda: [BaseModel(**d) for d in dicts])
@@ -0,0 +1,72 @@
+#!/usr/bin/python3
+"""Compare query filters and aggregates with and without NumPy columns.
+
+Places get a price, a number of rooms and coordinates. Each query runs
+once over the objects one at a time, as without NumPy, then over the
+column cache: a first time, building the columns it uses, and again
+once they are cached.
+
+Usage (from the repository root):
+    python3 -m benchmarks.bench_vector_query [N]
+"""
+import random
+import sys
+import time
+from unittest import mock
+
+from models.base_model import BaseModel
+from models.engine import log_storage
+from models.engine.log_storage import LogStorage
+
+N = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+
+if log_storage.numpy is None:
+    sys.exit("NumPy is not installed")
+
+
+class Place(BaseModel):
+    """A place."""
+
+
+QUERIES = [
+    ("price < 100", lambda q: q.where('price_by_night', '<', 100).count()),
+    ("rooms in 2..3, lat > 0", lambda q: q
+     .where('number_rooms', 'in', [2, 3])
+     .where('latitude', '>', 0).count()),
+    ("box, mean price", lambda q: q
+     .where('latitude', '>=', -10).where('latitude', '<=', 10)
+     .where('longitude', '>=', 0).mean('price_by_night')),
+    ("rooms >= 4, ids", lambda q: len(q.where('number_rooms', '>=', 4)
+                                      .where('price_by_night', '<', 30)
+                                      .all())),
+]
+
+
+def timed(storage, query):
+    """Return the result of a query and the seconds it took."""
+    start = time.perf_counter()
+    result = query(storage.query(Place))
+    return result, time.perf_counter() - start
+
+
+rand = random.Random(0)
+storage = LogStorage('/dev/null', durability='none')
+for place in Place.create_many(N):
+    place.price_by_night = rand.randint(20, 500)
+    place.number_rooms = rand.randint(1, 6)
+    place.latitude = rand.uniform(-90, 90)
+    place.longitude = rand.uniform(-180, 180)
+    storage.new(place)
+storage.save()
+
+print("{:24} {:>9} {:>9} {:>9} {:>8}".format(
+    "query", "python", "build", "cached", "speedup"))
+for name, query in QUERIES:
+    with mock.patch.object(log_storage, 'numpy', None):
+        expected, python = timed(storage, query)
+    storage._columns.clear()
+    result, build = timed(storage, query)
+    again, cached = timed(storage, query)
+    assert abs(result - expected) < 1e-6 and result == again, name
+    print("{:24} {:8.3f}s {:8.3f}s {:8.4f}s {:7.0f}x".format(
+        name, python, build, cached, python / cached))
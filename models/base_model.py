@@ -14,12 +14,59 @@ Examples:
     >>> base.save()
     >>> base.updated_at > base.created_at
     True
-    >>> base_dict['created_at'] != base_dict['updated_at']
+    >>> base_dict['created_at'] == base_dict['updated_at']
     True
 """
 
+import os
 import uuid
 import datetime
+import weakref
+from functools import lru_cache
+
+from models import clock
+from models.binary import format_uuid as _format_uuid, pack, unpack
+
+# Bits forced by RFC 4122 on a random (version 4) UUID.
+_UUID4_MASK = ~((0xf000 << 64) | (0xc000 << 48)) & ((1 << 128) - 1)
+_UUID4_BITS = (0x4000 << 64) | (0x8000 << 48)
+
+_CORE_FIELDS = ('id', 'created_at', 'updated_at')
+
+
+@lru_cache(maxsize=1024)
+def parse_datetime(value):
+    """Parse a timestamp written by `datetime.isoformat`.
+
+    Both `YYYY-MM-DDTHH:MM:SS.ffffff` and the shorter form `isoformat`
+    emits when microseconds are zero are accepted. Results are memoized,
+    since reloaded objects often share the same timestamps.
+
+    Args:
+        value (str): The ISO 8601 timestamp.
+
+    Returns:
+        datetime: The parsed timestamp.
+
+    Raises:
+        ValueError: If `value` is not an ISO 8601 timestamp.
+
+    Examples:
+        >>> parse_datetime('2017-09-28T21:03:54.052298')
+        datetime.datetime(2017, 9, 28, 21, 3, 54, 52298)
+        >>> parse_datetime('2017-09-28T21:03:54')
+        datetime.datetime(2017, 9, 28, 21, 3, 54)
+    """
+    return datetime.datetime.fromisoformat(value)
+
+
+# Model classes by name, used to rebuild objects from their `__class__`.
+classes = {}
+
+# Storage engines notified of changes: `object_dirtied(obj)` when a clean
+# object gets its first write, `attribute_changed(obj, name)` when an
+# attribute listed in the model's `__indexes__` is set or deleted.
+watchers = weakref.WeakSet()
 
 
 class BaseModel:
@@ -31,43 +78,222 @@ class BaseModel:
         created_at (datetime): The timestamp when the instance was created.
         updated_at (datetime): The timestamp when the instance
             was last updated.
+        __indexes__ (tuple): Names of the attributes storage engines keep
+            secondary indexes on, for example ('email',).
     """
 
+    # _cache holds the last to_dict() result, _dirty the names of the
+    # attributes written since mark_clean() (True: all of them).
+    __slots__ = ('__dict__', '__weakref__', '_cache', '_dirty')
+
+    # Core fields stored in slots instead of __dict__, see `compact`.
+    _core_slots = ()
+
+    __indexes__ = ()
+
+    def __init_subclass__(cls, **kwargs):
+        """Register every model class under its name."""
+        super().__init_subclass__(**kwargs)
+        classes[cls.__name__] = cls
+
     def __init__(self, *args, **kwargs):
         """Initialize a new BaseModel instance, setting its ID and timestamps.
 
         If keyword arguments are provided, they are used to set the instance
         attributes. The 'created_at' and 'updated_at' attributes are parsed
-            from ISO format strings if provided.
+            from ISO format strings if provided. A fresh id and timestamps
+            are only generated for the ones missing from the kwargs.
 
         Args:
             *args: Variable length argument list.
             **kwargs: Keyword arguments that initialize instance attributes.
         """
-        self.id = str(uuid.uuid4())
-        self.created_at = datetime.datetime.utcnow()
-        self.updated_at = datetime.datetime.utcnow()
+        # A new instance is fully dirty and has no cache: there is nothing
+        # to track, so the attributes bypass __setattr__.
+        setter = object.__setattr__
+        setter(self, '_cache', None)
+        setter(self, '_dirty', True)
+        if 'id' not in kwargs:
+            setter(self, 'id', str(uuid.uuid4()))
+        if 'created_at' not in kwargs or 'updated_at' not in kwargs:
+            now = clock.now()
+            if 'created_at' not in kwargs:
+                setter(self, 'created_at', now)
+            if 'updated_at' not in kwargs:
+                setter(self, 'updated_at', now)
 
         if kwargs:
             for k, v in kwargs.items():
                 if k == '__class__':
                     continue
                 if k == 'created_at':
-                    setattr(self, 'created_at', datetime.datetime.
-                            strptime(v, '%Y-%m-%dT%H:%M:%S.%f'))
+                    setter(self, 'created_at', parse_datetime(v))
                 elif k == 'updated_at':
-                    setattr(self, 'updated_at', datetime.datetime.
-                            strptime(v, '%Y-%m-%dT%H:%M:%S.%f'))
+                    setter(self, 'updated_at', parse_datetime(v))
                 else:
-                    setattr(self, k, v)
+                    setter(self, k, v)
+
+    @classmethod
+    def create_many(cls, n, **common):
+        """Create `n` new instances in one batch.
+
+        All UUIDs are drawn from a single `os.urandom` read, every instance
+        shares one timestamp and the instance dictionaries are filled
+        directly instead of going through `__init__` and `setattr`.
+
+        Args:
+            n (int): The number of instances to create.
+            **common: Attributes given to every instance, handled like the
+                keyword arguments of `__init__`. Values are shared, not
+                copied, between the instances.
+
+        Returns:
+            list: The new instances.
+
+        Raises:
+            ValueError: If `n` is negative or `common` holds an `id`.
+
+        Examples:
+            >>> models = BaseModel.create_many(3, name="seed")
+            >>> len({m.id for m in models})
+            3
+            >>> models[0].created_at == models[2].updated_at
+            True
+        """
+        if n < 0:
+            raise ValueError("n must be >= 0")
+        if 'id' in common:
+            raise ValueError("create_many() cannot share one id")
+        now = clock.now()
+        attrs = {'created_at': now, 'updated_at': now}
+        for k, v in common.items():
+            if k == '__class__':
+                continue
+            if k in ('created_at', 'updated_at'):
+                v = parse_datetime(v)
+            attrs[k] = v
+
+        core = [(k, attrs.pop(k)) for k in cls._core_slots if k in attrs]
+        slotted = bool(cls._core_slots)
+        setter = object.__setattr__
+
+        raw = os.urandom(16 * n)
+        new = cls.__new__
+        objs = []
+        for off in range(0, 16 * n, 16):
+            uid = (int.from_bytes(raw[off:off + 16], 'big')
+                   & _UUID4_MASK | _UUID4_BITS)
+            obj = new(cls)
+            setter(obj, '_cache', None)
+            setter(obj, '_dirty', True)
+            if slotted:
+                setter(obj, '_id', uid)
+                for k, v in core:
+                    setter(obj, k, v)
+            else:
+                obj.__dict__['id'] = _format_uuid(uid)
+            obj.__dict__.update(attrs)
+            objs.append(obj)
+        return objs
+
+    def __setattr__(self, name, value):
+        """Set an attribute, marking it dirty and refreshing the cache."""
+        object.__setattr__(self, name, value)
+        dirty = self._dirty
+        if dirty is None:
+            object.__setattr__(self, '_dirty', {name})
+            for watcher in watchers:
+                watcher.object_dirtied(self)
+        elif dirty is not True:
+            dirty.add(name)
+        cache = self._cache
+        if cache is not None:
+            if name not in cache:
+                object.__setattr__(self, '_cache', None)
+            elif name in ('created_at', 'updated_at'):
+                cache[name] = value.isoformat()
+            else:
+                cache[name] = value
+        if name in self.__indexes__:
+            for watcher in watchers:
+                watcher.attribute_changed(self, name)
+
+    def __delattr__(self, name):
+        """Delete an attribute, marking it dirty and dropping the cache."""
+        object.__delattr__(self, name)
+        dirty = self._dirty
+        if dirty is None:
+            object.__setattr__(self, '_dirty', {name})
+            for watcher in watchers:
+                watcher.object_dirtied(self)
+        elif dirty is not True:
+            dirty.add(name)
+        object.__setattr__(self, '_cache', None)
+        if name in self.__indexes__:
+            for watcher in watchers:
+                watcher.attribute_changed(self, name)
+
+    def __getstate__(self):
+        """Return the attributes to copy or pickle, without the cache."""
+        return self._attributes()
+
+    def __setstate__(self, state):
+        """Restore the attributes saved by `__getstate__`."""
+        object.__setattr__(self, '_cache', None)
+        object.__setattr__(self, '_dirty', True)
+        for k, v in state.items():
+            object.__setattr__(self, k, v)
+
+    def is_dirty(self):
+        """Return True if an attribute was written since `mark_clean`.
+
+        New instances are dirty until marked clean. In-place changes to
+        mutable values, such as appending to a list, are not tracked.
+
+        Examples:
+            >>> base = BaseModel()
+            >>> base.is_dirty()
+            True
+            >>> base.mark_clean()
+            >>> base.is_dirty()
+            False
+            >>> base.name = "Holberton"
+            >>> base.is_dirty()
+            True
+        """
+        return self._dirty is not None
+
+    def dirty_fields(self):
+        """Return the names of the attributes written since `mark_clean`.
+
+        Returns:
+            set: The attribute names; every attribute for a new instance.
+        """
+        dirty = self._dirty
+        if dirty is None:
+            return set()
+        if dirty is True:
+            return set(self._attributes())
+        return set(dirty)
+
+    def mark_clean(self):
+        """Forget the dirty attributes, usually once they are persisted."""
+        object.__setattr__(self, '_dirty', None)
 
     def save(self):
         """Update the `updated_at` timestamp to the current time."""
-        self.updated_at = datetime.datetime.utcnow()
+        self.updated_at = clock.now()
 
-    def to_dict(self):
+    def to_dict(self, dirty_only=False):
         """Convert the instance attributes to a dictionary format.
 
+        The result is cached and kept up to date by attribute writes, so
+        serializing an unchanged instance only copies the cached dict.
+
+        Args:
+            dirty_only (bool): Only include the attributes written since
+                `mark_clean`, along with `id` and `__class__`.
+
         Returns:
             dict: A dictionary containing all instance attributes, including
                 the class name.
@@ -88,12 +314,96 @@ class BaseModel:
             >>> isinstance(base_dict['updated_at'], str)
             True
         """
-        dect = self.__dict__.copy()
-        dect['created_at'] = self.created_at.isoformat()
-        dect['updated_at'] = self.updated_at.isoformat()
-        dect["__class__"] = type(self).__name__
+        cache = self._cache
+        if cache is None:
+            cache = self._attributes()
+            cache['created_at'] = self.created_at.isoformat()
+            cache['updated_at'] = self.updated_at.isoformat()
+            cache["__class__"] = type(self).__name__
+            object.__setattr__(self, '_cache', cache)
+        if not dirty_only or self._dirty is True:
+            return cache.copy()
+        dect = {'id': cache['id']}
+        for k in self._dirty or ():
+            if k in cache:
+                dect[k] = cache[k]
+        dect["__class__"] = cache["__class__"]
         return dect
 
+    def to_bytes(self, schemas=None):
+        """Encode the instance in the binary record format.
+
+        The record is several times smaller than the JSON of `to_dict`:
+        see `models.binary` for the layout.
+
+        Args:
+            schemas (Schemas): The layouts of a log to write the record
+                in, shared by the records of the log instead of being
+                described by each one.
+
+        Returns:
+            bytes: The record, without the class name unless written
+                with `schemas`.
+
+        Examples:
+            >>> base = BaseModel(name="Holberton")
+            >>> copy = BaseModel.from_bytes(base.to_bytes())
+            >>> copy.to_dict() == base.to_dict()
+            True
+        """
+        attrs = self._attributes()
+        id = attrs.pop('id')
+        created_at = attrs.pop('created_at')
+        updated_at = attrs.pop('updated_at')
+        if schemas is not None:
+            return schemas.pack(type(self).__name__, id, created_at,
+                                updated_at, attrs)
+        return pack(id, created_at, updated_at, attrs)
+
+    @classmethod
+    def from_bytes(cls, data, schemas=None):
+        """Build an instance from a record written by `to_bytes`.
+
+        Like an instance built from `to_dict` output, it is dirty until
+        marked clean.
+
+        Args:
+            data (bytes): The record.
+            schemas (Schemas): The layouts the record was written with,
+                if any.
+
+        Returns:
+            BaseModel: The new instance.
+
+        Raises:
+            ValueError: If the record is malformed.
+        """
+        if schemas is None or cls._core_slots:
+            decode = unpack if schemas is None else schemas.unpack
+            id, created_at, updated_at, attrs = decode(
+                data, raw_id=bool(cls._core_slots))
+            dect = {'id': id, 'created_at': created_at,
+                    'updated_at': updated_at}
+            dect.update(attrs)
+        else:
+            dect = schemas.fields(data)
+        for name in ('created_at', 'updated_at'):
+            if type(dect[name]) is str:
+                dect[name] = parse_datetime(dect[name])
+        setter = object.__setattr__
+        obj = cls.__new__(cls)
+        setter(obj, '_cache', None)
+        setter(obj, '_dirty', True)
+        if cls._core_slots:
+            id = dect.pop('id')
+            setter(obj, '_id' if type(id) is int else 'id', id)
+            setter(obj, 'created_at', dect.pop('created_at'))
+            setter(obj, 'updated_at', dect.pop('updated_at'))
+            obj.__dict__.update(dect)
+        else:
+            setter(obj, '__dict__', dect)
+        return obj
+
     def __str__(self):
         """Return a string representation of the instance.
 
@@ -107,4 +417,91 @@ class BaseModel:
         "[BaseModel] (...) {'id': ..., 'created_at': ..., 'updated_at':...}"
         """
         return "[{}] ({}) {}".format(
-            type(self).__name__, self.id, self.__dict__)
+            type(self).__name__, self.id, self._attributes())
+
+    def _attributes(self):
+        """Return a new dictionary of the instance attributes."""
+        return self.__dict__.copy()
+
+
+classes['BaseModel'] = BaseModel
+
+
+def _get_id(self):
+    """Render the id, stored as an int when it is a canonical UUID."""
+    value = self._id
+    if type(value) is int:
+        return _format_uuid(value)
+    return value
+
+
+def _set_id(self, value):
+    """Store canonical UUID strings as a 128-bit int, anything else as is."""
+    if type(value) is str and len(value) == 36:
+        try:
+            number = int(value.replace('-', ''), 16)
+        except ValueError:
+            pass
+        else:
+            if _format_uuid(number) == value:
+                value = number
+    object.__setattr__(self, '_id', value)
+
+
+def _compact_attributes(self):
+    """Return the slotted core fields followed by the ad-hoc attributes."""
+    dect = {}
+    for k in self._core_slots:
+        try:
+            dect[k] = getattr(self, k)
+        except AttributeError:
+            pass
+    dect.update(self.__dict__)
+    return dect
+
+
+def compact(cls):
+    """Class decorator storing the core fields of a model in slots.
+
+    `id`, `created_at` and `updated_at` move out of the instance
+    `__dict__` into slots, so an instance without ad-hoc attributes never
+    needs an overflow dictionary. `to_dict`, `__str__` and kwargs
+    construction behave as they do for a regular model.
+
+    A canonical UUID id is kept as a 128-bit int and only rendered to its
+    string form when read, so ids round-trip through `to_dict` unchanged.
+    Other ids are stored as given.
+
+    Args:
+        cls (type): A subclass of BaseModel.
+
+    Returns:
+        type: A compact subclass of `cls` with the same name.
+
+    Raises:
+        TypeError: If `cls` is not a subclass of BaseModel.
+
+    Examples:
+        >>> @compact
+        ... class Place(BaseModel):
+        ...     pass
+        >>> place = Place()
+        >>> place.__dict__
+        {}
+        >>> sorted(place.to_dict())
+        ['__class__', 'created_at', 'id', 'updated_at']
+    """
+    if not (isinstance(cls, type) and issubclass(cls, BaseModel)):
+        raise TypeError("compact() expects a BaseModel subclass")
+    if cls._core_slots:
+        return cls
+    ns = {
+        '__slots__': ('_id', 'created_at', 'updated_at'),
+        'id': property(_get_id, _set_id),
+        '__module__': cls.__module__,
+        '__qualname__': cls.__qualname__,
+        '__doc__': cls.__doc__,
+        '_core_slots': _CORE_FIELDS,
+        '_attributes': _compact_attributes,
+    }
+    return type(cls)(cls.__name__, (cls,), ns)
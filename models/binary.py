@@ -0,0 +1,649 @@
+#!/usr/bin/python3
+"""
+binary.py
+
+This module defines the binary record format behind `BaseModel.to_bytes`
+and `BaseModel.from_bytes`, a compact alternative to the JSON of
+`to_dict` for large snapshots.
+
+A record starts with a fixed header:
+    flags     uint8     which core fields the header holds
+    id        16 bytes  a canonical UUID id as a 128-bit integer
+    created   int64     `created_at` in microseconds since the epoch
+    updated   int64     `updated_at` in microseconds since the epoch
+    count     uint32    the number of attributes that follow
+
+Core fields the header cannot hold, such as an id that is not a UUID or
+an aware timestamp, are written with the other attributes, timestamps in
+their ISO format. Each attribute is a name (uint8 length, UTF-8) and a
+tagged value: one type byte followed by its payload. Strings holding a
+canonical UUID, like foreign keys, take 16 bytes. Lists, tuples and
+dictionaries with string keys nest; as with JSON, tuples read back as
+lists.
+
+Logs holding many records of a class use `Schemas` instead: a record
+then starts with the uint32 index of its layout, the class name, the
+attribute names and the kind of each value, written once per log. The
+values that fit one follow, packed in a fixed-size struct: canonical
+UUIDs as 16 bytes, naive timestamps as int64 microseconds, integers as
+int32 or int64 and floats as doubles. An `updated_at` equal to
+`created_at` takes no space. Lists of UUIDs, like `amenity_ids`, are a
+uint8 count and 16 bytes per item. The other values follow tagged, as
+above.
+
+All integers are little-endian.
+
+Examples:
+    >>> import datetime
+    >>> when = datetime.datetime(2017, 9, 28, 21, 3, 54, 52298)
+    >>> data = pack('56d43177-cc5f-4d6c-a0c1-e167f8c27337', when, when,
+    ...             {'rooms': 3, 'tags': ['quiet', None]})
+    >>> len(data)
+    63
+    >>> unpack(data)  # doctest: +NORMALIZE_WHITESPACE
+    ('56d43177-cc5f-4d6c-a0c1-e167f8c27337',
+     datetime.datetime(2017, 9, 28, 21, 3, 54, 52298),
+     datetime.datetime(2017, 9, 28, 21, 3, 54, 52298),
+     {'rooms': 3, 'tags': ['quiet', None]})
+"""
+
+import datetime
+import struct
+from functools import lru_cache
+
+_HEADER = struct.Struct('<B16sqqI')
+_INT64 = struct.Struct('<q')
+_UINT32 = struct.Struct('<I')
+_DOUBLE = struct.Struct('<d')
+
+_ID = 1
+_CREATED = 2
+_UPDATED = 4
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+_MICROSECOND = datetime.timedelta(microseconds=1)
+_INT64_MIN = -(1 << 63)
+_INT64_MAX = (1 << 63) - 1
+_INT32_MIN = -(1 << 31)
+_INT32_MAX = (1 << 31) - 1
+# Layout value kinds and their struct format; 'v' values are tagged.
+_FIXED = {'u': '16s', 't': 'q', 'i': 'i', 'q': 'q', 'd': 'd'}
+
+# Encoded attribute names, both ways; models use a handful of names.
+_NAMES_MAX = 4096
+_name_bytes = {}
+_name_text = {}
+
+
+def format_uuid(value):
+    """Return the canonical string form of a 128-bit UUID integer."""
+    return _uuid_id(value.to_bytes(16, 'big'))
+
+
+def _uuid_id(raw):
+    """Return the canonical string form of a 16-byte UUID.
+
+    Used for record ids, which do not repeat.
+    """
+    h = raw.hex()
+    return '%s-%s-%s-%s-%s' % (h[:8], h[8:12], h[12:16], h[16:20], h[20:])
+
+
+# Memoized, since foreign keys repeat across records.
+_uuid_text = lru_cache(maxsize=4096)(_uuid_id)
+
+
+def _id_bytes(value):
+    """Return the 16 bytes of a canonical UUID string, or None.
+
+    Used for record ids, which do not repeat.
+    """
+    if len(value) != 36 or value[8] != '-':
+        return None
+    try:
+        raw = bytes.fromhex(value.replace('-', ''))
+    except ValueError:
+        return None
+    if len(raw) != 16 or _uuid_id(raw) != value:
+        return None
+    return raw
+
+
+# Memoized, since foreign keys repeat across records.
+_uuid_bytes = lru_cache(maxsize=4096)(_id_bytes)
+
+
+@lru_cache(maxsize=256)
+def _uuid_list(count):
+    """Return the struct of a list of `count` 16-byte UUIDs."""
+    return struct.Struct('16s' * count)
+
+
+@lru_cache(maxsize=1024)
+def _datetime(micros):
+    """Return the naive timestamp of epoch microseconds.
+
+    Results are memoized, since objects saved together share timestamps.
+    """
+    return _EPOCH + datetime.timedelta(microseconds=micros)
+
+
+def _micros(value):
+    """Return a naive timestamp in epoch microseconds, or None."""
+    if type(value) is not datetime.datetime or value.tzinfo is not None:
+        return None
+    return (value - _EPOCH) // _MICROSECOND
+
+
+def _write(value, out):
+    """Append the tagged encoding of a value to the `out` list."""
+    kind = type(value)
+    if kind is str:
+        if len(value) == 36:
+            raw = _uuid_bytes(value)
+            if raw is not None:
+                out.append(b'u' + raw)
+                return
+        data = value.encode('utf-8')
+        if len(data) < 256:
+            out.append(b's' + bytes((len(data),)) + data)
+        else:
+            out.append(b'S' + _UINT32.pack(len(data)) + data)
+    elif value is None:
+        out.append(b'N')
+    elif value is True:
+        out.append(b'T')
+    elif value is False:
+        out.append(b'F')
+    elif kind is int:
+        if 0 <= value < 256:
+            out.append(b'b' + bytes((value,)))
+        elif _INT64_MIN <= value <= _INT64_MAX:
+            out.append(b'i' + _INT64.pack(value))
+        else:
+            data = value.to_bytes((value.bit_length() + 8) // 8, 'little',
+                                  signed=True)
+            out.append(b'I' + _UINT32.pack(len(data)) + data)
+    elif kind is float:
+        out.append(b'd' + _DOUBLE.pack(value))
+    elif kind is list or kind is tuple:
+        out.append(b'l' + _UINT32.pack(len(value)))
+        for item in value:
+            _write(item, out)
+    elif kind is dict:
+        out.append(b'm' + _UINT32.pack(len(value)))
+        for key, item in value.items():
+            if type(key) is not str:
+                raise TypeError("keys must be str, not {}".format(
+                    type(key).__name__))
+            _write(key, out)
+            _write(item, out)
+    else:
+        for base in (str, int, float, dict):
+            if isinstance(value, base):
+                return _write(base(value), out)
+        if isinstance(value, (list, tuple)):
+            return _write(list(value), out)
+        raise TypeError("Object of type {} is not serializable".format(
+            kind.__name__))
+
+
+def _read(data, pos):
+    """Decode the tagged value at `pos`.
+
+    Returns:
+        tuple: The value and the position right after it.
+    """
+    tag = data[pos]
+    pos += 1
+    if tag == 0x73:  # s
+        end = pos + 1 + data[pos]
+        return data[pos + 1:end].decode('utf-8'), end
+    if tag == 0x75:  # u
+        end = pos + 16
+        return _uuid_text(data[pos:end]), end
+    if tag == 0x62:  # b
+        return data[pos], pos + 1
+    if tag == 0x69:  # i
+        return _INT64.unpack_from(data, pos)[0], pos + 8
+    if tag == 0x64:  # d
+        return _DOUBLE.unpack_from(data, pos)[0], pos + 8
+    if tag == 0x4e:  # N
+        return None, pos
+    if tag == 0x54:  # T
+        return True, pos
+    if tag == 0x46:  # F
+        return False, pos
+    if tag == 0x6c:  # l
+        count = _UINT32.unpack_from(data, pos)[0]
+        pos += 4
+        items = []
+        for _ in range(count):
+            # Inline UUIDs, as in lists of foreign keys.
+            if data[pos] == 0x75:
+                end = pos + 17
+                items.append(_uuid_text(data[pos + 1:end]))
+                pos = end
+            else:
+                item, pos = _read(data, pos)
+                items.append(item)
+        return items, pos
+    if tag == 0x6d:  # m
+        count = _UINT32.unpack_from(data, pos)[0]
+        pos += 4
+        items = {}
+        for _ in range(count):
+            key, pos = _read(data, pos)
+            items[key], pos = _read(data, pos)
+        return items, pos
+    if tag == 0x53:  # S
+        end = pos + 4 + _UINT32.unpack_from(data, pos)[0]
+        return data[pos + 4:end].decode('utf-8'), end
+    if tag == 0x49:  # I
+        end = pos + 4 + _UINT32.unpack_from(data, pos)[0]
+        return int.from_bytes(data[pos + 4:end], 'little', signed=True), end
+    raise ValueError("unknown value tag {!r} at byte {}".format(
+        chr(tag), pos - 1))
+
+
+def pack(id, created_at, updated_at, attributes):
+    """Encode a model's core fields and attributes into a record.
+
+    Args:
+        id: The object id. A canonical UUID string goes in the header,
+            any other value with the attributes.
+        created_at (datetime): The creation timestamp.
+        updated_at (datetime): The last update timestamp.
+        attributes (dict): The other attributes, by name.
+
+    Returns:
+        bytes: The record.
+
+    Raises:
+        TypeError: If a value is of a type JSON could not hold either.
+        ValueError: If an attribute name is longer than 255 bytes.
+    """
+    flags = 0
+    extra = {}
+    raw = _id_bytes(id) if type(id) is str else None
+    if raw is not None:
+        flags |= _ID
+    else:
+        extra['id'] = id
+        raw = bytes(16)
+    created = _micros(created_at)
+    if created is not None:
+        flags |= _CREATED
+    else:
+        extra['created_at'] = created_at.isoformat()
+        created = 0
+    updated = _micros(updated_at)
+    if updated is not None:
+        flags |= _UPDATED
+    else:
+        extra['updated_at'] = updated_at.isoformat()
+        updated = 0
+    out = [_HEADER.pack(flags, raw, created, updated,
+                        len(extra) + len(attributes))]
+    names = _name_bytes
+    for attrs in (extra, attributes):
+        for name, value in attrs.items():
+            key = names.get(name)
+            if key is None:
+                key = name.encode('utf-8')
+                if len(key) > 255:
+                    raise ValueError("attribute name too long: {!r}".format(
+                        name))
+                key = bytes((len(key),)) + key
+                if len(names) < _NAMES_MAX:
+                    names[name] = key
+            out.append(key)
+            _write(value, out)
+    return b''.join(out)
+
+
+def record_id(data):
+    """Return the id of a record, read without decoding its attributes."""
+    flags, raw = _HEADER.unpack_from(data)[:2]
+    if flags & _ID:
+        return _uuid_id(raw)
+    return unpack(data)[0]
+
+
+def unpack(data, raw_id=False):
+    """Decode a record written by `pack`.
+
+    Args:
+        data (bytes): The record.
+        raw_id (bool): Return a UUID id as its 128-bit integer.
+
+    Returns:
+        tuple: The id, `created_at`, `updated_at` and a dictionary of the
+            other attributes. Timestamps the header could not hold are
+            returned as ISO format strings.
+
+    Raises:
+        ValueError: If the record is malformed.
+    """
+    try:
+        flags, raw, created, updated, count = _HEADER.unpack_from(data)
+        attributes = {}
+        names = _name_text
+        pos = _HEADER.size
+        for _ in range(count):
+            end = pos + 1 + data[pos]
+            key = data[pos + 1:end]
+            name = names.get(key)
+            if name is None:
+                name = key.decode('utf-8')
+                if len(names) < _NAMES_MAX:
+                    names[key] = name
+            # Inline the most common values, saving a call each.
+            tag = data[end]
+            if tag == 0x73:
+                pos = end + 2 + data[end + 1]
+                attributes[name] = data[end + 2:pos].decode('utf-8')
+            elif tag == 0x75:
+                pos = end + 17
+                attributes[name] = _uuid_text(data[end + 1:pos])
+            else:
+                attributes[name], pos = _read(data, end)
+    except (IndexError, struct.error) as e:
+        raise ValueError("truncated record: {}".format(e))
+    if pos != len(data):
+        raise ValueError("record of {} bytes ends at byte {}".format(
+            len(data), pos))
+    if not flags & _ID:
+        id = attributes.pop('id', None)
+    elif raw_id:
+        id = int.from_bytes(raw, 'big')
+    else:
+        id = _uuid_id(raw)
+    if flags & _CREATED:
+        created_at = _datetime(created)
+    else:
+        created_at = attributes.pop('created_at', None)
+    if flags & _UPDATED:
+        updated_at = _datetime(updated)
+    else:
+        updated_at = attributes.pop('updated_at', None)
+    return id, created_at, updated_at, attributes
+
+
+class _Layout:
+    """The class name, attribute names and value kinds of records.
+
+    Attributes:
+        name (str): The class name.
+        names (tuple): The attribute names, after the core fields.
+        kinds (str): The kind of the id, `created_at`, `updated_at` and
+            each attribute: one of 'u', 't', 'i', 'q', 'd', 'U' for a list
+            of UUIDs, 'v' for a tagged value, and '=' for an `updated_at`
+            equal to `created_at`.
+        fixed (Struct): The layout index and the packed values.
+        decode (callable): Returns the core fields and attributes of a
+            record, by name.
+    """
+
+    def __init__(self, name, names, kinds):
+        """Initialize the layout and compile its decoder.
+
+        Raises:
+            ValueError: If `kinds` does not match `names`.
+        """
+        if (type(name) is not str or type(kinds) is not str or
+                not all(type(n) is str for n in names) or
+                len(kinds) != len(names) + 3 or kinds[0] not in 'uv' or
+                kinds[1] not in 'tv' or kinds[2] not in 'tv=' or
+                not set(kinds[3:]) <= set('uiqdUv')):
+            raise ValueError("malformed layout: {!r}".format(kinds))
+        self.name = name
+        self.names = names
+        self.kinds = kinds
+        self.fixed = struct.Struct(
+            '<I' + ''.join(_FIXED.get(kind, '') for kind in kinds))
+        self.decode = self._compile()
+
+    def _compile(self):
+        """Return a decoder for the records of the layout.
+
+        As `collections.namedtuple` does, the decoder is generated for
+        the layout, so that a record takes one struct call and one dict
+        display instead of a loop over its fields.
+        """
+        fields = ('id', 'created_at', 'updated_at') + self.names
+        packed = ['_']
+        tagged = []
+        items = []
+        for n, (field, kind) in enumerate(zip(fields, self.kinds)):
+            var = 'v{}'.format(n)
+            if kind in _FIXED:
+                packed.append(var)
+            elif kind != '=':
+                tagged.append((var, kind))
+            if kind == 'u':
+                var = '{}({})'.format('_uuid_id' if n == 0 else '_uuid_text',
+                                      var)
+            elif kind == 't':
+                var = '_datetime({})'.format(var)
+            elif kind == '=':
+                var = items[1][1]
+            items.append((field, var))
+        lines = ['def decode(data):',
+                 '    {}, = unpack_from(data)'.format(', '.join(packed)),
+                 '    pos = {}'.format(self.fixed.size)]
+        for var, kind in tagged:
+            if kind == 'U':
+                lines.extend([
+                    '    end = pos + 1 + 16 * data[pos]',
+                    '    {} = list(map(_uuid_text, _uuid_list(data[pos])'
+                    '.unpack_from(data, pos + 1)))'.format(var),
+                    '    pos = end'])
+                continue
+            # Inline short strings, the most common tagged values.
+            lines.extend([
+                '    if data[pos] == 0x73:',
+                '        end = pos + 2 + data[pos + 1]',
+                "        {} = data[pos + 2:end].decode('utf-8')".format(var),
+                '        pos = end',
+                '    else:',
+                '        {}, pos = _read(data, pos)'.format(var)])
+        lines.extend([
+            '    if pos != len(data):',
+            '        raise ValueError("record of %d bytes ends at byte %d"'
+            ' % (len(data), pos))',
+            '    return {{{}}}'.format(', '.join(
+                '{!r}: {}'.format(field, var) for field, var in items))])
+        namespace = {'unpack_from': self.fixed.unpack_from, '_read': _read,
+                     '_uuid_id': _uuid_id, '_uuid_text': _uuid_text,
+                     '_uuid_list': _uuid_list, '_datetime': _datetime}
+        exec('\n'.join(lines), namespace)
+        return namespace['decode']
+
+
+class Schemas:
+    """The record layouts of one log.
+
+    Records of a class holding the same attribute names, with values of
+    the same kinds, share a layout: each record only holds the values,
+    and its layout is defined once.
+
+    Attributes:
+        layouts (list): The layouts, by index.
+        unsaved (list): The definitions of the layouts added by `pack`,
+            to write before the records using them.
+
+    Examples:
+        >>> import datetime
+        >>> when = datetime.datetime(2017, 9, 28, 21, 3, 54, 52298)
+        >>> schemas = Schemas()
+        >>> data = schemas.pack('Place', '56d43177-cc5f-4d6c-a0c1-'
+        ...                     'e167f8c27337', when, when, {'rooms': 3})
+        >>> len(data), len(schemas.unsaved)
+        (32, 1)
+        >>> copy = Schemas()
+        >>> copy.define(schemas.unsaved[0])
+        >>> copy.unpack(data)[3]
+        {'rooms': 3}
+    """
+
+    def __init__(self):
+        """Initialize a log without layouts."""
+        self.layouts = []
+        self.unsaved = []
+        self._index = {}
+
+    def define(self, data):
+        """Add the layout of a definition written by `pack`.
+
+        Raises:
+            ValueError: If the definition is malformed.
+        """
+        try:
+            (name, names, kinds), end = _read(data, 0)
+            names = tuple(names)
+            layout = _Layout(name, names, kinds)
+        except (IndexError, TypeError, struct.error) as e:
+            raise ValueError("malformed layout: {}".format(e))
+        if end != len(data):
+            raise ValueError("malformed layout")
+        self._index[name, names, kinds] = len(self.layouts)
+        self.layouts.append(layout)
+
+    def _layout(self, data):
+        """Return the layout of a record."""
+        try:
+            return self.layouts[_UINT32.unpack_from(data)[0]]
+        except (IndexError, struct.error):
+            raise ValueError("record of an unknown layout")
+
+    def pack(self, name, id, created_at, updated_at, attributes):
+        """Encode a model's core fields and attributes into a record.
+
+        A new layout is added to `unsaved` if no record had the class
+        name, attribute names and value kinds of this one.
+
+        Args:
+            name (str): The class name.
+            id: The object id.
+            created_at (datetime): The creation timestamp.
+            updated_at (datetime): The last update timestamp.
+            attributes (dict): The other attributes, by name.
+
+        Returns:
+            bytes: The record.
+
+        Raises:
+            TypeError: If a value is of a type JSON could not hold either.
+        """
+        kinds = []
+        fixed = []
+        tail = []
+        raw = _id_bytes(id) if type(id) is str else None
+        if raw is not None:
+            kinds.append('u')
+            fixed.append(raw)
+        else:
+            kinds.append('v')
+            _write(id, tail)
+        created = _micros(created_at)
+        if created is not None:
+            kinds.append('t')
+            fixed.append(created)
+        else:
+            kinds.append('v')
+            _write(created_at.isoformat(), tail)
+        updated = _micros(updated_at)
+        if updated is not None and updated == created:
+            kinds.append('=')
+        elif updated is not None:
+            kinds.append('t')
+            fixed.append(updated)
+        else:
+            kinds.append('v')
+            _write(updated_at.isoformat(), tail)
+        for value in attributes.values():
+            kind = type(value)
+            if kind is str and len(value) == 36:
+                raw = _uuid_bytes(value)
+                if raw is not None:
+                    kinds.append('u')
+                    fixed.append(raw)
+                    continue
+            elif kind is int and _INT64_MIN <= value <= _INT64_MAX:
+                kinds.append('i' if _INT32_MIN <= value <= _INT32_MAX
+                             else 'q')
+                fixed.append(value)
+                continue
+            elif kind is float:
+                kinds.append('d')
+                fixed.append(value)
+                continue
+            elif kind is list and len(value) < 256:
+                raws = [_uuid_bytes(v) for v in value
+                        if type(v) is str and len(v) == 36]
+                if len(raws) == len(value) and None not in raws:
+                    kinds.append('U')
+                    tail.append(bytes((len(raws),)))
+                    tail.extend(raws)
+                    continue
+            kinds.append('v')
+            _write(value, tail)
+        kinds = ''.join(kinds)
+        key = (name, tuple(attributes), kinds)
+        index = self._index.get(key)
+        if index is None:
+            out = []
+            _write(list(key), out)
+            index = len(self.layouts)
+            self.define(b''.join(out))
+            self.unsaved.append(b''.join(out))
+        tail.insert(0, self.layouts[index].fixed.pack(index, *fixed))
+        return b''.join(tail)
+
+    def name(self, data):
+        """Return the class name of a record."""
+        return self._layout(data).name
+
+    def identify(self, data):
+        """Return the class name and id of a record.
+
+        The id is read without decoding the other values, unless it is
+        not a UUID.
+        """
+        layout = self._layout(data)
+        if layout.kinds[0] == 'u':
+            return layout.name, _uuid_id(data[4:20])
+        return layout.name, self.fields(data)['id']
+
+    def fields(self, data):
+        """Return the core fields and attributes of a record, by name.
+
+        Raises:
+            ValueError: If the record is malformed or its layout unknown.
+        """
+        try:
+            return self._layout(data).decode(data)
+        except (IndexError, struct.error) as e:
+            raise ValueError("truncated record: {}".format(e))
+
+    def unpack(self, data, raw_id=False):
+        """Decode a record written by `pack`.
+
+        Args:
+            data (bytes): The record.
+            raw_id (bool): Return a UUID id as its 128-bit integer.
+
+        Returns:
+            tuple: The id, `created_at`, `updated_at` and a dictionary of
+                the other attributes, as returned by `unpack`.
+
+        Raises:
+            ValueError: If the record is malformed or its layout unknown.
+        """
+        attributes = self.fields(data)
+        id = attributes.pop('id')
+        if raw_id and self._layout(data).kinds[0] == 'u':
+            id = int.from_bytes(data[4:20], 'big')
+        return (id, attributes.pop('created_at'),
+                attributes.pop('updated_at'), attributes)
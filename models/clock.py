@@ -0,0 +1,66 @@
+#!/usr/bin/python3
+"""
+clock.py
+
+This module is the single source of the current time for the models.
+BaseModel reads it once per construction and once per `save`, so a
+model can be given a fixed or coarse clock without patching `datetime`.
+
+Examples:
+    >>> import datetime
+    >>> moment = datetime.datetime(2017, 9, 28, 21, 3, 54)
+    >>> with frozen(moment):
+    ...     now() == moment
+    True
+    >>> now() == moment
+    False
+"""
+
+import datetime
+from contextlib import contextmanager
+
+_source = datetime.datetime.utcnow
+
+
+def now():
+    """Return the current time from the active clock source.
+
+    Returns:
+        datetime: A naive UTC timestamp, unless another source is set.
+    """
+    return _source()
+
+
+def set_source(source):
+    """Replace the clock source.
+
+    Args:
+        source (callable): A function taking no argument and returning a
+            datetime. None restores the default `datetime.utcnow`.
+    """
+    global _source
+    _source = datetime.datetime.utcnow if source is None else source
+
+
+@contextmanager
+def frozen(moment=None):
+    """Return a context manager stopping the clock at `moment`.
+
+    Bulk operations can use it to share one timestamp, and tests to get
+    deterministic ones.
+
+    Args:
+        moment (datetime): The time `now` returns inside the block,
+            read from the current source when omitted.
+
+    Yields:
+        datetime: The frozen time.
+    """
+    previous = _source
+    if moment is None:
+        moment = previous()
+    set_source(lambda: moment)
+    try:
+        yield moment
+    finally:
+        set_source(previous)
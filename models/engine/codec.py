@@ -0,0 +1,167 @@
+#!/usr/bin/python3
+"""
+codec.py
+
+This module selects the JSON implementation the storage engines encode
+and decode their records with. The standard `json` module is always
+available; `orjson` and `ujson` are used when they are installed, as they
+encode `to_dict()` output several times faster.
+
+The HBNB_JSON_CODEC environment variable picks one by name: 'json',
+'orjson', 'ujson', or 'auto' (the default) for the fastest one installed.
+
+Installing orjson or ujson does not change what can be stored or read:
+values they refuse to encode, like integers beyond 64 bits or dictionary
+keys that are not strings, and input they refuse to decode, like the
+NaN and Infinity the `json` module writes, are handed to the `json`
+module instead. So are values holding NaN or infinite floats, which
+orjson would write as null.
+
+Examples:
+    >>> codec = get_codec('json')
+    >>> codec.encode({'id': '1', 'rooms': 2})
+    b'{"id":"1","rooms":2}'
+    >>> codec.decode(b'{"id":"1"}')
+    {'id': '1'}
+"""
+
+import json
+import math
+import os
+
+ENV = 'HBNB_JSON_CODEC'
+
+
+class Codec:
+    """A JSON implementation.
+
+    Attributes:
+        name (str): The module name.
+        encode (callable): Returns the compact UTF-8 JSON bytes of a
+            value.
+        decode (callable): Returns the value of JSON bytes or str, and
+            raises ValueError on invalid input.
+    """
+
+    def __init__(self, name, encode, decode):
+        """Initialize a codec from its two functions."""
+        self.name = name
+        self.encode = encode
+        self.decode = decode
+
+    def __repr__(self):
+        """Return the representation of the codec."""
+        return "<Codec {}>".format(self.name)
+
+
+def _fallback(fast_encode, fast_decode, errors):
+    """Return encode and decode functions handing failures to `json`.
+
+    Args:
+        fast_encode (callable): Returns the JSON bytes of a value.
+        fast_decode (callable): Returns the value of JSON bytes or str.
+        errors (tuple): The exceptions `fast_encode` raises on values it
+            cannot encode.
+    """
+    slow = _json()
+
+    def encode(value):
+        try:
+            return fast_encode(value)
+        except errors:
+            return slow.encode(value)
+
+    def decode(data):
+        try:
+            return fast_decode(data)
+        except ValueError:
+            return slow.decode(data)
+    return encode, decode
+
+
+def _finite(value):
+    """Return False if `value` holds a NaN or infinite float."""
+    kind = type(value)
+    if kind is float:
+        return math.isfinite(value)
+    if kind is dict:
+        return all(_finite(v) for v in value.values())
+    if kind in (list, tuple):
+        return all(_finite(v) for v in value)
+    return True
+
+
+def _orjson():
+    """Return the orjson codec."""
+    import orjson
+
+    def encode(value):
+        data = orjson.dumps(value)
+        # orjson writes NaN and infinite floats as null.
+        if b'null' in data and not _finite(value):
+            raise ValueError("non-finite float")
+        return data
+    return Codec('orjson', *_fallback(encode, orjson.loads,
+                                      (TypeError, ValueError)))
+
+
+def _ujson():
+    """Return the ujson codec."""
+    import ujson
+
+    def encode(value):
+        return ujson.dumps(value, escape_forward_slashes=False).encode(
+            'utf-8')
+    return Codec('ujson', *_fallback(encode, ujson.loads,
+                                     (TypeError, OverflowError)))
+
+
+def _json():
+    """Return the standard library codec."""
+    dumps = json.JSONEncoder(separators=(',', ':')).encode
+
+    def encode(value):
+        return dumps(value).encode('utf-8')
+    return Codec('json', encode, json.loads)
+
+
+_FACTORIES = {'orjson': _orjson, 'ujson': _ujson, 'json': _json}
+_codecs = {}
+
+
+def available():
+    """Return the names of the installed codecs, fastest first."""
+    names = []
+    for name in _FACTORIES:
+        try:
+            get_codec(name)
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+
+def get_codec(name=None):
+    """Return a codec by name.
+
+    Args:
+        name (str or Codec): The codec name, or 'auto' for the fastest
+            installed one. Defaults to the HBNB_JSON_CODEC environment
+            variable, then 'auto'. A Codec is returned as is.
+
+    Raises:
+        ValueError: If the name is not a known codec.
+        ImportError: If the named codec is not installed.
+    """
+    if isinstance(name, Codec):
+        return name
+    if name is None:
+        name = os.environ.get(ENV) or 'auto'
+    if name == 'auto':
+        return get_codec(available()[0])
+    if name not in _FACTORIES:
+        raise ValueError("unknown JSON codec: {!r}".format(name))
+    codec = _codecs.get(name)
+    if codec is None:
+        codec = _codecs[name] = _FACTORIES[name]()
+    return codec
@@ -0,0 +1,669 @@
+#!/usr/bin/python3
+"""
+columnar.py
+
+This module defines the ColumnStore class, an in-memory store keeping
+the objects of each model class as columns rather than instances, for
+reporting over millions of objects.
+
+Each attribute of a class is one column. Integers and floats live in
+typed `array` columns, naive timestamps in an int64 column of epoch
+microseconds, and strings are dictionary-encoded: each distinct string is
+kept once and rows hold its int32 code. Other values fall back to a plain
+list. `sum`, `mean`, `min`, `max` and `group_by` run over the arrays, and
+BaseModel instances are only built when asked for with `get` or `views`.
+
+With NumPy installed, the aggregates are array operations: `group_by`
+turns the grouped column into integer codes, the dictionary codes of a
+string column, and `numpy.bincount` counts and sums each group. Results
+match the ones computed without NumPy, apart from the rounding of float
+sums over a whole class. NumPy is optional: `numpy` is None when it is
+not installed, and the aggregates then loop over the arrays.
+
+Examples:
+    >>> from models.base_model import BaseModel
+    >>> store = ColumnStore()
+    >>> for city, price in [('a', 100), ('b', 80), ('a', 120)]:
+    ...     store.add(BaseModel(city_id=city, price_by_night=price))
+    >>> store.count(BaseModel), store.sum(BaseModel, 'price_by_night')
+    (3, 300)
+    >>> store.group_by(BaseModel, 'city_id', 'price_by_night', 'mean')
+    {'a': 110.0, 'b': 80.0}
+"""
+
+import datetime
+from array import array
+from collections import Counter
+from itertools import compress
+
+from models.base_model import classes, parse_datetime
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+_MISSING = object()
+_EPOCH = datetime.datetime(1970, 1, 1)
+_MICROSECOND = datetime.timedelta(microseconds=1)
+_INT64_MIN = -(1 << 63)
+_INT64_MAX = (1 << 63) - 1
+_FLOAT_INT_MAX = 1 << 53
+_AGGREGATES = ('count', 'sum', 'mean', 'min', 'max')
+
+
+class _ObjectColumn:
+    """A column of any values, in a list; the fallback of the others."""
+
+    numeric = False
+
+    def __init__(self, values):
+        """Initialize the column with the values of its rows."""
+        self.values = values
+
+    def grow(self):
+        """Add a row without a value."""
+        self.values.append(_MISSING)
+
+    def set(self, row, value):
+        """Store a value, returning False if the column cannot hold it."""
+        self.values[row] = value
+        return True
+
+    def get(self, row):
+        """Return the value of a row, or _MISSING."""
+        return self.values[row]
+
+    def clear(self, row):
+        """Remove the value of a row."""
+        self.values[row] = _MISSING
+
+    def move(self, source, row):
+        """Overwrite a row with the last row, which is then dropped."""
+        values = self.values
+        values[row] = values[source]
+        values.pop()
+
+    def present(self):
+        """Return an iterable of the values of the rows having one."""
+        return (v for v in self.values if v is not _MISSING)
+
+    def keys(self):
+        """Return the row values as group keys, and the missing key."""
+        return self.values, _MISSING
+
+    def decode_key(self, key):
+        """Return the value of a group key."""
+        return key
+
+    def group_codes(self):
+        """Return None: other values cannot be grouped as arrays."""
+        return None
+
+
+class _NumberColumn:
+    """A column of ints ('q') or floats ('d') with a presence mask.
+
+    An int column given a float becomes a float column, which remembers
+    which rows were ints so they read back unchanged; its aggregates are
+    floats.
+    """
+
+    numeric = True
+
+    def __init__(self, typecode, rows):
+        """Initialize a column of `rows` rows without values."""
+        self.values = array(typecode, bytes(8 * rows))
+        self.mask = bytearray(rows)
+        self.missing = rows
+        self.ints = None
+
+    def encode(self, value):
+        """Return the array item of a value, or None if it does not fit."""
+        kind = type(value)
+        if kind is int:
+            if self.values.typecode == 'q':
+                if _INT64_MIN <= value <= _INT64_MAX:
+                    return value
+            elif -_FLOAT_INT_MAX <= value <= _FLOAT_INT_MAX:
+                return float(value)
+            return None
+        if kind is float and self.values.typecode == 'd':
+            return value
+        return None
+
+    def decode(self, item):
+        """Return the value of an array item."""
+        return item
+
+    def grow(self):
+        """Add a row without a value."""
+        self.values.append(0)
+        self.mask.append(0)
+        self.missing += 1
+        if self.ints is not None:
+            self.ints.append(0)
+
+    def _promote(self):
+        """Turn an int column into a float one, if its ints fit."""
+        values = self.values
+        if values.typecode != 'q' or not all(
+                -_FLOAT_INT_MAX <= v <= _FLOAT_INT_MAX for v in values):
+            return False
+        self.values = array('d', values)
+        self.ints = bytearray(self.mask)
+        return True
+
+    def set(self, row, value):
+        """Store a value, returning False if the column cannot hold it."""
+        item = self.encode(value)
+        if item is None:
+            if type(value) is not float or not self._promote():
+                return False
+            item = value
+        self.values[row] = item
+        if not self.mask[row]:
+            self.mask[row] = 1
+            self.missing -= 1
+        if self.ints is not None:
+            self.ints[row] = type(value) is int
+        return True
+
+    def get(self, row):
+        """Return the value of a row, or _MISSING."""
+        if not self.mask[row]:
+            return _MISSING
+        value = self.decode(self.values[row])
+        if self.ints is not None and self.ints[row]:
+            return int(value)
+        return value
+
+    def clear(self, row):
+        """Remove the value of a row."""
+        if self.mask[row]:
+            self.mask[row] = 0
+            self.missing += 1
+        self.values[row] = 0
+
+    def move(self, source, row):
+        """Overwrite a row with the last row, which is then dropped."""
+        if not self.mask[row]:
+            self.missing -= 1
+        for seq in (self.values, self.mask, self.ints):
+            if seq is not None:
+                seq[row] = seq[source]
+                seq.pop()
+
+    def present(self):
+        """Return an iterable of the array items of the rows having one."""
+        if not self.missing:
+            return self.values
+        return compress(self.values, self.mask)
+
+    def keys(self):
+        """Return the row values as group keys, and the missing key."""
+        return [self.get(row) for row in range(len(self.mask))], _MISSING
+
+    def decode_key(self, key):
+        """Return the value of a group key."""
+        return key
+
+    def arrays(self):
+        """Return the items and the presence mask as NumPy arrays."""
+        return numpy.array(self.values), numpy.array(self.mask, dtype=bool)
+
+    def present_array(self):
+        """Return the items of the rows having one as a NumPy array."""
+        values, mask = self.arrays()
+        return values[mask] if self.missing else values
+
+    def group_codes(self):
+        """Return the group code of each row, -1 without a value, and the
+        value of each code, the one of its first row.
+        """
+        values, mask = self.arrays()
+        rows = numpy.flatnonzero(mask)
+        _, first, inverse = numpy.unique(
+            values[rows], return_index=True, return_inverse=True)
+        codes = numpy.full(len(mask), -1, dtype=numpy.intp)
+        codes[rows] = inverse
+        return codes, [self.get(row) for row in rows[first].tolist()]
+
+
+class _TimeColumn(_NumberColumn):
+    """A column of naive timestamps as int64 epoch microseconds."""
+
+    numeric = False
+
+    def __init__(self, rows):
+        """Initialize a column of `rows` rows without values."""
+        super().__init__('q', rows)
+
+    def encode(self, value):
+        """Return the array item of a value, or None if it does not fit."""
+        if type(value) is datetime.datetime and value.tzinfo is None:
+            return (value - _EPOCH) // _MICROSECOND
+        return None
+
+    def decode(self, item):
+        """Return the value of an array item."""
+        return _EPOCH + datetime.timedelta(microseconds=item)
+
+    def _promote(self):
+        """Never promote: other values go to an object column."""
+        return False
+
+
+class _StringColumn:
+    """A dictionary-encoded column of strings.
+
+    Each distinct string is stored once in `strings`; rows hold its index
+    in an int32 array, -1 for rows without a value.
+    """
+
+    numeric = False
+
+    def __init__(self, rows):
+        """Initialize a column of `rows` rows without values."""
+        self.codes = array('i', [-1]) * rows
+        self.strings = []
+        self.lookup = {}
+
+    def grow(self):
+        """Add a row without a value."""
+        self.codes.append(-1)
+
+    def set(self, row, value):
+        """Store a value, returning False if the column cannot hold it."""
+        if type(value) is not str:
+            return False
+        code = self.lookup.get(value)
+        if code is None:
+            code = self.lookup[value] = len(self.strings)
+            self.strings.append(value)
+        self.codes[row] = code
+        return True
+
+    def get(self, row):
+        """Return the value of a row, or _MISSING."""
+        code = self.codes[row]
+        return _MISSING if code < 0 else self.strings[code]
+
+    def clear(self, row):
+        """Remove the value of a row."""
+        self.codes[row] = -1
+
+    def move(self, source, row):
+        """Overwrite a row with the last row, which is then dropped."""
+        codes = self.codes
+        codes[row] = codes[source]
+        codes.pop()
+
+    def present(self):
+        """Return an iterable of the values of the rows having one."""
+        strings = self.strings
+        return (strings[c] for c in self.codes if c >= 0)
+
+    def keys(self):
+        """Return the row codes as group keys, and the missing key."""
+        return self.codes, -1
+
+    def decode_key(self, key):
+        """Return the value of a group key."""
+        return self.strings[key]
+
+    def group_codes(self):
+        """Return the code of each row, -1 without a value, and the string
+        of each code.
+        """
+        return numpy.array(self.codes, dtype=numpy.intp), self.strings
+
+
+def _exact(values):
+    """Return True if float64 sums of a NumPy array are exact."""
+    if values.dtype.kind != 'i' or not len(values):
+        return True
+    bound = max(values.max().item(), -values.min().item())
+    return len(values) * bound < _FLOAT_INT_MAX
+
+
+def _grouped(codes, keys, column, agg):
+    """Aggregate a numeric column by group code with NumPy.
+
+    Args:
+        codes (ndarray): The group code of each row, -1 for no group.
+        keys (list): The key of each group code.
+        column (_NumberColumn): The aggregated column, None to count.
+        agg (str): 'count', 'sum', 'mean', 'min' or 'max'.
+
+    Returns:
+        dict: The aggregate of each key, keys in the order of their first
+            row, or NotImplemented if integer sums could overflow or a
+            'min' or 'max' meets NaN.
+    """
+    rows = codes >= 0
+    values = None
+    if column is not None:
+        values, mask = column.arrays()
+        rows &= mask
+        values = values[rows]
+        if agg in ('sum', 'mean') and not _exact(values):
+            return NotImplemented
+        if agg in ('min', 'max') and numpy.isnan(values).any():
+            return NotImplemented
+    codes = codes[rows]
+    if not len(codes):
+        return {}
+    counts = numpy.bincount(codes, minlength=len(keys))
+    groups = numpy.flatnonzero(counts)
+    first = numpy.full(len(keys), len(codes))
+    numpy.minimum.at(first, codes, numpy.arange(len(codes)))
+    groups = groups[numpy.argsort(first[groups], kind='stable')]
+    if agg == 'count':
+        results = counts[groups]
+    elif agg in ('sum', 'mean'):
+        results = numpy.bincount(codes, values, len(keys))[groups]
+        if agg == 'mean':
+            results = results / counts[groups]
+        elif values.dtype.kind == 'i':
+            results = results.astype(numpy.int64)
+    else:
+        # Start each group from its first value, absent ones from any.
+        results = values[numpy.minimum(first, len(codes) - 1)]
+        (numpy.minimum if agg == 'min' else numpy.maximum).at(
+            results, codes, values)
+        results = results[groups]
+    return dict(zip([keys[k] for k in groups.tolist()], results.tolist()))
+
+
+def _new_column(value, rows):
+    """Return the best column for a first value, with `rows` empty rows."""
+    kind = type(value)
+    if kind is str:
+        return _StringColumn(rows)
+    if kind is int and _INT64_MIN <= value <= _INT64_MAX:
+        return _NumberColumn('q', rows)
+    if kind is float:
+        return _NumberColumn('d', rows)
+    if kind is datetime.datetime and value.tzinfo is None:
+        return _TimeColumn(rows)
+    return _ObjectColumn([_MISSING] * rows)
+
+
+class _Table:
+    """The rows of one model class."""
+
+    def __init__(self):
+        """Initialize an empty table."""
+        self.ids = []
+        self.rows = {}
+        self.columns = {}
+
+    def put(self, attrs):
+        """Insert or replace the row of the attributes' id."""
+        id = attrs.pop('id')
+        row = self.rows.get(id)
+        columns = self.columns
+        if row is None:
+            row = self.rows[id] = len(self.ids)
+            self.ids.append(id)
+            for column in columns.values():
+                column.grow()
+        else:
+            for name, column in columns.items():
+                if name not in attrs:
+                    column.clear(row)
+        for name, value in attrs.items():
+            column = columns.get(name)
+            if column is None:
+                column = columns[name] = _new_column(value, len(self.ids))
+            if not column.set(row, value):
+                column = columns[name] = _ObjectColumn(
+                    [column.get(r) for r in range(len(self.ids))])
+                column.set(row, value)
+
+    def remove(self, id):
+        """Remove the row of an id, moving the last row in its place."""
+        row = self.rows.pop(id, None)
+        if row is None:
+            return False
+        last = len(self.ids) - 1
+        for column in self.columns.values():
+            column.move(last, row)
+        last_id = self.ids.pop()
+        if row != last:
+            self.ids[row] = last_id
+            self.rows[last_id] = row
+        return True
+
+    def attributes(self, row):
+        """Return the attributes of a row, id first."""
+        attrs = {'id': self.ids[row]}
+        for name, column in self.columns.items():
+            value = column.get(row)
+            if value is not _MISSING:
+                attrs[name] = value
+        return attrs
+
+
+class ColumnStore:
+    """Columnar store of model objects, by class.
+
+    Objects are copied in by `add`; the store does not follow later
+    changes to them. `get` and `views` build detached instances.
+    """
+
+    def __init__(self):
+        """Initialize an empty store."""
+        self._tables = {}
+
+    @staticmethod
+    def _name(cls):
+        """Return the name of a model class or class name."""
+        return cls if isinstance(cls, str) else cls.__name__
+
+    def _table(self, cls):
+        """Return the table of a class, None if it has no row."""
+        return self._tables.get(self._name(cls))
+
+    def add(self, obj):
+        """Copy an object into its class table, replacing a previous copy.
+        """
+        name = type(obj).__name__
+        table = self._tables.get(name)
+        if table is None:
+            table = self._tables[name] = _Table()
+        table.put(obj._attributes())
+
+    def add_dict(self, d):
+        """Add an object from its `to_dict()` output, without building it.
+
+        Raises:
+            KeyError: If `d` has no `__class__` or `id`.
+        """
+        attrs = dict(d)
+        name = attrs.pop('__class__')
+        for key in ('created_at', 'updated_at'):
+            if type(attrs.get(key)) is str:
+                attrs[key] = parse_datetime(attrs[key])
+        table = self._tables.get(name)
+        if table is None:
+            table = self._tables[name] = _Table()
+        table.put(attrs)
+
+    def extend(self, objs):
+        """Add several objects."""
+        for obj in objs:
+            self.add(obj)
+
+    def remove(self, cls, id):
+        """Remove an object by class and id.
+
+        Returns:
+            bool: True if the object was stored.
+        """
+        table = self._table(cls)
+        return table is not None and table.remove(id)
+
+    def _materialize(self, name, table, row):
+        """Build a clean, detached instance of a row."""
+        obj = classes[name].__new__(classes[name])
+        obj.__setstate__(table.attributes(row))
+        obj.mark_clean()
+        return obj
+
+    def get(self, cls, id):
+        """Return a new instance of a stored object, or None."""
+        name = self._name(cls)
+        table = self._tables.get(name)
+        if table is None or id not in table.rows:
+            return None
+        return self._materialize(name, table, table.rows[id])
+
+    def views(self, cls):
+        """Yield a new instance of each object of a class, one at a time.
+        """
+        name = self._name(cls)
+        table = self._tables.get(name)
+        if table is None:
+            return
+        for row in range(len(table.ids)):
+            yield self._materialize(name, table, row)
+
+    def count(self, cls, attr=None):
+        """Return the number of objects of a class, or of those that have
+        `attr`.
+        """
+        table = self._table(cls)
+        if table is None:
+            return 0
+        if attr is None:
+            return len(table.ids)
+        column = table.columns.get(attr)
+        if column is None:
+            return 0
+        return sum(1 for _ in column.present())
+
+    def _numbers(self, cls, attr):
+        """Return the present items of a numeric column, as a NumPy array
+        when NumPy is installed.
+
+        Raises:
+            TypeError: If the column holds other values than numbers.
+        """
+        table = self._table(cls)
+        column = None if table is None else table.columns.get(attr)
+        if column is None:
+            return ()
+        if not column.numeric:
+            raise TypeError("{}.{} is not numeric".format(
+                self._name(cls), attr))
+        if numpy is not None:
+            return column.present_array()
+        return column.present()
+
+    def sum(self, cls, attr):
+        """Return the sum of a numeric attribute over a class."""
+        values = self._numbers(cls, attr)
+        if numpy is not None and len(values):
+            if _exact(values):
+                return values.sum().item()
+            values = values.tolist()
+        return sum(values)
+
+    def mean(self, cls, attr):
+        """Return the mean of a numeric attribute, None without values."""
+        values = self._numbers(cls, attr)
+        if numpy is not None:
+            if not len(values):
+                return None
+            if _exact(values):
+                return values.mean().item()
+            values = values.tolist()
+        if not isinstance(values, (array, list)):
+            values = list(values)
+        if not values:
+            return None
+        return sum(values) / len(values)
+
+    def _extreme(self, cls, attr, func):
+        """Return the 'min' or 'max' of a numeric attribute, or None."""
+        values = self._numbers(cls, attr)
+        if numpy is not None:
+            if not len(values):
+                return None
+            if not numpy.isnan(values).any():
+                return getattr(values, func)().item()
+            values = values.tolist()
+        return (min if func == 'min' else max)(values, default=None)
+
+    def min(self, cls, attr):
+        """Return the smallest value of a numeric attribute, or None."""
+        return self._extreme(cls, attr, 'min')
+
+    def max(self, cls, attr):
+        """Return the largest value of a numeric attribute, or None."""
+        return self._extreme(cls, attr, 'max')
+
+    def group_by(self, cls, key, attr=None, agg='count'):
+        """Aggregate the objects of a class by the value of `key`.
+
+        Objects without `key`, and without `attr` for aggregates other
+        than 'count', are left out.
+
+        Args:
+            cls (type or str): The model class.
+            key (str): The attribute to group by.
+            attr (str): The numeric attribute to aggregate.
+            agg (str): 'count', 'sum', 'mean', 'min' or 'max'.
+
+        Returns:
+            dict: The aggregate of each `key` value.
+
+        Raises:
+            ValueError: If `agg` is unknown, or needs an `attr`.
+            TypeError: If `attr` is not numeric.
+        """
+        if agg not in _AGGREGATES:
+            raise ValueError("unknown aggregate: {!r}".format(agg))
+        if attr is None and agg != 'count':
+            raise ValueError("{} needs an attribute".format(agg))
+        table = self._table(cls)
+        column = None if table is None else table.columns.get(key)
+        if column is None:
+            return {}
+        values = None
+        if attr is not None:
+            values = table.columns.get(attr)
+            if values is None:
+                return {}
+            if not values.numeric:
+                raise TypeError("{}.{} is not numeric".format(
+                    self._name(cls), attr))
+        grouped = None if numpy is None else column.group_codes()
+        if grouped is not None:
+            groups = _grouped(grouped[0], grouped[1], values, agg)
+            if groups is not NotImplemented:
+                return groups
+        keys, missing = column.keys()
+        if attr is None:
+            counts = Counter(keys)
+            counts.pop(missing, None)
+            return {column.decode_key(k): n for k, n in counts.items()}
+        counts = Counter(compress(keys, values.mask))
+        pairs = compress(zip(keys, values.values), values.mask)
+        if agg == 'count':
+            groups = counts
+        elif agg in ('sum', 'mean'):
+            groups = dict.fromkeys(counts, 0)
+            for k, v in pairs:
+                groups[k] += v
+            if agg == 'mean':
+                groups = {k: s / counts[k] for k, s in groups.items()}
+        else:
+            groups = {}
+            better = min if agg == 'min' else max
+            for k, v in pairs:
+                groups[k] = better(groups.get(k, v), v)
+        groups.pop(missing, None)
+        return {column.decode_key(k): v for k, v in groups.items()}
@@ -0,0 +1,215 @@
+#!/usr/bin/python3
+"""
+index.py
+
+This module defines the AttributeIndex class, a secondary index storage
+engines keep on the attributes a model lists in `__indexes__`. It maps
+attribute values to object keys with a hash table for equality lookups
+and keeps numbers and strings sorted for range lookups. Keys of equal
+values are kept in key order, so that a (value, key) pair marks one
+position in the sequence, which `ordered` and `range` can resume after.
+
+Examples:
+    >>> index = AttributeIndex('price')
+    >>> index.add('Place.1', 120)
+    >>> index.add('Place.2', 80)
+    >>> index.add('Place.3', 120)
+    >>> sorted(index.equal(120))
+    ['Place.1', 'Place.3']
+    >>> list(index.range(50, 100))
+    ['Place.2']
+"""
+
+from bisect import bisect_left, bisect_right, insort
+
+_MISSING = object()
+# The order of the value families: numbers, strings, then other values.
+_RANKS = {float: 0, str: 1, None: 2}
+
+
+def sort_key(value):
+    """Return a key ordering values like `AttributeIndex.ordered`."""
+    family = _family(value)
+    if family is float:
+        return (0, value)
+    if family is str:
+        return (1, value)
+    return (2, 0)
+
+
+def _family(value):
+    """Return the sorted list family of a value, None if unsortable."""
+    if isinstance(value, str):
+        return str
+    if isinstance(value, (int, float)) and value == value:
+        return float
+    return None
+
+
+class AttributeIndex:
+    """Hash and sorted index of one attribute over a set of objects.
+
+    Unhashable values are left out of the hash index, and values other
+    than numbers and strings out of the sorted one.
+
+    Attributes:
+        attr (str): The indexed attribute name.
+    """
+
+    def __init__(self, attr):
+        """Initialize an empty index on `attr`."""
+        self.attr = attr
+        self._values = {}
+        self._hash = {}
+        self._sorted = {str: ([], []), float: ([], [])}
+        self._others = []
+
+    def __len__(self):
+        """Return the number of indexed keys."""
+        return len(self._values)
+
+    def __contains__(self, key):
+        """Return True if `key` is indexed."""
+        return key in self._values
+
+    def add(self, key, value):
+        """Index `key` under `value`, replacing any previous value."""
+        if key in self._values:
+            if self._values[key] is value:
+                return
+            self.remove(key)
+        self._values[key] = value
+        try:
+            self._hash.setdefault(value, set()).add(key)
+        except TypeError:
+            pass
+        family = _family(value)
+        if family is None:
+            insort(self._others, key)
+            return
+        values, keys = self._sorted[family]
+        lo = bisect_left(values, value)
+        pos = bisect_left(keys, key, lo, bisect_right(values, value, lo))
+        values.insert(pos, value)
+        keys.insert(pos, key)
+
+    def add_object(self, key, obj):
+        """Index `key` under the attribute value of `obj`, if it has one."""
+        value = getattr(obj, self.attr, _MISSING)
+        if value is _MISSING:
+            self.remove(key)
+        else:
+            self.add(key, value)
+
+    def remove(self, key):
+        """Remove `key` from the index, if present."""
+        value = self._values.pop(key, _MISSING)
+        if value is _MISSING:
+            return
+        try:
+            keys = self._hash.get(value)
+        except TypeError:
+            keys = None
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._hash[value]
+        family = _family(value)
+        if family is None:
+            del self._others[bisect_left(self._others, key)]
+            return
+        values, keys = self._sorted[family]
+        lo = bisect_left(values, value)
+        pos = bisect_left(keys, key, lo, bisect_right(values, value, lo))
+        del values[pos]
+        del keys[pos]
+
+    def equal(self, value):
+        """Return the set of keys whose value equals `value`."""
+        try:
+            return set(self._hash.get(value, ()))
+        except TypeError:
+            return {k for k, v in self._values.items() if v == value}
+
+    def _resume(self, family, start, stop, after, reverse):
+        """Narrow positions in the keys of a family to those past `after`.
+
+        Args:
+            family: The family of the keys, float, str or None.
+            start (int): The first position.
+            stop (int): The position past the last one.
+            after (tuple): The (value, key) position to resume after.
+            reverse (bool): Whether the keys are read backwards.
+
+        Returns:
+            tuple: The narrowed start and stop positions.
+        """
+        value, key = after
+        cursor = _family(value)
+        if cursor is not family:
+            if (_RANKS[family] < _RANKS[cursor]) != reverse:
+                return start, start
+            return start, stop
+        if family is None:
+            keys, lo, hi = self._others, 0, len(self._others)
+        else:
+            values, keys = self._sorted[family]
+            lo = bisect_left(values, value)
+            hi = bisect_right(values, value, lo)
+        if reverse:
+            return start, min(stop, bisect_left(keys, key, lo, hi))
+        return max(start, bisect_right(keys, key, lo, hi)), stop
+
+    def ordered(self, reverse=False, after=None):
+        """Yield every indexed key in value order.
+
+        Numbers come first, then strings, then the other values, and keys
+        of equal values in key order; `reverse` reverses the whole
+        sequence. `after`, a (value, key) pair, starts right past that
+        position, whether the key is still indexed or not.
+        """
+        families = [float, str, None]
+        if reverse:
+            families.reverse()
+        for family in families:
+            keys = self._others if family is None else \
+                self._sorted[family][1]
+            start, stop = 0, len(keys)
+            if after is not None:
+                start, stop = self._resume(family, start, stop, after,
+                                           reverse)
+            positions = range(start, stop)
+            if reverse:
+                positions = reversed(positions)
+            for pos in positions:
+                yield keys[pos]
+
+    def range(self, low=None, high=None, include_low=True,
+              include_high=True, reverse=False, after=None):
+        """Yield the keys whose value lies between `low` and `high`.
+
+        Keys come in value order, then key order. Bounds must be both
+        numbers or both strings; a missing bound leaves that side open.
+        `after` starts past a (value, key) position, like in `ordered`.
+
+        Raises:
+            TypeError: If a bound is neither a number nor a string.
+        """
+        family = _family(low if low is not None else high)
+        if family is None:
+            raise TypeError("range bounds must be numbers or strings")
+        values, keys = self._sorted[family]
+        start, stop = 0, len(values)
+        if low is not None:
+            start = (bisect_left if include_low else bisect_right)(
+                values, low)
+        if high is not None:
+            stop = (bisect_right if include_high else bisect_left)(
+                values, high)
+        if after is not None:
+            start, stop = self._resume(family, start, stop, after, reverse)
+        positions = range(start, stop)
+        if reverse:
+            positions = reversed(positions)
+        for pos in positions:
+            yield keys[pos]
@@ -0,0 +1,242 @@
+#!/usr/bin/python3
+"""
+json_stream.py
+
+This module serializes collections of BaseModel objects to JSON one
+object at a time, so the memory needed does not grow with the number of
+objects. Two layouts are supported: a JSON array of `to_dict()`
+dictionaries and NDJSON, one dictionary per line.
+
+Examples:
+    >>> from models.base_model import BaseModel
+    >>> objs = BaseModel.create_many(2)
+    >>> text = ''.join(iter_json(objs))
+    >>> text.startswith('[{') and text.endswith('}]')
+    True
+    >>> len(''.join(iter_json(objs, ndjson=True)).splitlines())
+    2
+"""
+
+import codecs
+import io
+import json
+import re
+
+from models.base_model import classes
+
+_encode = json.JSONEncoder().encode
+_decode = json.JSONDecoder().raw_decode
+_WS = re.compile(r'[ \t\n\r]*')
+# The first key of a top-level object and the first character of its value:
+# '{' for a mapping of keys to objects, anything else for an NDJSON line.
+_FIRST_KEY = re.compile(r'\{\s*(?:\}|"(?:[^"\\]|\\.)*"\s*:\s*(\S))')
+
+
+def iter_json(objs, ndjson=False):
+    """Yield the JSON encoding of `objs` one object at a time.
+
+    Args:
+        objs (iterable): BaseModel instances, or a mapping of them such as
+            the one returned by a storage engine's `all()`.
+        ndjson (bool): Yield one line per object instead of a JSON array.
+
+    Yields:
+        str: Consecutive chunks of the document.
+    """
+    if hasattr(objs, 'values'):
+        objs = objs.values()
+    if ndjson:
+        for obj in objs:
+            yield _encode(obj.to_dict()) + '\n'
+        return
+    sep = '['
+    for obj in objs:
+        yield sep + _encode(obj.to_dict())
+        sep = ', '
+    yield '[]' if sep == '[' else ']'
+
+
+def dump(objs, fp, ndjson=False, buffer_size=65536):
+    """Write the JSON encoding of `objs` to a file-like object.
+
+    Chunks are gathered until `buffer_size` characters are pending, then
+    written in one call. Binary streams, such as files opened in 'wb'
+    mode or `socket.makefile('wb')`, receive UTF-8 bytes.
+
+    Args:
+        objs (iterable): BaseModel instances or a mapping of them.
+        fp: An object with a `write` method.
+        ndjson (bool): Write NDJSON instead of a JSON array.
+        buffer_size (int): Characters to gather before each write.
+
+    Returns:
+        int: The number of characters written.
+
+    Raises:
+        ValueError: If `buffer_size` is not positive.
+    """
+    if buffer_size < 1:
+        raise ValueError("buffer_size must be positive")
+    binary = isinstance(fp, (io.RawIOBase, io.BufferedIOBase))
+    write = fp.write
+    pending = []
+    size = total = 0
+    for chunk in iter_json(objs, ndjson):
+        pending.append(chunk)
+        size += len(chunk)
+        if size >= buffer_size:
+            data = ''.join(pending)
+            write(data.encode('utf-8') if binary else data)
+            total += size
+            pending = []
+            size = 0
+    if pending:
+        data = ''.join(pending)
+        write(data.encode('utf-8') if binary else data)
+        total += size
+    return total
+
+
+class _Reader:
+    """A read buffer over a text or binary stream."""
+
+    def __init__(self, fp, chunk_size):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.decode = None
+        if isinstance(fp, (io.RawIOBase, io.BufferedIOBase)):
+            self.decode = codecs.getincrementaldecoder('utf-8')().decode
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        """Read one more chunk, dropping what was consumed.
+
+        Returns:
+            bool: False once the stream is exhausted.
+        """
+        if self.eof:
+            return False
+        data = self.fp.read(self.chunk_size)
+        if self.decode is not None:
+            data = self.decode(data, not data)
+        if not data:
+            self.eof = True
+        self.buf = self.buf[self.pos:] + data
+        self.pos = 0
+        return not self.eof
+
+    def peek(self):
+        """Return the next non-whitespace character, '' at the end."""
+        while True:
+            m = _WS.match(self.buf, self.pos)
+            self.pos = m.end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                return ''
+
+    def sniff(self, pattern):
+        """Match `pattern` at the current position without consuming it.
+
+        Returns:
+            re.Match: The match, or None if the stream cannot match.
+        """
+        while True:
+            m = pattern.match(self.buf, self.pos)
+            if m is not None or not self.fill():
+                return m
+
+    def expect(self, char):
+        """Consume `char` as the next non-whitespace character."""
+        if self.peek() != char:
+            raise ValueError("expected {!r} at offset {}".format(
+                char, self.pos))
+        self.pos += 1
+
+    def value(self):
+        """Decode the next complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = _decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            if end == len(self.buf) and not self.eof:
+                # A number may continue in the next chunk.
+                if self.fill():
+                    continue
+            self.pos = end
+            return value
+
+
+def _iter_dicts(reader):
+    """Yield the dictionaries of an array, mapping or NDJSON document."""
+    first = reader.peek()
+    if first == '':
+        return
+    if first == '[':
+        reader.expect('[')
+        if reader.peek() == ']':
+            return
+        while True:
+            yield reader.value()
+            if reader.peek() == ']':
+                return
+            reader.expect(',')
+    m = reader.sniff(_FIRST_KEY)
+    if m is not None and m.group(1) not in (None, '{'):
+        # NDJSON: one object per line.
+        while reader.peek() == '{':
+            yield reader.value()
+        if reader.peek():
+            raise ValueError("trailing data at offset {}".format(
+                reader.pos))
+        return
+    reader.expect('{')
+    if reader.peek() == '}':
+        return
+    while True:
+        reader.value()
+        reader.expect(':')
+        yield reader.value()
+        if reader.peek() == '}':
+            return
+        reader.expect(',')
+
+
+def iter_load(fp, chunk_size=65536, registry=None):
+    """Rebuild the BaseModel objects of a JSON document incrementally.
+
+    The document is read `chunk_size` characters at a time and each object
+    is yielded as soon as it is decoded. Three layouts are accepted: a
+    JSON array of `to_dict()` dictionaries, NDJSON, and the mapping of
+    `<class>.<id>` keys to dictionaries written by a file storage engine.
+    The class of each object comes from the `__class__` key.
+
+    Args:
+        fp: A text or binary file-like object open for reading.
+        chunk_size (int): Characters or bytes to read at a time.
+        registry (dict): Model classes by name, `models.base_model.classes`
+            by default.
+
+    Yields:
+        BaseModel: The rebuilt objects, marked clean.
+
+    Raises:
+        ValueError: If the document is malformed or names an unknown
+            class.
+    """
+    if registry is None:
+        registry = classes
+    for d in _iter_dicts(_Reader(fp, chunk_size)):
+        try:
+            cls = registry[d['__class__']]
+        except (KeyError, TypeError):
+            raise ValueError("unknown model class in {!r}".format(d))
+        obj = cls(**d)
+        obj.mark_clean()
+        yield obj
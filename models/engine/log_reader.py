@@ -0,0 +1,262 @@
+#!/usr/bin/python3
+"""
+log_reader.py
+
+This module defines the LogReader class, a read-only path over the logs
+written by LogStorage: one object is decoded without replaying the rest
+of the log. The log is opened through `mmap`, and an offset index maps
+each `<class>.<id>` key to the byte range of its latest "put" record.
+
+The index is kept next to the log, in `<log>.idx`, so it survives the
+process. It is append-only like the log: its first line holds the inode
+of the log it describes, and each following line the log size covered so
+far with the keys changed since the previous line, null for the deleted
+ones. When the log grows, only the new records are read and one line is
+added; a log replaced by a compaction, or truncated, is indexed anew.
+The index is a cache and can be deleted at any time.
+
+Examples:
+    >>> import os, tempfile
+    >>> from models.base_model import BaseModel
+    >>> from models.engine.log_storage import LogStorage
+    >>> path = os.path.join(tempfile.mkdtemp(), 'file.log')
+    >>> storage = LogStorage(path)
+    >>> base = BaseModel(name="first")
+    >>> storage.new(base)
+    >>> storage.save()
+    >>> reader = LogReader(path)
+    >>> reader.get(BaseModel, base.id).name
+    'first'
+    >>> base.name = "second"
+    >>> storage.save()
+    >>> reader.get('BaseModel', base.id).name
+    'second'
+    >>> storage.close()
+    >>> reader.close()
+"""
+
+import mmap
+import os
+
+from models.base_model import classes
+from models.engine.codec import get_codec
+
+
+class _MappedLog:
+    """One log file, its memory map and its offset index.
+
+    Attributes:
+        path (str): The log file.
+        offsets (dict): The (start, end) byte range of each key's record.
+        size (int): The bytes of the log covered by `offsets`.
+    """
+
+    def __init__(self, path, codec):
+        """Initialize the reader of the log at `path`, not mapped yet."""
+        self.path = path
+        self.codec = codec
+        self.offsets = {}
+        self.size = 0
+        self._inode = None
+        self._map = None
+        self._index_end = 0
+
+    def _apply(self, changes):
+        """Update the offsets with the ranges of an index line."""
+        offsets = self.offsets
+        for key, span in changes.items():
+            if span is None:
+                offsets.pop(key, None)
+            else:
+                offsets[key] = span
+
+    def _read_index(self):
+        """Load the persisted index if it describes the current log.
+
+        A line torn by a crash, and everything after it, is ignored and
+        overwritten by the next update.
+        """
+        self.offsets = {}
+        self.size = 0
+        self._index_end = 0
+        try:
+            f = open(self.path + '.idx', 'rb')
+        except FileNotFoundError:
+            return
+        with f:
+            header = f.readline()
+            try:
+                if self.codec.decode(header) != [self._inode]:
+                    return
+            except ValueError:
+                return
+            end = len(header)
+            for line in f:
+                try:
+                    size, changes = self.codec.decode(line)
+                except ValueError:
+                    break
+                self._apply(changes)
+                self.size = size
+                end += len(line)
+            self._index_end = end
+
+    def _write_index(self, changes):
+        """Append one line of changes to the persisted index."""
+        if self._index_end:
+            f = open(self.path + '.idx', 'r+b')
+            f.seek(self._index_end)
+            f.truncate()
+        else:
+            f = open(self.path + '.idx', 'wb')
+            f.write(self.codec.encode([self._inode]) + b'\n')
+        with f:
+            f.write(self.codec.encode([self.size, changes]) + b'\n')
+            self._index_end = f.tell()
+
+    def _scan(self):
+        """Index the complete records past the covered size.
+
+        Returns:
+            dict: The new range of each key put, None for deleted keys.
+        """
+        data = self._map
+        decode = self.codec.decode
+        start = self.size
+        end = data.rfind(b'\n', start) + 1
+        changes = {}
+        if end <= start:
+            return changes
+        pos = start
+        while pos < end:
+            stop = data.find(b'\n', pos, end)
+            op, arg = decode(data[pos:stop])
+            if op == "put":
+                key = "{}.{}".format(arg['__class__'], arg['id'])
+                changes[key] = [pos, stop]
+            else:
+                changes[arg] = None
+            pos = stop + 1
+        self.size = end
+        return changes
+
+    def refresh(self):
+        """Catch up with the records appended since the last call."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            self.close()
+            self.offsets = {}
+            self.size = 0
+            self._inode = None
+            return
+        if st.st_ino != self._inode or st.st_size < self.size:
+            self.close()
+            self._inode = st.st_ino
+            self._read_index()
+            if self.size > st.st_size:
+                self.offsets = {}
+                self.size = 0
+                self._index_end = 0
+        if st.st_size == 0:
+            return
+        if self._map is None or len(self._map) < st.st_size:
+            self.close()
+            with open(self.path, 'rb') as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) > self.size:
+            changes = self._scan()
+            if changes:
+                self._apply(changes)
+                self._write_index(changes)
+
+    def _record(self, key):
+        """Decode the record of a key, or return None if it is not there.
+        """
+        span = self.offsets.get(key)
+        if span is None:
+            return None
+        try:
+            op, d = self.codec.decode(self._map[span[0]:span[1]])
+            if op == "put" and "{}.{}".format(d['__class__'], d['id']) == key:
+                return d
+        except (ValueError, TypeError, KeyError):
+            pass
+        return False
+
+    def get(self, key):
+        """Return the latest `to_dict()` output stored for a key, or None.
+
+        An index left by an older log that reused the inode points at the
+        wrong bytes; it is then rebuilt from the log.
+        """
+        d = self._record(key)
+        if d is False:
+            self.offsets = {}
+            self.size = 0
+            self._index_end = 0
+            self.refresh()
+            d = self._record(key)
+        return d
+
+    def close(self):
+        """Unmap the log, mapped again on the next refresh."""
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+
+class LogReader:
+    """Read-only access to single objects of a LogStorage log.
+
+    The returned objects are detached: they are not the instances of a
+    LogStorage, and changing them does not change the log. Use a
+    LogStorage to write. Only logs in the JSON record format are read.
+    """
+
+    def __init__(self, path='file.log', codec=None):
+        """Initialize a reader over the log at `path`.
+
+        Args:
+            path (str): The log file, or the directory of the class logs
+                of a LogStorage using `shard_by_class`.
+            codec (str): The JSON codec name, see `models.engine.codec`.
+        """
+        self._path = path
+        self._codec = get_codec(codec)
+        self._logs = {}
+
+    def _log(self, name):
+        """Return the mapped log holding the records of a class."""
+        path = self._path
+        if os.path.isdir(path):
+            path = os.path.join(path, name + '.log')
+        log = self._logs.get(path)
+        if log is None:
+            log = self._logs[path] = _MappedLog(path, self._codec)
+        return log
+
+    def get(self, cls, id):
+        """Return one object by class and id, or None if it is not stored.
+
+        Records appended since the previous call are indexed first, so
+        the object is read as of the last save.
+
+        Args:
+            cls (type or str): The model class.
+            id (str): The object id.
+        """
+        name = cls if isinstance(cls, str) else cls.__name__
+        log = self._log(name)
+        log.refresh()
+        d = log.get("{}.{}".format(name, id))
+        if d is None:
+            return None
+        obj = classes[d['__class__']](**d)
+        obj.mark_clean()
+        return obj
+
+    def close(self):
+        """Unmap every log."""
+        for log in self._logs.values():
+            log.close()
@@ -0,0 +1,903 @@
+#!/usr/bin/python3
+"""
+log_storage.py
+
+This module defines the LogStorage class, a storage engine that persists
+objects as an append-only log instead of rewriting a whole JSON file on
+every save. Each save appends one record per created, updated or
+destroyed object, so its cost depends on the size of the changes only.
+
+The log holds one JSON array per line:
+    ["put", {...to_dict() output...}]
+    ["del", "<class>.<id>"]
+
+With `record_format='binary'`, each record is instead a uint32 length
+followed by an op byte and a body: 's' defines a record layout, 'p'
+holds the `to_bytes()` output written with the layouts of the log, and
+'d' the class name (uint8 length) and id. Such logs are several times
+smaller and faster to reload; a log must be opened with the format it
+was written in.
+
+Reloading replays the log. Once superseded records pass a threshold, the
+log is compacted in a background thread into the latest record of each
+saved object.
+
+With `shard_by_class`, the path is a directory holding one log per model
+class, `<class>.log`: a save only touches the logs of the changed
+classes, each log is compacted on its own, and `reload(cls)` reads one.
+Adding `lazy` makes `reload` only list the class logs; each one is
+replayed the first time its class is accessed.
+
+Where NumPy is installed, `query` filters and aggregates on numbers run
+over arrays cached per class, see `models.engine.vector`.
+
+Examples:
+    >>> import os, tempfile
+    >>> from models.base_model import BaseModel
+    >>> path = os.path.join(tempfile.mkdtemp(), 'file.log')
+    >>> storage = LogStorage(path)
+    >>> base = BaseModel()
+    >>> storage.new(base)
+    >>> storage.save()
+    >>> other = LogStorage(path)
+    >>> other.reload()
+    >>> other.all()['BaseModel.' + base.id].to_dict() == base.to_dict()
+    True
+"""
+
+import errno
+import io
+import os
+import struct
+import threading
+import time
+
+from models.base_model import classes, watchers
+from models.binary import Schemas
+from models.engine.codec import get_codec
+from models.engine.index import AttributeIndex
+from models.engine.query import Query
+from models.engine.transaction import Transactional
+from models.engine.vector import ColumnCache, numpy
+
+_DURABILITY = ('none', 'batch', 'save')
+_LENGTH = struct.Struct('<I')
+
+
+def _fsync_dir(path):
+    """Flush the directory entry of `path`, after a rename or creation."""
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class _JSONRecords:
+    """The JSON record format, one array per line."""
+
+    def __init__(self, codec):
+        """Initialize the format over a JSON codec."""
+        self.encode = codec.encode
+        self.decode = codec.decode
+
+    def put(self, obj, shard):
+        """Return the record storing an object in a shard."""
+        return self.encode(["put", obj.to_dict()]) + b'\n'
+
+    def delete(self, key):
+        """Return the record removing the object of a key."""
+        return self.encode(["del", key]) + b'\n'
+
+    def scan(self, f, schemas):
+        """Yield the key, payload and size of each record of a log.
+
+        The payload of a deletion is None. Reading stops at a record
+        truncated by a crash. JSON records need no `schemas`.
+
+        Raises:
+            ValueError: If a complete record is not valid JSON.
+        """
+        decode = self.decode
+        for line in f:
+            try:
+                op, arg = decode(line)
+            except ValueError:
+                if line.endswith(b'\n'):
+                    raise
+                return
+            if op == "put":
+                key = "{}.{}".format(arg['__class__'], arg['id'])
+                yield key, arg, len(line)
+            else:
+                yield arg, None, len(line)
+
+    @staticmethod
+    def build(d, schemas):
+        """Return the clean object of a "put" payload."""
+        obj = classes[d['__class__']](**d)
+        obj.mark_clean()
+        return obj
+
+
+class _BinaryRecords:
+    """The binary record format, length-prefixed `to_bytes` output.
+
+    Each class log holds its own layouts, see `models.binary.Schemas`:
+    a layout is written just before the first record using it.
+    """
+
+    @staticmethod
+    def _record(op, data):
+        """Frame the body of a record."""
+        return _LENGTH.pack(len(data) + 1) + op + data
+
+    def put(self, obj, shard):
+        """Return the record storing an object in a shard."""
+        schemas = shard.schemas
+        if schemas is None:
+            schemas = shard.schemas = Schemas()
+            try:
+                with open(shard.path, 'rb') as f:
+                    for _ in self.scan(f, schemas):
+                        pass
+            except FileNotFoundError:
+                pass
+        data = obj.to_bytes(schemas)
+        records = [self._record(b's', layout) for layout in schemas.unsaved]
+        schemas.unsaved.clear()
+        records.append(self._record(b'p', data))
+        return b''.join(records)
+
+    def delete(self, key):
+        """Return the record removing the object of a key."""
+        name, _, id = key.partition('.')
+        name = name.encode('utf-8')
+        return self._record(b'd', bytes((len(name),)) + name +
+                            id.encode('utf-8'))
+
+    def scan(self, f, schemas):
+        """Yield the key, payload and size of each record of a log.
+
+        The payload of a deletion is None, and that of a put the record,
+        decoded only by `build`. A layout is added to `schemas` and
+        yielded with a None key. Reading stops at a record truncated by
+        a crash.
+        """
+        data = f.read()
+        end = len(data)
+        pos = 0
+        while pos + 4 <= end:
+            start = pos + 4
+            stop = start + _LENGTH.unpack_from(data, pos)[0]
+            if stop > end:
+                return
+            op = data[start]
+            body = data[start + 1:stop]
+            if op == 0x70:  # p
+                name, id = schemas.identify(body)
+                yield name + '.' + id, body, stop - pos
+            elif op == 0x73:  # s
+                schemas.define(body)
+                yield None, None, stop - pos
+            else:
+                name = body[1:1 + body[0]].decode('utf-8')
+                id = body[1 + body[0]:].decode('utf-8')
+                yield "{}.{}".format(name, id), None, stop - pos
+            pos = stop
+
+    @staticmethod
+    def build(data, schemas):
+        """Return the clean object of a "put" payload."""
+        obj = classes[schemas.name(data)].from_bytes(data, schemas)
+        obj.mark_clean()
+        return obj
+
+
+class _Shard:
+    """One log file and its append handle.
+
+    Attributes:
+        path (str): The log file.
+        records (int): The number of object records in the file.
+        schemas (Schemas): The layouts of binary records in the file,
+            or None until read.
+    """
+
+    def __init__(self, path):
+        """Initialize the shard of the log at `path`."""
+        self.path = path
+        self.records = 0
+        self.schemas = None
+        self.file = None
+
+    def append(self, records):
+        """Write records at the end of the log."""
+        if self.file is None:
+            created = not os.path.exists(self.path)
+            self.file = open(self.path, 'ab')
+            if created:
+                _fsync_dir(self.path)
+        self.file.write(b''.join(records))
+        self.file.flush()
+        self.records += len(records)
+
+    def sync(self):
+        """Flush the appended records to the disk."""
+        if self.file is not None:
+            try:
+                os.fsync(self.file.fileno())
+            except OSError as e:
+                # Special files, like /dev/null, have nothing to sync.
+                if e.errno != errno.EINVAL:
+                    raise
+
+    def close(self):
+        """Sync and close the append handle, reopened on the next write."""
+        if self.file is not None:
+            try:
+                self.sync()
+            finally:
+                self.file.close()
+                self.file = None
+
+    def replay(self, fmt):
+        """Read the log, dropping a record truncated by a crash.
+
+        Args:
+            fmt: The record format of the log.
+
+        Returns:
+            dict: The payload of the latest record of each live key.
+        """
+        self.close()
+        self.schemas = Schemas()
+        latest = {}
+        records = 0
+        good = 0
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            self.records = 0
+            return latest
+        with f:
+            for key, payload, size in fmt.scan(f, self.schemas):
+                good += size
+                if key is None:
+                    continue
+                if payload is None:
+                    latest.pop(key, None)
+                else:
+                    latest[key] = payload
+                records += 1
+        if good < os.path.getsize(self.path):
+            os.truncate(self.path, good)
+        self.records = records
+        return latest
+
+
+class LogStorage(Transactional):
+    """Storage engine keeping objects in memory and changes in a log.
+
+    Attributes:
+        compact_ratio (float): Share of garbage records in the log above
+            which a compaction starts.
+        compact_min (int): Minimum number of garbage records before a
+            compaction starts.
+        durability (str): 'none', 'batch' or 'save', see `__init__`.
+        fsync_window (float): Seconds a batch fsync waits for more saves.
+        codec (Codec): The JSON codec of the records.
+    """
+
+    def __init__(self, path='file.log', compact_ratio=0.5, compact_min=1000,
+                 durability='batch', fsync_window=0,
+                 shard_by_class=False, lazy=False, codec=None,
+                 record_format='json'):
+        """Initialize an empty storage over the log at `path`.
+
+        Args:
+            path (str): The log file, or the directory of the class logs
+                with `shard_by_class`.
+            compact_ratio (float): See the class attributes.
+            compact_min (int): See the class attributes.
+            durability (str): When appended records reach the disk:
+                'none' leaves it to the OS, 'save' calls fsync in every
+                save, and 'batch' group-commits: every save returns once
+                its records are synced, but saves from other threads
+                that append while an fsync runs share the next one.
+                A single thread's saves therefore each wait for their
+                own fsync, like with 'save': 'batch' only pays off
+                with concurrent writers.
+            fsync_window (float): Seconds the save leading a batch fsync
+                waits for other saves to join it. Each batch save then
+                takes that much longer, so it only helps concurrent
+                writers too.
+            shard_by_class (bool): Keep one log per model class.
+            lazy (bool): Replay a class log on first access to the class
+                instead of in `reload`. Requires `shard_by_class`.
+            codec (str): The JSON codec name, see `models.engine.codec`.
+            record_format (str): 'json', or 'binary' for the smaller and
+                faster `to_bytes` records.
+
+        Raises:
+            ValueError: If `durability` or `record_format` is not known,
+                or `lazy` is set without `shard_by_class`.
+        """
+        if durability not in _DURABILITY:
+            raise ValueError("durability must be one of {}".format(
+                ', '.join(_DURABILITY)))
+        if record_format not in ('json', 'binary'):
+            raise ValueError("record_format must be 'json' or 'binary'")
+        if lazy and not shard_by_class:
+            raise ValueError("lazy loading requires shard_by_class")
+        self.compact_ratio = compact_ratio
+        self.compact_min = compact_min
+        self.durability = durability
+        self.fsync_window = fsync_window
+        self.shard_by_class = shard_by_class
+        self.lazy = lazy
+        self.codec = get_codec(codec)
+        self.record_format = record_format
+        if record_format == 'binary':
+            self._records = _BinaryRecords()
+        else:
+            self._records = _JSONRecords(self.codec)
+        self._unloaded = set()
+        self._shards = {}
+        self._unsynced = set()
+        self._appended = 0
+        self._durable = 0
+        self._syncing = False
+        self._sync_failure = None
+        # Reentrant, for a signal handler saving while this thread holds it.
+        self._synced = threading.Condition(threading.RLock())
+        self._in_sync = threading.local()
+        self._path = path
+        self._objects = {}
+        self._by_class = {}
+        self._indexes = {}
+        self._columns = {}
+        self._new = set()
+        self._dirty = set()
+        self._deleted = set()
+        self._lock = threading.RLock()
+        self._compacting = threading.Lock()
+        self._compactor = None
+        watchers.add(self)
+
+    def _shard(self, name):
+        """Return the shard holding the objects of a class."""
+        if not self.shard_by_class:
+            name = None
+        shard = self._shards.get(name)
+        if shard is None:
+            path = self._path
+            if name is not None:
+                if not os.path.isdir(path):
+                    os.makedirs(path, exist_ok=True)
+                    _fsync_dir(path)
+                path = os.path.join(path, name + '.log')
+            shard = self._shards[name] = _Shard(path)
+        return shard
+
+    def _live(self, shard):
+        """Return the objects whose records belong to a shard."""
+        if not self.shard_by_class:
+            return self._objects
+        name = os.path.basename(shard.path)[:-len('.log')]
+        return self._by_class.get(name, {})
+
+    def _loaded(self, cls):
+        """Return the name of a class, replaying its log if not done yet."""
+        name = cls if isinstance(cls, str) else cls.__name__
+        if name in self._unloaded:
+            with self._lock:
+                if name in self._unloaded:
+                    self._unloaded.discard(name)
+                    self._load(self._shard(name))
+        return name
+
+    def _load_all(self):
+        """Replay every class log not loaded yet."""
+        for name in list(self._unloaded):
+            self._loaded(name)
+
+    @staticmethod
+    def _key(obj):
+        """Return the `<class>.<id>` key of an object."""
+        return "{}.{}".format(type(obj).__name__, obj.id)
+
+    def all(self, cls=None):
+        """Return the stored objects.
+
+        Args:
+            cls (type or str): Only return the objects of this class.
+
+        Returns:
+            dict: The objects by `<class>.<id>` key.
+        """
+        if cls is None:
+            self._load_all()
+            return self._objects
+        name = self._loaded(cls)
+        return dict(self._by_class.get(name, ()))
+
+    def get(self, cls, id):
+        """Return one object by class and id, or None if it is not stored.
+        """
+        name = self._loaded(cls)
+        return self._objects.get("{}.{}".format(name, id))
+
+    def count(self, cls=None):
+        """Return the number of stored objects, of one class or all."""
+        if cls is None:
+            self._load_all()
+            return len(self._objects)
+        name = self._loaded(cls)
+        return len(self._by_class.get(name, ()))
+
+    def _index(self, key, obj):
+        """Add an object to the attribute indexes of its class."""
+        cls = type(obj)
+        if not cls.__indexes__:
+            return
+        indexes = self._indexes.get(cls.__name__)
+        if indexes is None:
+            indexes = {a: AttributeIndex(a) for a in cls.__indexes__}
+            self._indexes[cls.__name__] = indexes
+        for index in indexes.values():
+            index.add_object(key, obj)
+
+    def object_dirtied(self, obj):
+        """Remember a stored object got written since it was saved."""
+        key = self._key(obj)
+        with self._lock:
+            if self._objects.get(key) is obj:
+                self._dirty.add(key)
+
+    def pending(self):
+        """Return the number of objects the next save will write."""
+        return len(self._new) + len(self._dirty) + len(self._deleted)
+
+    def attribute_changed(self, obj, name):
+        """Update the index of an attribute set or deleted on `obj`."""
+        key = self._key(obj)
+        with self._lock:
+            if self._objects.get(key) is obj:
+                self._indexes[type(obj).__name__][name].add_object(key, obj)
+
+    def find(self, cls, **criteria):
+        """Return the objects of a class whose attributes equal `criteria`.
+
+        Indexed attributes are looked up in their hash index; the other
+        criteria filter the remaining candidates.
+
+        Args:
+            cls (type or str): The model class.
+            **criteria: Attribute values to match.
+
+        Returns:
+            dict: The matching objects by `<class>.<id>` key.
+
+        Examples:
+            >>> storage = LogStorage('/dev/null')
+            >>> storage.find('User', email='a@b.c')
+            {}
+        """
+        name = self._loaded(cls)
+        objects = self._by_class.get(name, {})
+        indexes = self._indexes.get(name, {})
+        keys = None
+        rest = []
+        for attr, value in criteria.items():
+            if attr in indexes:
+                found = indexes[attr].equal(value)
+                keys = found if keys is None else keys & found
+            else:
+                rest.append((attr, value))
+        if keys is None:
+            candidates = objects.items()
+        else:
+            candidates = ((k, objects[k]) for k in keys)
+        missing = object()
+        return {k: obj for k, obj in candidates
+                if all(getattr(obj, a, missing) == v for a, v in rest)}
+
+    def find_range(self, cls, attr, low=None, high=None):
+        """Return the objects of a class with `attr` between two bounds.
+
+        Args:
+            cls (type or str): The model class.
+            attr (str): An attribute listed in the class `__indexes__`.
+            low: The inclusive lower bound, None for no bound.
+            high: The inclusive upper bound, None for no bound.
+
+        Returns:
+            dict: The matching objects by key, in attribute order.
+
+        Raises:
+            KeyError: If `attr` is not indexed for the class.
+        """
+        name = self._loaded(cls)
+        objects = self._by_class.get(name, {})
+        index = self._indexes.get(name, {}).get(attr)
+        if index is None:
+            if objects:
+                raise KeyError("{}.{} is not indexed".format(name, attr))
+            return {}
+        return {k: objects[k] for k in index.range(low, high)}
+
+    def query(self, cls):
+        """Return a lazy Query over the objects of a class.
+
+        Args:
+            cls (type or str): The model class.
+
+        Returns:
+            Query: A query using the class attribute indexes.
+        """
+        name = self._loaded(cls)
+        objects = self._by_class.get(name, {})
+        return Query(objects, self._indexes.get(name),
+                     self._column_cache(name, objects), name)
+
+    def _column_cache(self, name, objects):
+        """Return the up to date ColumnCache of a class, or None.
+
+        Objects written since they were added or saved, which are not
+        reported once dirty, get their rows read again.
+        """
+        if numpy is None or not objects:
+            return None
+        with self._lock:
+            cache = self._columns.get(name)
+            if cache is None or cache.objects is not objects:
+                cache = self._columns[name] = ColumnCache(objects)
+            prefix = name + '.'
+            cache.touch([k for keys in (self._new, self._dirty)
+                         for k in keys if k.startswith(prefix)])
+        return cache
+
+    def _invalidate(self, name):
+        """Drop the cached columns of a class after a change of its rows.
+        """
+        cache = self._columns.get(name)
+        if cache is not None:
+            cache.invalidate()
+
+    def new(self, obj):
+        """Add an object, written to the log at the next `save`."""
+        key = self._key(obj)
+        self._loaded(type(obj).__name__)
+        with self._lock:
+            self._objects[key] = obj
+            self._by_class.setdefault(type(obj).__name__, {})[key] = obj
+            self._index(key, obj)
+            self._invalidate(type(obj).__name__)
+            self._new.add(key)
+            self._deleted.discard(key)
+
+    def delete(self, obj=None):
+        """Remove an object, recorded in the log at the next `save`."""
+        if obj is None:
+            return
+        key = self._key(obj)
+        self._loaded(type(obj).__name__)
+        with self._lock:
+            if self._objects.pop(key, None) is not None:
+                name = type(obj).__name__
+                del self._by_class[name][key]
+                for index in self._indexes.get(name, {}).values():
+                    index.remove(key)
+                self._invalidate(name)
+                self._new.discard(key)
+                self._dirty.discard(key)
+                self._deleted.add(key)
+
+    def _flush(self):
+        """Append a record for every object changed since the last save.
+
+        New objects and objects with dirty attributes get a "put" record,
+        deleted objects a "del" record. Changed objects are reported by
+        `object_dirtied`, so the cost does not depend on the number of
+        stored objects.
+
+        Each object is marked clean before it is encoded, so that a write
+        from another thread during the flush dirties it again and is
+        saved next time. The changes are taken over at the start and put
+        back if a record cannot be encoded or written.
+        """
+        fmt = self._records
+        with self._lock:
+            new, dirty, deleted = self._new, self._dirty, self._deleted
+            self._new, self._dirty, self._deleted = set(), set(), set()
+            shards = {}
+            try:
+                for key in new | dirty:
+                    obj = self._objects.get(key)
+                    if obj is not None:
+                        obj.mark_clean()
+                        shard = self._shard(type(obj).__name__)
+                        shards.setdefault(shard, []).append(
+                            fmt.put(obj, shard))
+                for key in deleted:
+                    shards.setdefault(self._shard(key.partition('.')[0]),
+                                      []).append(fmt.delete(key))
+                for shard, records in shards.items():
+                    self._append(shard, records)
+            except BaseException:
+                self._new |= new
+                self._dirty |= dirty
+                self._deleted |= deleted
+                # Layouts of unwritten records are read from the log again.
+                for shard in shards:
+                    shard.schemas = None
+                raise
+            if not shards:
+                return
+            for key in new | dirty:
+                cache = self._columns.get(key.partition('.')[0])
+                if cache is not None:
+                    cache.touch((key,))
+            self._maybe_compact()
+            appended = self._appended
+        if self.durability == 'batch':
+            self._wait_synced(appended)
+
+    def _append(self, shard, lines):
+        """Write records at the end of a log, then sync as configured."""
+        shard.append(lines)
+        if self.durability == 'save':
+            shard.sync()
+        elif self.durability == 'batch':
+            self._unsynced.add(shard)
+            self._appended += 1
+
+    def _wait_synced(self, appended):
+        """Return once an fsync covered the first `appended` appends.
+
+        The first waiting save runs the fsync, after `fsync_window`; the
+        saves appending meanwhile wait for the next one, run by one of
+        them for all. A save from a signal handler interrupting this
+        thread in here or in `sync` returns without waiting, which could
+        deadlock: its records are left to the next fsync.
+
+        Raises:
+            OSError: If the fsync covering those appends failed.
+        """
+        if getattr(self._in_sync, 'active', False):
+            return
+        self._in_sync.active = True
+        try:
+            with self._synced:
+                while self._durable < appended:
+                    failure = self._sync_failure
+                    if failure is not None and failure[0] >= appended:
+                        raise failure[1]
+                    if self._syncing:
+                        self._synced.wait()
+                        continue
+                    self._syncing = True
+                    self._synced.release()
+                    try:
+                        if self.fsync_window:
+                            time.sleep(self.fsync_window)
+                        try:
+                            self.sync()
+                        except OSError:
+                            pass
+                    finally:
+                        self._synced.acquire()
+                        self._syncing = False
+                        self._synced.notify_all()
+        finally:
+            self._in_sync.active = False
+
+    def sync(self):
+        """Flush the appended records to the disk now.
+
+        Raises:
+            OSError: If an fsync fails. The batch saves it covered raise
+                it too.
+        """
+        active = getattr(self._in_sync, 'active', False)
+        self._in_sync.active = True
+        try:
+            with self._lock:
+                appended = self._appended
+                try:
+                    for shard in self._unsynced:
+                        shard.sync()
+                except OSError as e:
+                    with self._synced:
+                        self._sync_failure = (appended, e)
+                        self._synced.notify_all()
+                    raise
+                self._unsynced.clear()
+                with self._synced:
+                    self._durable = appended
+                    self._synced.notify_all()
+        finally:
+            self._in_sync.active = active
+
+    def reload(self, cls=None):
+        """Rebuild the objects by replaying the log.
+
+        A truncated last record, left by a crash during a write, is
+        dropped from the file.
+
+        Args:
+            cls (type or str): With `shard_by_class`, only replay the log
+                of this class, replacing its objects and keeping the
+                others. Otherwise every object is reloaded, or with
+                `lazy` every class log is listed to be replayed later.
+        """
+        with self._lock:
+            self.sync()
+            if cls is None or not self.shard_by_class:
+                for shard in self._shards.values():
+                    shard.close()
+                self._shards = {}
+                self._objects = {}
+                self._by_class = {}
+                self._indexes = {}
+                self._columns = {}
+                self._new.clear()
+                self._dirty.clear()
+                self._deleted.clear()
+                self._unloaded.clear()
+                names = [None]
+                if self.shard_by_class:
+                    try:
+                        files = sorted(os.listdir(self._path))
+                    except FileNotFoundError:
+                        files = []
+                    names = [f[:-len('.log')] for f in files
+                             if f.endswith('.log')]
+                if self.lazy:
+                    self._unloaded.update(names)
+                    names = []
+            else:
+                name = cls if isinstance(cls, str) else cls.__name__
+                prefix = name + '.'
+                for key in self._by_class.pop(name, {}):
+                    del self._objects[key]
+                self._indexes.pop(name, None)
+                self._columns.pop(name, None)
+                for keys in (self._new, self._dirty, self._deleted):
+                    keys.difference_update(
+                        [k for k in keys if k.startswith(prefix)])
+                self._unloaded.discard(name)
+                names = [name]
+            for name in names:
+                self._load(self._shard(name))
+
+    def _load(self, shard):
+        """Add the objects replayed from a shard."""
+        build = self._records.build
+        for key, payload in shard.replay(self._records).items():
+            obj = build(payload, shard.schemas)
+            name = type(obj).__name__
+            self._objects[key] = obj
+            self._by_class.setdefault(name, {})[key] = obj
+            self._index(key, obj)
+
+    def _maybe_compact(self):
+        """Start a background compaction if a log holds enough garbage."""
+        if self._compactor is not None:
+            return
+        for shard in self._shards.values():
+            garbage = shard.records - len(self._live(shard))
+            if (garbage >= self.compact_min and
+                    garbage >= shard.records * self.compact_ratio):
+                self._compactor = threading.Thread(
+                    target=self.compact, args=(shard,), daemon=True)
+                self._compactor.start()
+                return
+
+    def compact(self, shard=None):
+        """Rewrite logs with one record per object, as last saved.
+
+        The snapshot is written to a temporary file without holding the
+        lock. Records appended meanwhile are copied over before the
+        temporary file atomically replaces the log.
+
+        Args:
+            shard: The shard to compact, every shard by default.
+        """
+        with self._compacting:
+            try:
+                if shard is not None:
+                    self._compact(shard)
+                else:
+                    for shard in list(self._shards.values()):
+                        self._compact(shard)
+            finally:
+                self._compactor = None
+
+    def _snapshot(self, shard, offset, schemas):
+        """Return the latest record of each key in the first bytes of a log.
+
+        The snapshot is taken from the log rather than from the objects,
+        so that changes not saved yet, or dropped by a rollback, are not
+        written by a compaction.
+
+        Args:
+            shard: The shard of the log.
+            offset (int): The size of the log to read.
+            schemas (Schemas): Receives the layouts defined in those
+                bytes.
+
+        Returns:
+            tuple: The layout definitions, all kept in their order so
+                that records keep their layout index, and the object
+                records, as memoryviews over the log contents.
+        """
+        if not offset:
+            return [], []
+        with open(shard.path, 'rb') as log:
+            data = memoryview(log.read(offset))
+        layouts = []
+        latest = {}
+        pos = 0
+        for key, payload, size in self._records.scan(io.BytesIO(data),
+                                                     schemas):
+            if key is None:
+                layouts.append(data[pos:pos + size])
+            elif payload is None:
+                latest.pop(key, None)
+            else:
+                latest[key] = data[pos:pos + size]
+            pos += size
+        return layouts, list(latest.values())
+
+    def _compact(self, shard):
+        """Write the snapshot, copy the newer records and swap the files."""
+        with self._lock:
+            try:
+                offset = os.path.getsize(shard.path)
+            except FileNotFoundError:
+                offset = 0
+        schemas = Schemas()
+        layouts, lines = self._snapshot(shard, offset, schemas)
+        tmp = shard.path + '.tmp'
+        f = open(tmp, 'wb')
+        try:
+            f.write(b''.join(layouts))
+            f.write(b''.join(lines))
+            with self._lock:
+                tail = 0
+                if offset:
+                    with open(shard.path, 'rb') as log:
+                        log.seek(offset)
+                        size = 0
+                        for key, _, n in self._records.scan(log, schemas):
+                            tail += key is not None
+                            size += n
+                        log.seek(offset)
+                        f.write(log.read(size))
+                f.flush()
+                os.fsync(f.fileno())
+                f.close()
+                shard.close()
+                self._unsynced.discard(shard)
+                os.replace(tmp, shard.path)
+                _fsync_dir(shard.path)
+                shard.records = len(lines) + tail
+        finally:
+            f.close()
+
+    def close(self):
+        """Wait for a running compaction, then sync and close the logs."""
+        compactor = self._compactor
+        if compactor is not None:
+            compactor.join()
+        with self._lock:
+            self.sync()
+            for shard in self._shards.values():
+                shard.close()
@@ -0,0 +1,112 @@
+#!/usr/bin/python3
+"""
+object_cache.py
+
+This module defines the ObjectCache class, the identity map a storage
+engine keeps in front of a store larger than memory. It maps each
+`<class>.<id>` key to the one instance in use for it, so reading the same
+id twice returns the same object instead of building a new one.
+
+Every instance still referenced somewhere is found through a weak
+reference. On top of that, the `maxsize` most recently used instances are
+held strongly, so hot ids stay cached even when nothing else keeps them.
+
+Examples:
+    >>> from models.base_model import BaseModel
+    >>> cache = ObjectCache(maxsize=2)
+    >>> base = BaseModel()
+    >>> cache.add('BaseModel.' + base.id, base) is base
+    True
+    >>> cache.get('BaseModel.' + base.id) is base
+    True
+    >>> cache.get('BaseModel.missing') is None
+    True
+    >>> cache.hits, cache.misses
+    (1, 1)
+"""
+
+import weakref
+from collections import OrderedDict
+
+
+class ObjectCache:
+    """Identity map with a bounded set of recently used instances.
+
+    Attributes:
+        maxsize (int): The number of instances held strongly.
+        hits (int): Lookups answered by a cached instance.
+        misses (int): Lookups that found no instance.
+    """
+
+    def __init__(self, maxsize=1024):
+        """Initialize an empty cache.
+
+        Args:
+            maxsize (int): See the class attributes. 0 keeps only the
+                instances referenced elsewhere.
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._live = weakref.WeakValueDictionary()
+        self._recent = OrderedDict()
+
+    def __len__(self):
+        """Return the number of instances alive in the cache."""
+        return len(self._live)
+
+    def __contains__(self, key):
+        """Return True if an instance is cached for `key`."""
+        return key in self._live
+
+    def _touch(self, key, obj):
+        """Mark an instance as the most recently used one."""
+        if not self.maxsize:
+            return
+        recent = self._recent
+        recent[key] = obj
+        recent.move_to_end(key)
+        if len(recent) > self.maxsize:
+            recent.popitem(last=False)
+
+    def peek(self, key):
+        """Return the instance cached for `key`, or None.
+
+        Unlike `get`, this neither counts nor marks the instance used.
+        """
+        return self._live.get(key)
+
+    def get(self, key):
+        """Return the instance cached for `key`, or None, and count it."""
+        obj = self._live.get(key)
+        if obj is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._touch(key, obj)
+        return obj
+
+    def add(self, key, obj):
+        """Cache `obj` for `key`, unless an instance is already there.
+
+        Returns:
+            BaseModel: The cached instance, to be used instead of `obj`.
+        """
+        live = self._live.setdefault(key, obj)
+        self._touch(key, live)
+        return live
+
+    def replace(self, key, obj):
+        """Cache `obj` for `key`, dropping any previous instance."""
+        self._live[key] = obj
+        self._touch(key, obj)
+
+    def pop(self, key):
+        """Forget the instance cached for `key`."""
+        self._live.pop(key, None)
+        self._recent.pop(key, None)
+
+    def clear(self):
+        """Forget every instance; the counters are kept."""
+        self._live = weakref.WeakValueDictionary()
+        self._recent.clear()
@@ -0,0 +1,395 @@
+#!/usr/bin/python3
+"""
+query.py
+
+This module defines the Query class returned by a storage engine's
+`query(cls)` method. A query is built by chaining conditions, then read
+lazily: objects are filtered on their attributes, never through
+`to_dict`, and attribute indexes drive the scan when they can.
+
+When the engine passes a ColumnCache, see `models.engine.vector`,
+comparisons with numbers and the `count`, `sum`, `mean`, `min` and `max`
+aggregates run as NumPy array operations over the whole class.
+
+Examples:
+    >>> from models.base_model import BaseModel
+    >>> from models.engine.log_storage import LogStorage
+    >>> storage = LogStorage('/dev/null')
+    >>> for i in range(5):
+    ...     storage.new(BaseModel(id=str(i), rooms=i))
+    >>> q = storage.query(BaseModel).where('rooms', '>=', 2)
+    >>> [d['id'] for d in q.only('id').order_by('rooms', reverse=True)]
+    ['4', '3', '2']
+    >>> q = storage.query(BaseModel).where('rooms', '<', 3)
+    >>> q.count(), q.sum('rooms'), q.mean('rooms'), q.max('rooms')
+    (3, 3, 1.0, 2)
+"""
+
+import heapq
+import operator
+from bisect import bisect_left, bisect_right
+from itertools import islice
+
+from models.engine.index import sort_key
+
+_OPS = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    'in': lambda value, options: value in options,
+}
+_MISSING = object()
+
+
+class Query:
+    """A lazy, chainable query over the objects of one model class.
+
+    The `where`, `only`, `order_by`, `limit`, `offset` and `after`
+    methods return the query itself. Iterating it yields the matching
+    objects, or dictionaries of the requested fields after `only`; the
+    aggregate methods return one value over them.
+    """
+
+    def __init__(self, objects, indexes=None, columns=None, name=None):
+        """Initialize a query.
+
+        Args:
+            objects (dict): The objects of the class by key.
+            indexes (dict): AttributeIndex objects by attribute name.
+            columns (ColumnCache): The numeric columns of the objects.
+            name (str): The class name, which prefixes the keys.
+        """
+        self._name = name
+        self._objects = objects
+        self._indexes = indexes or {}
+        self._columns = columns
+        self._conditions = []
+        self._fields = None
+        self._order = None
+        self._limit = None
+        self._offset = 0
+        self._after = None
+
+    def where(self, attr, op, value):
+        """Keep the objects whose `attr` compares to `value` with `op`.
+
+        Args:
+            attr (str): The attribute name.
+            op (str): One of ==, !=, <, <=, >, >= and in.
+            value: The value to compare with.
+
+        Raises:
+            ValueError: If `op` is not supported.
+        """
+        if op not in _OPS:
+            raise ValueError("unsupported operator: {!r}".format(op))
+        self._conditions.append((attr, op, value))
+        return self
+
+    def only(self, *fields):
+        """Yield dictionaries holding only `fields`, like `to_dict` would."""
+        self._fields = fields
+        return self
+
+    def order_by(self, attr, reverse=False):
+        """Sort by `attr`: numbers, then strings, then other values.
+
+        Objects without the attribute come last, or first when reversed.
+        Objects of equal values are sorted by id.
+        """
+        self._order = (attr, reverse)
+        return self
+
+    def limit(self, n):
+        """Yield at most `n` results."""
+        self._limit = n
+        return self
+
+    def offset(self, n):
+        """Skip the first `n` results."""
+        self._offset = n
+        return self
+
+    def after(self, cursor):
+        """Start right after an object, as a page cursor.
+
+        Pass the last object of the previous page, or its id, to get the
+        next one. The query resumes from the object's `order_by` value
+        and id through the attribute index, when there is one, instead
+        of skipping the earlier results. Unlike `offset`, pages stay
+        aligned when objects are added or removed, including the cursor
+        itself when passed as an object. Without `order_by`, results are
+        ordered by id, which the first page should use too.
+
+        Raises:
+            KeyError: If `cursor` is an id no stored object has.
+        """
+        if isinstance(cursor, str):
+            obj = self._objects.get("{}.{}".format(self._name, cursor))
+            if obj is None:
+                raise KeyError("no {} object with id {!r}".format(
+                    self._name, cursor))
+            cursor = obj
+        self._after = cursor
+        return self
+
+    def _sorting(self):
+        """Return the requested order, by id for a cursor without one."""
+        if self._order is None and self._after is not None:
+            return ('id', False)
+        return self._order
+
+    def _position(self, attr):
+        """Return the (value, key) position of the cursor, or None.
+
+        The value is missing if the cursor object has no `attr`.
+        """
+        after = self._after
+        if after is None:
+            return None
+        return (getattr(after, attr, _MISSING),
+                "{}.{}".format(type(after).__name__, after.id))
+
+    def _driver(self):
+        """Pick the indexed condition that yields the fewest candidates.
+
+        Returns:
+            tuple: The candidate keys and whether they come in the
+                requested order, or None if no index applies.
+        """
+        ranges = None
+        for attr, op, value in self._conditions:
+            index = self._indexes.get(attr)
+            if index is None:
+                continue
+            if op == '==':
+                return index.equal(value), False
+            if op == 'in':
+                keys = set()
+                for option in value:
+                    keys |= index.equal(option)
+                return keys, False
+            if ranges is None and op in ('<', '<=', '>', '>=') and \
+                    sort_key(value)[0] < 2:
+                ranges = (attr, op, value, index)
+        if ranges is None:
+            return None
+        attr, op, value, index = ranges
+        order = self._sorting()
+        ordered = order is not None and order[0] == attr
+        reverse = ordered and order[1]
+        after = self._position(attr) if ordered else None
+        if after is not None and after[0] is _MISSING:
+            # Objects without the attribute come last: none is in range.
+            if not reverse:
+                return (), True
+            after = None
+        if op in ('>', '>='):
+            keys = index.range(low=value, include_low=op == '>=',
+                               reverse=reverse, after=after)
+        else:
+            keys = index.range(high=value, include_high=op == '<=',
+                               reverse=reverse, after=after)
+        return keys, ordered
+
+    def _matches(self, obj, conditions=None):
+        """Return True if `obj` meets every condition, or `conditions`."""
+        if conditions is None:
+            conditions = self._conditions
+        for attr, op, value in conditions:
+            actual = getattr(obj, attr, _MISSING)
+            if actual is _MISSING:
+                return False
+            try:
+                if not _OPS[op](actual, value):
+                    return False
+            except TypeError:
+                return False
+        return True
+
+    def _check(self, obj, condition):
+        """Return True if `obj` meets one condition."""
+        return self._matches(obj, (condition,))
+
+    def _filtered(self):
+        """Run the conditions the column cache can compute as arrays.
+
+        Returns:
+            tuple: The mask of the rows meeting them and the list of the
+                other conditions, or None without a cache or such
+                conditions.
+        """
+        if self._columns is None or not self._conditions:
+            return None
+        return self._columns.filter(self._conditions, self._check)
+
+    def _unindexed(self, index, after, reverse):
+        """Return the keys without the attribute of an index, past `after`.
+        """
+        if after is not None and after[0] is not _MISSING and reverse:
+            return []
+        keys = sorted(k for k in self._objects if k not in index)
+        if after is not None and after[0] is _MISSING:
+            if reverse:
+                keys = keys[:bisect_left(keys, after[1])]
+            else:
+                keys = keys[bisect_right(keys, after[1]):]
+        if reverse:
+            keys.reverse()
+        return keys
+
+    def _ordered_keys(self):
+        """Yield the keys of the class in the requested order by index,
+        starting past the cursor.
+        """
+        attr, reverse = self._sorting()
+        index = self._indexes[attr]
+        after = self._position(attr)
+        if after is None:
+            indexed = index.ordered(reverse)
+        elif after[0] is _MISSING:
+            indexed = index.ordered(reverse) if reverse else ()
+        else:
+            indexed = index.ordered(reverse, after)
+        if reverse:
+            yield from self._unindexed(index, after, reverse)
+        yield from indexed
+        if not reverse:
+            yield from self._unindexed(index, after, reverse)
+
+    def _results(self):
+        """Yield the matching objects in the requested order."""
+        objects = self._objects
+        conditions = self._conditions
+        order = self._sorting()
+        driver = self._driver()
+        filtered = None if driver is not None else self._filtered()
+        if driver is not None:
+            keys, ordered = driver
+            candidates = (objects.get(k) for k in keys)
+        elif filtered is not None:
+            rows, conditions = filtered
+            candidates = [objects.get(k)
+                          for k in self._columns.keys_of(rows)]
+            ordered = False
+        elif order is not None and order[0] in self._indexes:
+            candidates = (objects.get(k) for k in self._ordered_keys())
+            ordered = True
+        else:
+            candidates = list(objects.values())
+            ordered = False
+        matching = (o for o in candidates
+                    if o is not None and self._matches(o, conditions))
+        if order is None or ordered:
+            return matching
+        attr, reverse = order
+
+        def key(obj):
+            value = getattr(obj, attr, _MISSING)
+            if value is _MISSING:
+                return (3, 0), obj.id
+            return sort_key(value), obj.id
+        if self._after is not None:
+            bound = key(self._after)
+            if reverse:
+                matching = (o for o in matching if key(o) < bound)
+            else:
+                matching = (o for o in matching if key(o) > bound)
+        if self._limit is not None:
+            pick = heapq.nlargest if reverse else heapq.nsmallest
+            return iter(pick(self._offset + self._limit, matching, key))
+        return iter(sorted(matching, key=key, reverse=reverse))
+
+    def _project(self, obj):
+        """Return the requested fields of `obj` serialized like to_dict."""
+        d = {}
+        for field in self._fields:
+            if field == '__class__':
+                d[field] = type(obj).__name__
+                continue
+            value = getattr(obj, field, _MISSING)
+            if value is _MISSING:
+                continue
+            if field in ('created_at', 'updated_at'):
+                value = value.isoformat()
+            d[field] = value
+        return d
+
+    def _selected(self):
+        """Yield the result objects, after the cursor and the offset."""
+        results = self._results()
+        stop = None
+        if self._limit is not None:
+            stop = self._offset + self._limit
+        if self._offset or stop is not None:
+            results = islice(results, self._offset, stop)
+        return results
+
+    def __iter__(self):
+        """Yield the results lazily."""
+        results = self._selected()
+        if self._fields is None:
+            return results
+        return map(self._project, results)
+
+    def _whole(self):
+        """Return True if no cursor, offset or limit narrows the results.
+        """
+        return self._after is None and self._limit is None and \
+            not self._offset
+
+    def count(self):
+        """Return the number of results."""
+        if self._whole():
+            if not self._conditions:
+                return len(self._objects)
+            filtered = self._filtered()
+            if filtered is not None and not filtered[1]:
+                return int(filtered[0].sum())
+        return sum(1 for _ in self._selected())
+
+    def _aggregate(self, attr, func):
+        """Aggregate `attr` over the results holding it."""
+        if self._columns is not None and self._whole():
+            rows, rest = None, self._conditions
+            filtered = self._filtered()
+            if filtered is not None:
+                rows, rest = filtered
+            if not rest:
+                result = self._columns.aggregate(attr, func, rows)
+                if result is not NotImplemented:
+                    return result
+        values = [v for v in (getattr(o, attr, _MISSING)
+                              for o in self._selected())
+                  if v is not _MISSING]
+        if func == 'sum':
+            return sum(values)
+        if not values:
+            return None
+        if func == 'mean':
+            return sum(values) / len(values)
+        return min(values) if func == 'min' else max(values)
+
+    def sum(self, attr):
+        """Return the sum of `attr` over the results, 0 if none has it."""
+        return self._aggregate(attr, 'sum')
+
+    def mean(self, attr):
+        """Return the mean of `attr` over the results holding it, or None.
+        """
+        return self._aggregate(attr, 'mean')
+
+    def min(self, attr):
+        """Return the lowest `attr` of the results, or None."""
+        return self._aggregate(attr, 'min')
+
+    def max(self, attr):
+        """Return the highest `attr` of the results, or None."""
+        return self._aggregate(attr, 'max')
+
+    def all(self):
+        """Return the results as a list."""
+        return list(self)
@@ -0,0 +1,373 @@
+#!/usr/bin/python3
+"""
+sqlite_storage.py
+
+This module defines the SQLiteStorage class, a storage engine backed by
+the standard `sqlite3` module for data sets too large to keep in memory.
+
+Each model class gets its own table. The `to_dict()` payload is stored as
+JSON in the `data` column, and `id`, `created_at` and `updated_at` are
+promoted to indexed columns. Looking an object up by id uses the primary
+key and counting a class is a `COUNT(*)`.
+
+Examples:
+    >>> from models.base_model import BaseModel
+    >>> storage = SQLiteStorage(':memory:')
+    >>> base = BaseModel()
+    >>> storage.new(base)
+    >>> storage.save()
+    >>> storage.count(BaseModel)
+    1
+    >>> storage.get(BaseModel, base.id) is base
+    True
+"""
+
+import sqlite3
+import threading
+
+from models.base_model import classes, watchers
+from models.engine.codec import get_codec
+from models.engine.object_cache import ObjectCache
+from models.engine.transaction import Transactional
+
+_SYNCHRONOUS = {'none': 'OFF', 'batch': 'NORMAL', 'save': 'FULL'}
+
+
+def _table(cls):
+    """Return the quoted table name of a model class or class name.
+
+    Raises:
+        ValueError: If the name is not a valid identifier.
+    """
+    name = cls if isinstance(cls, str) else cls.__name__
+    if not name.isidentifier():
+        raise ValueError("invalid model class name: {!r}".format(name))
+    return '"{}"'.format(name)
+
+
+class SQLiteStorage(Transactional):
+    """Storage engine keeping one SQLite table per model class.
+
+    Objects are only held in memory while they are in use: the engine
+    keeps weak references to the objects it returned, so that every id
+    maps to one live instance, and strong ones to those changed since the
+    last save until `save` writes them. The most recently read objects
+    are also held, up to `cache_size`, so hot ids are not rebuilt from
+    their rows on every read.
+
+    Attributes:
+        cache (ObjectCache): The identity map, with its hit and miss
+            counters.
+        codec (Codec): The JSON codec of the `data` column.
+    """
+
+    def __init__(self, path='file.db', durability='batch', cache_size=1024,
+                 codec=None):
+        """Open, or create, the database at `path`.
+
+        Args:
+            path (str): The database file, or ':memory:'.
+            durability (str): 'none' never waits for the disk, 'batch'
+                uses a write-ahead log synced at checkpoints, and 'save'
+                syncs on every commit.
+            cache_size (int): The number of recently read objects kept
+                in memory when nothing else references them.
+            codec (str): The JSON codec name, see `models.engine.codec`.
+
+        Raises:
+            ValueError: If `durability` is not a known level.
+        """
+        if durability not in _SYNCHRONOUS:
+            raise ValueError("durability must be one of {}".format(
+                ', '.join(_SYNCHRONOUS)))
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        if durability == 'batch':
+            self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.execute(
+            "PRAGMA synchronous = " + _SYNCHRONOUS[durability])
+        self._tables = set()
+        self._indexed = set()
+        self.cache = ObjectCache(cache_size)
+        self.codec = get_codec(codec)
+        self._new = {}
+        self._dirty = {}
+        self._deleted = {}
+        self._lock = threading.RLock()
+        self._load_tables()
+        watchers.add(self)
+
+    def _load_tables(self):
+        """Read the names of the existing model tables."""
+        rows = self._conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table'")
+        self._tables = {name for name, in rows}
+
+    def _create_table(self, name):
+        """Create the table and indexes of a model class if needed."""
+        if name in self._tables:
+            return
+        table = _table(name)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS {} (id TEXT PRIMARY KEY, "
+            "created_at TEXT, updated_at TEXT, data TEXT NOT NULL)"
+            .format(table))
+        for column in ('created_at', 'updated_at'):
+            self._conn.execute(
+                'CREATE INDEX IF NOT EXISTS "{0}_{1}" ON {2} ({1})'
+                .format(name, column, table))
+        self._tables.add(name)
+        self._create_indexes(name)
+
+    def _create_indexes(self, name):
+        """Create the expression indexes of a class's `__indexes__`."""
+        if name in self._indexed or name not in self._tables:
+            return
+        for attr in getattr(classes.get(name), '__indexes__', ()):
+            if not attr.isidentifier():
+                raise ValueError("invalid attribute name: {!r}".format(attr))
+            self._conn.execute(
+                'CREATE INDEX IF NOT EXISTS "{0}__{1}" ON {2} '
+                "(json_extract(data, '$.{1}'))".format(
+                    name, attr, _table(name)))
+        self._indexed.add(name)
+
+    def _build(self, key, name, data):
+        """Build the instance of a row and cache it."""
+        obj = classes[name](**self.codec.decode(data))
+        obj.mark_clean()
+        return self.cache.add(key, obj)
+
+    def _rehydrate(self, name, id, data):
+        """Return the live instance for a row, building it if needed.
+
+        The JSON payload is only decoded when the id is not cached.
+        """
+        key = "{}.{}".format(name, id)
+        obj = self.cache.get(key)
+        if obj is None:
+            obj = self._build(key, name, data)
+        return obj
+
+    def _names(self, cls):
+        """Return the names of the model tables to read."""
+        if cls is None:
+            return sorted(n for n in self._tables if n in classes)
+        name = cls if isinstance(cls, str) else cls.__name__
+        return [name] if name in self._tables else []
+
+    def all(self, cls=None):
+        """Return the stored objects.
+
+        Args:
+            cls (type or str): Only return the objects of this class.
+
+        Returns:
+            dict: The objects by `<class>.<id>` key, including the ones
+                added since the last save.
+        """
+        objects = {}
+        for name in self._names(cls):
+            for id, data in self._conn.execute(
+                    "SELECT id, data FROM {}".format(_table(name))):
+                obj = self._rehydrate(name, id, data)
+                key = "{}.{}".format(name, id)
+                if key not in self._deleted:
+                    objects[key] = obj
+        prefix = None
+        if cls is not None:
+            prefix = (cls if isinstance(cls, str) else cls.__name__) + '.'
+        for key, obj in self._new.items():
+            if prefix is None or key.startswith(prefix):
+                objects[key] = obj
+        return objects
+
+    def get(self, cls, id):
+        """Return one object by class and id through the primary key.
+
+        Args:
+            cls (type or str): The model class.
+            id (str): The object id.
+
+        Returns:
+            BaseModel: The object, or None if it is not stored.
+        """
+        name = cls if isinstance(cls, str) else cls.__name__
+        key = "{}.{}".format(name, id)
+        if key in self._deleted:
+            return None
+        obj = self._new.get(key) or self.cache.get(key)
+        if obj is not None or name not in self._tables:
+            return obj
+        row = self._conn.execute(
+            "SELECT data FROM {} WHERE id = ?".format(_table(name)),
+            (id,)).fetchone()
+        return None if row is None else self._build(key, name, row[0])
+
+    def find(self, cls, **criteria):
+        """Return the objects of a class whose attributes equal `criteria`.
+
+        Attributes listed in the class `__indexes__` are matched by SQLite
+        through an expression index on the JSON payload. Unsaved objects
+        in use are checked in memory, so their current values count.
+
+        Args:
+            cls (type or str): The model class.
+            **criteria: Attribute values to match.
+
+        Returns:
+            dict: The matching objects by `<class>.<id>` key.
+        """
+        name = cls if isinstance(cls, str) else cls.__name__
+        missing = object()
+
+        def matches(obj):
+            return all(getattr(obj, a, missing) == v
+                       for a, v in criteria.items())
+
+        found = {}
+        if name in self._tables:
+            self._create_indexes(name)
+            indexed = getattr(classes.get(name), '__indexes__', ())
+            where, params = [], []
+            for attr, value in criteria.items():
+                if attr in indexed:
+                    where.append("json_extract(data, '$.{}') IS ?"
+                                 .format(attr))
+                    params.append(value)
+            sql = "SELECT id, data FROM {}".format(_table(name))
+            if where:
+                sql += " WHERE " + " AND ".join(where)
+            for id, data in self._conn.execute(sql, params):
+                obj = self._rehydrate(name, id, data)
+                if matches(obj):
+                    found["{}.{}".format(name, id)] = obj
+        for key, obj in list(self._dirty.items()) + list(self._new.items()):
+            if (type(obj).__name__ == name and key not in found and
+                    matches(obj)):
+                found[key] = obj
+        for key in self._deleted:
+            found.pop(key, None)
+        return found
+
+    def count(self, cls=None):
+        """Return the number of stored objects, of one class or all."""
+        total = 0
+        for name in self._names(cls):
+            total += self._conn.execute(
+                "SELECT COUNT(*) FROM {}".format(_table(name))).fetchone()[0]
+        name = None
+        if cls is not None:
+            name = cls if isinstance(cls, str) else cls.__name__
+        for obj in self._new.values():
+            if name in (None, type(obj).__name__) and not self._exists(obj):
+                total += 1
+        for obj in self._deleted.values():
+            if name in (None, type(obj).__name__) and self._exists(obj):
+                total -= 1
+        return total
+
+    def object_dirtied(self, obj):
+        """Hold on to a live object written since it was saved."""
+        key = "{}.{}".format(type(obj).__name__, obj.id)
+        with self._lock:
+            if self.cache.peek(key) is obj:
+                self._dirty[key] = obj
+
+    def attribute_changed(self, obj, name):
+        """Do nothing: SQLite maintains the attribute indexes on save."""
+
+    def pending(self):
+        """Return the number of objects the next save will write."""
+        return len(self._new) + len(self._dirty) + len(self._deleted)
+
+    def _exists(self, obj):
+        """Return True if an object has a row in the database."""
+        name = type(obj).__name__
+        if name not in self._tables:
+            return False
+        return self._conn.execute(
+            "SELECT 1 FROM {} WHERE id = ?".format(_table(name)),
+            (obj.id,)).fetchone() is not None
+
+    def new(self, obj):
+        """Add an object, written to the database at the next `save`."""
+        key = "{}.{}".format(type(obj).__name__, obj.id)
+        with self._lock:
+            self._deleted.pop(key, None)
+            self._new[key] = obj
+
+    def delete(self, obj=None):
+        """Remove an object from the database at the next `save`."""
+        if obj is None:
+            return
+        key = "{}.{}".format(type(obj).__name__, obj.id)
+        with self._lock:
+            self._new.pop(key, None)
+            self._dirty.pop(key, None)
+            self.cache.pop(key)
+            self._deleted[key] = obj
+
+    def _flush(self):
+        """Write new and changed objects, and delete removed ones.
+
+        The changes are taken over at the start, and each object is
+        marked clean before it is encoded, so that a write from another
+        thread during the flush is saved next time. They are put back if
+        the transaction fails.
+        """
+        with self._lock:
+            new, dirty, deleted = self._new, self._dirty, self._deleted
+            self._new, self._dirty, self._deleted = {}, {}, {}
+            rows = dict(dirty)
+            rows.update(new)
+            try:
+                self._write(rows, deleted)
+            except BaseException:
+                for pending, taken in ((self._new, new),
+                                       (self._dirty, dirty),
+                                       (self._deleted, deleted)):
+                    pending.update(taken)
+                raise
+            for key, obj in rows.items():
+                self.cache.replace(key, obj)
+
+    def _write(self, rows, deleted):
+        """Save objects by key and delete others in one transaction."""
+        by_table = {}
+        encode = self.codec.encode
+        for key, obj in rows.items():
+            name = type(obj).__name__
+            self._create_table(name)
+            obj.mark_clean()
+            d = obj.to_dict()
+            by_table.setdefault(name, []).append(
+                (d['id'], d['created_at'], d['updated_at'],
+                 encode(d).decode('utf-8')))
+        with self._conn:
+            for name, values in by_table.items():
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO {} VALUES (?, ?, ?, ?)"
+                    .format(_table(name)), values)
+            for obj in deleted.values():
+                name = type(obj).__name__
+                if name in self._tables:
+                    self._conn.execute(
+                        "DELETE FROM {} WHERE id = ?".format(_table(name)),
+                        (obj.id,))
+
+    def reload(self):
+        """Discard unsaved additions and deletions and forget live objects.
+
+        Objects returned before keep their state; later reads return new
+        instances built from the database.
+        """
+        with self._lock:
+            self._new.clear()
+            self._dirty.clear()
+            self._deleted.clear()
+            self.cache.clear()
+            self._load_tables()
+
+    def close(self):
+        """Close the database connection."""
+        self._conn.close()
@@ -0,0 +1,87 @@
+#!/usr/bin/python3
+"""
+transaction.py
+
+This module defines the Transactional mixin, which lets a storage engine
+defer persistence across many changes. Between `begin` and `commit`,
+`save` does nothing; `commit` writes everything once and `rollback`
+drops the changes by reloading the persisted state.
+
+Examples:
+    >>> from models.base_model import BaseModel
+    >>> from models.engine.log_storage import LogStorage
+    >>> storage = LogStorage('/dev/null', durability='none')
+    >>> with storage.batch():
+    ...     storage.new(BaseModel())
+    ...     storage.save()
+    ...     storage.in_batch()
+    True
+    >>> storage.in_batch()
+    False
+"""
+
+from contextlib import contextmanager
+
+
+class Transactional:
+    """Mixin adding begin/commit/rollback to a storage engine.
+
+    The engine implements `_flush`, which writes pending changes, and
+    `reload`, which restores the persisted state.
+    """
+
+    _batch_depth = 0
+
+    def in_batch(self):
+        """Return True between `begin` and the matching commit/rollback."""
+        return self._batch_depth > 0
+
+    def begin(self):
+        """Start deferring `save` until `commit`. Batches may nest."""
+        self._batch_depth += 1
+
+    def commit(self):
+        """End a batch, writing the changes once the outermost one ends.
+
+        Raises:
+            RuntimeError: If no batch is open.
+        """
+        if not self._batch_depth:
+            raise RuntimeError("commit() without begin()")
+        self._batch_depth -= 1
+        if not self._batch_depth:
+            self._flush()
+
+    def rollback(self):
+        """End every open batch and reload the persisted state.
+
+        Objects obtained before the rollback keep their unsaved changes
+        but are no longer held by the engine.
+
+        Raises:
+            RuntimeError: If no batch is open.
+        """
+        if not self._batch_depth:
+            raise RuntimeError("rollback() without begin()")
+        self._batch_depth = 0
+        self.reload()
+
+    @contextmanager
+    def batch(self):
+        """Return a context manager committing on exit.
+
+        The batch is rolled back if the block raises.
+        """
+        self.begin()
+        try:
+            yield self
+        except BaseException:
+            if self._batch_depth:
+                self.rollback()
+            raise
+        self.commit()
+
+    def save(self):
+        """Write the pending changes, unless a batch is open."""
+        if not self._batch_depth:
+            self._flush()
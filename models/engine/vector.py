@@ -0,0 +1,294 @@
+#!/usr/bin/python3
+"""
+vector.py
+
+This module defines the ColumnCache class, which keeps the numeric
+attributes of the objects of one class, such as `price_by_night` or
+`latitude`, as NumPy arrays. `Query` filters and aggregates on such
+attributes then run as array operations instead of one attribute read
+per object.
+
+NumPy is optional: `numpy` is None when it is not installed, engines
+then pass no cache and queries read the objects one at a time.
+
+A column is built the first time a query uses its attribute, and kept
+until the engine calls `invalidate`, when objects are added or removed.
+The engine reports the keys of objects written since with `touch`;
+their rows are read again before the next use.
+
+Integers within 2**53 and floats go in the arrays. Rows holding any
+other value, like a string, a boolean or None, are set aside and
+compared one by one, so that results match the ones read from the
+objects, apart from the rounding of float sums.
+
+Examples:
+    >>> from models.base_model import BaseModel
+    >>> objects = {str(i): BaseModel(rooms=i) for i in range(4)}
+    >>> cache = ColumnCache(objects)
+    >>> rows, rest = cache.filter([('rooms', '>=', 2)], None)
+    >>> cache.keys_of(rows), rest
+    (['2', '3'], [])
+    >>> cache.aggregate('rooms', 'sum', rows)
+    5
+"""
+
+import operator
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+_EXACT = 1 << 53
+_MISSING = object()
+_OPS = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+# Row kinds: no array value, an integer, a float.
+_NONE = 0
+_INT = 1
+_FLOAT = 2
+
+
+def _number(value):
+    """Return True if `value` is held exactly by a float64 array."""
+    kind = type(value)
+    return kind is float or (kind is int and -_EXACT <= value <= _EXACT)
+
+
+class _Column:
+    """The values of one attribute, by row.
+
+    Attributes:
+        values (ndarray): The float64 value of each row, 0 in rows
+            without a number.
+        kinds (ndarray): The int8 kind of each row's value.
+        other (set): The rows holding a value kept out of the arrays.
+    """
+
+    def __init__(self, values):
+        """Initialize the column from the attribute value of each row."""
+        types = set(map(type, values))
+        if values and types <= {int, float} and (
+                int not in types or
+                -_EXACT <= min(values) and max(values) <= _EXACT):
+            # Every row holds a number: convert the list at once.
+            self.values = numpy.array(values, dtype=numpy.float64)
+            if len(types) == 1:
+                self.kinds = numpy.full(
+                    len(values), _FLOAT if float in types else _INT,
+                    dtype=numpy.int8)
+            else:
+                self.kinds = numpy.fromiter(
+                    (_FLOAT if type(v) is float else _INT for v in values),
+                    dtype=numpy.int8, count=len(values))
+            self.other = set()
+            return
+        data = []
+        kinds = []
+        other = set()
+        for row, value in enumerate(values):
+            kind = type(value)
+            if kind is float:
+                data.append(value)
+                kinds.append(_FLOAT)
+            elif kind is int and -_EXACT <= value <= _EXACT:
+                data.append(value)
+                kinds.append(_INT)
+            else:
+                data.append(0)
+                kinds.append(_NONE)
+                if value is not _MISSING:
+                    other.add(row)
+        self.values = numpy.array(data, dtype=numpy.float64)
+        self.kinds = numpy.array(kinds, dtype=numpy.int8)
+        self.other = other
+
+    def set(self, row, value):
+        """Replace the value of one row."""
+        self.other.discard(row)
+        if _number(value):
+            self.values[row] = value
+            self.kinds[row] = _FLOAT if type(value) is float else _INT
+        else:
+            self.values[row] = 0
+            self.kinds[row] = _NONE
+            if value is not _MISSING:
+                self.other.add(row)
+
+
+class ColumnCache:
+    """The numeric columns of the objects of one class.
+
+    Attributes:
+        objects (dict): The objects of the class by key, as held by the
+            engine.
+        keys (list): The key of each row, or None until a column is
+            built.
+    """
+
+    def __init__(self, objects):
+        """Initialize an empty cache over the objects of a class."""
+        self.objects = objects
+        self.keys = None
+        self._rows = None
+        self._columns = {}
+        self._stale = set()
+
+    def invalidate(self):
+        """Drop every column, after objects were added or removed."""
+        self.keys = None
+        self._rows = None
+        self._columns.clear()
+        self._stale.clear()
+
+    def touch(self, keys):
+        """Have the rows of written objects read again before next use."""
+        if self.keys is not None:
+            self._stale.update(keys)
+
+    def _refresh(self):
+        """Read the stale rows again, or start over if the rows changed."""
+        if self.keys is not None and len(self.keys) != len(self.objects):
+            self.invalidate()
+        if self.keys is None:
+            self.keys = list(self.objects)
+            return
+        if not self._stale:
+            return
+        stale = self._stale
+        self._stale = set()
+        if not self._columns:
+            return
+        if self._rows is None:
+            self._rows = {k: row for row, k in enumerate(self.keys)}
+        objects = self.objects
+        for key in stale:
+            row = self._rows.get(key)
+            obj = objects.get(key)
+            if row is None or obj is None:
+                self.invalidate()
+                self.keys = list(objects)
+                return
+            for attr, column in self._columns.items():
+                column.set(row, getattr(obj, attr, _MISSING))
+
+    def column(self, attr):
+        """Return the up to date column of an attribute."""
+        self._refresh()
+        column = self._columns.get(attr)
+        if column is None:
+            column = self._columns[attr] = _Column(
+                [getattr(obj, attr, _MISSING)
+                 for obj in self.objects.values()])
+        return column
+
+    def mask(self, attr, op, value, check):
+        """Return the rows meeting one condition, as a boolean array.
+
+        Args:
+            attr (str): The attribute name.
+            op (str): One of ==, !=, <, <=, >, >= and in.
+            value: The value to compare with.
+            check (callable): Returns whether an object meets the
+                condition, for the rows whose value is not in the arrays.
+
+        Returns:
+            ndarray: The mask, or None if `value` is not a number, or for
+                'in' a collection of numbers.
+        """
+        if op == 'in':
+            if isinstance(value, (str, bytes, dict)):
+                return None
+            options = list(value)
+            if not all(_number(v) for v in options):
+                return None
+        elif op not in _OPS or not _number(value):
+            return None
+        column = self.column(attr)
+        if op == 'in':
+            hits = numpy.isin(column.values, options)
+        else:
+            hits = _OPS[op](column.values, value)
+        hits &= column.kinds != _NONE
+        if column.other:
+            objects = self.objects
+            keys = self.keys
+            for row in column.other:
+                hits[row] = check(objects[keys[row]])
+        return hits
+
+    def filter(self, conditions, check):
+        """Compute the conditions that can be run as array operations.
+
+        Args:
+            conditions (list): (attr, op, value) tuples.
+            check (callable): Called with an object and one condition,
+                returns whether the object meets it.
+
+        Returns:
+            tuple: The mask of the rows meeting those conditions and the
+                list of the other conditions, or None if there were none.
+        """
+        rows = None
+        rest = []
+        for condition in conditions:
+            attr, op, value = condition
+            hits = self.mask(attr, op, value,
+                             lambda obj: check(obj, condition))
+            if hits is None:
+                rest.append(condition)
+            elif rows is None:
+                rows = hits
+            else:
+                rows &= hits
+        if rows is None:
+            return None
+        return rows, rest
+
+    def keys_of(self, rows):
+        """Return the keys of the rows of a mask, in row order."""
+        keys = self.keys
+        return [keys[row] for row in numpy.flatnonzero(rows).tolist()]
+
+    def aggregate(self, attr, func, rows=None):
+        """Aggregate an attribute over some rows.
+
+        Args:
+            attr (str): The attribute name.
+            func (str): 'sum', 'mean', 'min' or 'max'.
+            rows (ndarray): The mask of the rows, every row by default.
+
+        Returns:
+            The result over the rows holding the attribute: integers
+            when they all hold one, except for 'mean', 0 for an empty
+            sum and None otherwise. NotImplemented if some of the rows
+            hold a value kept out of the arrays, or NaN for 'min' and
+            'max', which would not be ordered like Python orders them.
+        """
+        column = self.column(attr)
+        if column.other and (rows is None or
+                             any(rows[row] for row in column.other)):
+            return NotImplemented
+        present = column.kinds != _NONE
+        if rows is not None:
+            present &= rows
+        values = column.values[present]
+        if not len(values):
+            return 0 if func == 'sum' else None
+        if func == 'mean':
+            return float(values.mean())
+        if func != 'sum' and numpy.isnan(values).any():
+            return NotImplemented
+        if not (column.kinds[present] == _FLOAT).any():
+            values = values.astype(numpy.int64)
+            if func == 'sum':
+                bound = max(values.max().item(), -values.min().item())
+                if len(values) * bound >= 1 << 63:
+                    return sum(values.tolist())
+        return getattr(values, func)().item()
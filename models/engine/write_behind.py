@@ -0,0 +1,144 @@
+#!/usr/bin/python3
+"""
+write_behind.py
+
+This module defines the WriteBehind class, which wraps a storage engine
+so that `save` returns at once and a daemon thread writes the changes in
+the background. A flush happens every `interval` seconds, or sooner once
+`threshold` objects are pending. Pending changes are also flushed at
+interpreter exit and on SIGTERM/SIGINT.
+
+Examples:
+    >>> from models.base_model import BaseModel
+    >>> from models.engine.log_storage import LogStorage
+    >>> storage = WriteBehind(LogStorage('/dev/null', durability='none'),
+    ...                       interval=60, handle_signals=False)
+    >>> storage.new(BaseModel())
+    >>> storage.save()
+    >>> storage.pending()
+    1
+    >>> storage.close()
+    >>> storage.pending()
+    0
+"""
+
+import atexit
+import os
+import signal
+import threading
+
+
+class WriteBehind:
+    """Storage engine proxy deferring writes to a background thread.
+
+    Every other attribute is delegated to the wrapped engine, with calls
+    serialized against the flusher thread.
+
+    Attributes:
+        storage: The wrapped storage engine.
+        interval (float): Seconds between two flushes.
+        threshold (int): Pending objects that trigger an early flush.
+    """
+
+    def __init__(self, storage, interval=1.0, threshold=1000,
+                 handle_signals=True):
+        """Wrap `storage` and start the flusher thread.
+
+        Args:
+            storage: An engine with `save` and `pending` methods.
+            interval (float): See the class attributes.
+            threshold (int): See the class attributes.
+            handle_signals (bool): Flush on SIGTERM and SIGINT. Only
+                possible from the main thread.
+        """
+        self.storage = storage
+        self.interval = interval
+        self.threshold = threshold
+        self._lock = threading.RLock()
+        self._wake = threading.Condition(threading.Lock())
+        self._requested = False
+        self._stopped = False
+        self._signals = {}
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+        if handle_signals:
+            for signum in (signal.SIGTERM, signal.SIGINT):
+                try:
+                    self._signals[signum] = signal.signal(
+                        signum, self._on_signal)
+                except ValueError:
+                    break
+
+    def __getattr__(self, name):
+        """Delegate to the wrapped engine, holding the flush lock."""
+        value = getattr(self.storage, name)
+        if not callable(value):
+            return value
+        lock = self._lock
+
+        def locked(*args, **kwargs):
+            with lock:
+                return value(*args, **kwargs)
+        return locked
+
+    def save(self):
+        """Schedule a flush; it happens at once past the threshold."""
+        if self.storage.pending() >= self.threshold:
+            with self._wake:
+                self._requested = True
+                self._wake.notify()
+
+    def flush(self):
+        """Write the pending changes now."""
+        with self._lock:
+            if self.storage.pending():
+                self.storage.save()
+
+    def _run(self):
+        """Flush on every interval or request until stopped."""
+        while True:
+            with self._wake:
+                if not self._requested and not self._stopped:
+                    self._wake.wait(self.interval)
+                self._requested = False
+                if self._stopped:
+                    return
+            self.flush()
+
+    def close(self):
+        """Stop the flusher thread and write the pending changes."""
+        with self._wake:
+            self._stopped = True
+            self._wake.notify()
+        if self._thread is not threading.current_thread():
+            self._thread.join()
+        self._finish()
+
+    def _finish(self):
+        """Write the pending changes and drop the exit and signal hooks."""
+        self.flush()
+        atexit.unregister(self.close)
+        for signum, previous in self._signals.items():
+            signal.signal(signum, previous)
+        self._signals = {}
+
+    def _on_signal(self, signum, frame):
+        """Flush, then let the previous handler deal with the signal.
+
+        The handler may interrupt the main thread while it holds the
+        condition lock, in `save`, so the flusher thread is told to stop
+        without waiting for that lock, nor for the thread.
+        """
+        previous = self._signals.get(signum, signal.SIG_DFL)
+        self._stopped = True
+        if self._wake.acquire(blocking=False):
+            try:
+                self._wake.notify()
+            finally:
+                self._wake.release()
+        self._finish()
+        if callable(previous):
+            previous(signum, frame)
+        elif previous == signal.SIG_DFL:
+            os.kill(os.getpid(), signum)
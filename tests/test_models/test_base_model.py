@@ -1,4 +1,7 @@
 #!/usr/bin/python3
+import unittest
+import uuid
+
 from models.base_model import BaseModel
 
 my_model = BaseModel()
@@ -22,3 +25,192 @@ print(type(my_new_model.created_at))
 
 print("--")
 print(my_model is my_new_model)
+
+
+class TestCreateMany(unittest.TestCase):
+    """Tests for BaseModel.create_many."""
+
+    def test_unique_uuid4_ids(self):
+        objs = BaseModel.create_many(500)
+        self.assertEqual(len({o.id for o in objs}), 500)
+        for o in objs:
+            u = uuid.UUID(o.id)
+            self.assertEqual(u.version, 4)
+            self.assertEqual(u.variant, uuid.RFC_4122)
+            self.assertEqual(str(u), o.id)
+
+    def test_shared_timestamp_and_common(self):
+        objs = BaseModel.create_many(3, name="seed")
+        self.assertTrue(all(o.created_at == objs[0].created_at
+                            for o in objs))
+        self.assertEqual(objs[1].updated_at, objs[1].created_at)
+        self.assertEqual(objs[2].name, "seed")
+        self.assertEqual(objs[2].to_dict()["__class__"], "BaseModel")
+
+    def test_invalid(self):
+        self.assertEqual(BaseModel.create_many(0), [])
+        with self.assertRaises(ValueError):
+            BaseModel.create_many(-1)
+        with self.assertRaises(ValueError):
+            BaseModel.create_many(2, id="x")
+
+
+class TestReload(unittest.TestCase):
+    """Tests for rebuilding a BaseModel from a dictionary."""
+
+    def test_round_trip(self):
+        obj = BaseModel()
+        obj.name = "My_First_Model"
+        new = BaseModel(**obj.to_dict())
+        self.assertEqual(new.__dict__, obj.__dict__)
+
+    def test_zero_microseconds(self):
+        obj = BaseModel()
+        obj.created_at = obj.created_at.replace(microsecond=0)
+        new = BaseModel(**obj.to_dict())
+        self.assertEqual(new.created_at, obj.created_at)
+        self.assertEqual(new.updated_at, obj.updated_at)
+
+
+class TestCompact(unittest.TestCase):
+    """Tests for the compact class decorator."""
+
+    def setUp(self):
+        from models.base_model import compact
+
+        @compact
+        class Place(BaseModel):
+            """A compact model."""
+        self.Place = Place
+
+    def test_core_fields_in_slots(self):
+        place = self.Place()
+        self.assertEqual(place.__dict__, {})
+        self.assertEqual(type(place).__name__, "Place")
+        self.assertIn(place.id, str(place))
+        self.assertIn("'created_at'", str(place))
+
+    def test_overflow_and_round_trip(self):
+        place = self.Place()
+        place.name = "Loft"
+        self.assertEqual(place.__dict__, {'name': 'Loft'})
+        d = place.to_dict()
+        self.assertEqual(list(d), ['id', 'created_at', 'updated_at',
+                                   'name', '__class__'])
+        new = self.Place(**d)
+        self.assertEqual(new.to_dict(), d)
+
+    def test_create_many(self):
+        places = self.Place.create_many(2, name="Loft")
+        self.assertNotEqual(places[0].id, places[1].id)
+        self.assertEqual(places[1].__dict__, {'name': 'Loft'})
+        self.assertEqual(places[1].to_dict()['__class__'], 'Place')
+
+    def test_binary_id(self):
+        place = self.Place()
+        self.assertIsInstance(place._id, int)
+        self.assertEqual(str(uuid.UUID(int=place._id)), place.id)
+        self.assertIsInstance(self.Place.create_many(1)[0]._id, int)
+
+    def test_ids_skip_foreign_key_caches(self):
+        from models import binary
+        before = binary._uuid_text.cache_info()
+        for place in [self.Place()] + self.Place.create_many(10):
+            self.Place(id=place.id)
+            binary.pack(place.id, place.created_at, place.updated_at, {})
+        self.assertEqual(binary._uuid_text.cache_info(), before)
+
+    def test_id_round_trips_unchanged(self):
+        for uid in ("56d43177-cc5f-4d6c-a0c1-e167f8c27337",
+                    "56D43177-CC5F-4D6C-A0C1-E167F8C27337",
+                    "not-a-uuid"):
+            place = self.Place(id=uid)
+            self.assertEqual(place.id, uid)
+            self.assertEqual(place.to_dict()['id'], uid)
+        upper = "56D43177-CC5F-4D6C-A0C1-E167F8C27337"
+        self.assertIsInstance(self.Place(id=upper)._id, str)
+
+
+class TestDirtyTracking(unittest.TestCase):
+    """Tests for dirty-field tracking and the cached to_dict."""
+
+    def test_new_is_dirty(self):
+        base = BaseModel()
+        self.assertTrue(base.is_dirty())
+        self.assertEqual(base.dirty_fields(),
+                         {'id', 'created_at', 'updated_at'})
+        self.assertTrue(BaseModel.create_many(1)[0].is_dirty())
+
+    def test_writes_tracked(self):
+        base = BaseModel()
+        base.mark_clean()
+        self.assertFalse(base.is_dirty())
+        self.assertEqual(base.dirty_fields(), set())
+        base.name = "Betty"
+        base.save()
+        self.assertEqual(base.dirty_fields(), {'name', 'updated_at'})
+        del base.name
+        self.assertEqual(base.dirty_fields(), {'name', 'updated_at'})
+
+    def test_cache_follows_writes(self):
+        base = BaseModel()
+        first = base.to_dict()
+        first['id'] = 'mutated'
+        self.assertEqual(base.to_dict()['id'], base.id)
+        base.save()
+        base.number = 89
+        d = base.to_dict()
+        self.assertEqual(d['updated_at'], base.updated_at.isoformat())
+        self.assertEqual(list(d)[-2:], ['number', '__class__'])
+        del base.number
+        self.assertNotIn('number', base.to_dict())
+
+    def test_dirty_only(self):
+        base = BaseModel()
+        base.mark_clean()
+        base.name = "Betty"
+        self.assertEqual(base.to_dict(dirty_only=True),
+                         {'id': base.id, 'name': 'Betty',
+                          '__class__': 'BaseModel'})
+
+    def test_copy_does_not_share_cache(self):
+        import copy
+        base = BaseModel()
+        base.to_dict()
+        other = copy.copy(base)
+        other.id = "other"
+        self.assertEqual(base.to_dict()['id'], base.id)
+        self.assertEqual(other.to_dict()['id'], "other")
+
+
+class TestBytes(unittest.TestCase):
+    """Tests for to_bytes and from_bytes."""
+
+    def test_round_trip(self):
+        base = BaseModel(name="Betty", rooms=3, tags=["a", None],
+                         city_id=str(uuid.uuid4()))
+        data = base.to_bytes()
+        self.assertLess(len(data), len(str(base.to_dict())) / 2)
+        copy = BaseModel.from_bytes(data)
+        self.assertEqual(copy.to_dict(), base.to_dict())
+        self.assertTrue(copy.is_dirty())
+
+    def test_other_core_values(self):
+        import datetime
+        aware = datetime.datetime(2017, 9, 28, tzinfo=datetime.timezone.utc)
+        base = BaseModel(id="1", created_at=aware.isoformat())
+        copy = BaseModel.from_bytes(base.to_bytes())
+        self.assertEqual(copy.id, "1")
+        self.assertEqual(copy.created_at, aware)
+        self.assertEqual(copy.updated_at, base.updated_at)
+
+    def test_compact(self):
+        from models.base_model import compact
+
+        @compact
+        class Place(BaseModel):
+            """A compact model."""
+        for place in (Place(name="Loft"), Place(id="not-a-uuid")):
+            copy = Place.from_bytes(place.to_bytes())
+            self.assertEqual(copy.to_dict(), place.to_dict())
+            self.assertEqual(type(copy._id), type(place._id))
@@ -0,0 +1,103 @@
+#!/usr/bin/python3
+"""Unit tests for the models.binary module."""
+import datetime
+import unittest
+from collections import OrderedDict
+
+from models import binary
+
+WHEN = datetime.datetime(2017, 9, 28, 21, 3, 54, 52298)
+UID = '56d43177-cc5f-4d6c-a0c1-e167f8c27337'
+
+
+class TestBinary(unittest.TestCase):
+    """Tests for the binary record format."""
+
+    def round_trip(self, attrs):
+        return binary.unpack(binary.pack(UID, WHEN, WHEN, attrs))[3]
+
+    def test_values(self):
+        attrs = {
+            'none': None, 'yes': True, 'no': False, 'small': 7,
+            'negative': -3, 'large': 1 << 40, 'huge': -(1 << 100),
+            'float': 2.5, 'short': "café", 'long': "x" * 300,
+            'uuid': UID, 'upper': UID.upper(), 'list': [1, [2, "3"]],
+            'dict': {'a': {'b': None}}, 'empty': "",
+        }
+        self.assertEqual(self.round_trip(attrs), attrs)
+
+    def test_like_json(self):
+        self.assertEqual(self.round_trip({'t': (1, 2)}), {'t': [1, 2]})
+        self.assertEqual(self.round_trip({'o': OrderedDict(a=1)}),
+                         {'o': {'a': 1}})
+        with self.assertRaises(TypeError):
+            binary.pack(UID, WHEN, WHEN, {'bad': {1: 2}})
+        with self.assertRaises(TypeError):
+            binary.pack(UID, WHEN, WHEN, {'bad': object()})
+
+    def test_header(self):
+        data = binary.pack(UID, WHEN, WHEN, {})
+        self.assertEqual(len(data), 37)
+        self.assertEqual(binary.record_id(data), UID)
+        number = binary.unpack(data, raw_id=True)[0]
+        self.assertEqual(binary.format_uuid(number), UID)
+        data = binary.pack("1", WHEN, WHEN, {})
+        self.assertEqual(binary.record_id(data), "1")
+
+    def test_malformed(self):
+        data = binary.pack(UID, WHEN, WHEN, {'name': "Betty"})
+        for bad in (data[:-1], data + b'\0', data[:10]):
+            with self.assertRaises(ValueError):
+                binary.unpack(bad)
+
+
+class TestSchemas(unittest.TestCase):
+    """Tests for the per-class record layouts."""
+
+    def round_trip(self, id, created, updated, attrs):
+        schemas = binary.Schemas()
+        data = schemas.pack('Place', id, created, updated, attrs)
+        self.assertEqual(schemas.name(data), 'Place')
+        self.assertEqual(schemas.identify(data), ('Place', id))
+        return schemas.unpack(data)
+
+    def test_values(self):
+        later = WHEN + datetime.timedelta(seconds=1)
+        attrs = {
+            'city_id': UID, 'rooms': 3, 'large': 1 << 40,
+            'huge': 1 << 70, 'yes': True, 'float': 2.5, 'name': "café",
+            'none': None, 'ids': [UID, UID.replace('5', '6')],
+            'empty': [], 'mixed': [UID, 1], 'nested': {'a': [1, "2"]},
+        }
+        self.assertEqual(self.round_trip(UID, WHEN, later, attrs),
+                         (UID, WHEN, later, attrs))
+        aware = WHEN.replace(tzinfo=datetime.timezone.utc)
+        self.assertEqual(self.round_trip("1", aware, aware, {}),
+                         ("1", aware.isoformat(), aware.isoformat(), {}))
+
+    def test_layouts(self):
+        schemas = binary.Schemas()
+        first = schemas.pack('Place', UID, WHEN, WHEN, {'rooms': 1})
+        self.assertEqual(len(schemas.unsaved), 1)
+        second = schemas.pack('Place', UID, WHEN, WHEN, {'rooms': 2})
+        self.assertEqual(len(schemas.unsaved), 1)
+        self.assertEqual(first[:4], second[:4])
+        schemas.pack('Place', UID, WHEN, WHEN, {'rooms': "2"})
+        self.assertEqual(len(schemas.unsaved), 2)
+        other = binary.Schemas()
+        for definition in schemas.unsaved:
+            other.define(definition)
+        self.assertEqual(other.fields(second)['rooms'], 2)
+
+    def test_malformed(self):
+        schemas = binary.Schemas()
+        data = schemas.pack('Place', UID, WHEN, WHEN, {'name': "Betty"})
+        with self.assertRaises(ValueError):
+            binary.Schemas().unpack(data)
+        for bad in (data[:-1], data + b'\0', data[:10]):
+            with self.assertRaises(ValueError):
+                schemas.unpack(bad)
+        with self.assertRaises(ValueError):
+            schemas.define(b'\0')
+        with self.assertRaises(ValueError):
+            schemas.define(binary.pack(UID, WHEN, WHEN, {})[:5])
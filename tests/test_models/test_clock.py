@@ -0,0 +1,40 @@
+#!/usr/bin/python3
+"""Unit tests for the models.clock module."""
+import datetime
+import unittest
+
+from models import clock
+from models.base_model import BaseModel
+
+
+class TestClock(unittest.TestCase):
+    """Tests for the injectable clock."""
+
+    moment = datetime.datetime(2017, 9, 28, 21, 3, 54, 52298)
+
+    def tearDown(self):
+        clock.set_source(None)
+
+    def test_one_read_per_construction(self):
+        calls = []
+
+        def source():
+            calls.append(None)
+            return self.moment
+        clock.set_source(source)
+        base = BaseModel()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(base.created_at, base.updated_at)
+        self.assertEqual(base.created_at, self.moment)
+
+    def test_frozen(self):
+        with clock.frozen(self.moment):
+            base = BaseModel()
+            base.save()
+            self.assertEqual(base.updated_at, self.moment)
+        self.assertNotEqual(clock.now(), self.moment)
+
+    def test_frozen_defaults_to_now(self):
+        with clock.frozen() as moment:
+            self.assertEqual(clock.now(), moment)
+            self.assertEqual(BaseModel.create_many(1)[0].created_at, moment)
@@ -0,0 +1,102 @@
+#!/usr/bin/python3
+"""Unit tests for the models.engine.codec module."""
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from models.base_model import BaseModel
+from models.engine import codec
+from models.engine.log_storage import LogStorage
+
+
+class TestCodec(unittest.TestCase):
+    """Tests for the JSON codec selection."""
+
+    def test_round_trip(self):
+        value = {'id': '1', 'name': "café / bar", 'rooms': [1, 2.5],
+                 'pets': None, 'open': True}
+        for name in codec.available():
+            encoded = codec.get_codec(name).encode(value)
+            self.assertIsInstance(encoded, bytes)
+            for other in codec.available():
+                decode = codec.get_codec(other).decode
+                self.assertEqual(decode(encoded), value)
+                self.assertEqual(decode(encoded.decode('utf-8')), value)
+
+    def test_values_only_json_handles(self):
+        value = {'big': 1 << 70, 'keys': {1: 'a'}, 'inf': float('inf')}
+        written = codec.get_codec('json').encode(value)
+        for name in codec.available():
+            self.assertEqual(codec.get_codec(name).decode(written),
+                             {'big': 1 << 70, 'keys': {'1': 'a'},
+                              'inf': float('inf')})
+            del value['inf']
+            encoded = codec.get_codec(name).encode(value)
+            value['inf'] = float('inf')
+            self.assertEqual(codec.get_codec('json').decode(encoded),
+                             {'big': 1 << 70, 'keys': {'1': 'a'}})
+
+    def test_non_finite_floats(self):
+        value = {'nan': float('nan'), 'inf': [float('inf')],
+                 'ninf': {'a': float('-inf')}, 'none': None}
+        for name in codec.available():
+            for other in codec.available():
+                decoded = codec.get_codec(other).decode(
+                    codec.get_codec(name).encode(value))
+                self.assertNotEqual(decoded['nan'], decoded['nan'])
+                self.assertEqual(decoded['inf'], [float('inf')])
+                self.assertEqual(decoded['ninf'], {'a': float('-inf')})
+                self.assertIsNone(decoded['none'])
+
+    def test_invalid_input(self):
+        for name in codec.available():
+            with self.assertRaises(ValueError):
+                codec.get_codec(name).decode(b'["put",{"id":')
+
+    def test_selection(self):
+        self.assertIn('json', codec.available())
+        self.assertEqual(codec.available()[-1], 'json')
+        with mock.patch.dict(os.environ, {codec.ENV: 'json'}):
+            self.assertEqual(codec.get_codec().name, 'json')
+        with mock.patch.dict(os.environ, {codec.ENV: ''}):
+            self.assertEqual(codec.get_codec().name, codec.available()[0])
+        json_codec = codec.get_codec('json')
+        self.assertIs(codec.get_codec(json_codec), json_codec)
+        with self.assertRaises(ValueError):
+            codec.get_codec('pickle')
+
+    def test_engine_codec(self):
+        tmp = tempfile.mkdtemp()
+        path = os.path.join(tmp, 'file.log')
+        try:
+            storage = LogStorage(path, codec='json')
+            self.addCleanup(storage.close)
+            base = BaseModel(name="codec")
+            storage.new(base)
+            storage.save()
+            storage.close()
+            for name in codec.available():
+                other = LogStorage(path, codec=name)
+                self.addCleanup(other.close)
+                other.reload()
+                self.assertEqual(other.get(BaseModel, base.id).to_dict(),
+                                 base.to_dict())
+                other.close()
+            base = BaseModel(lat=float('nan'), x=float('-inf'))
+            for name in codec.available():
+                storage = LogStorage(path, codec=name)
+                self.addCleanup(storage.close)
+                storage.new(base)
+                storage.save()
+                storage.close()
+                other = LogStorage(path, codec=name)
+                self.addCleanup(other.close)
+                other.reload()
+                copy = other.get(BaseModel, base.id)
+                self.assertNotEqual(copy.lat, copy.lat)
+                self.assertEqual(copy.x, float('-inf'))
+                other.close()
+        finally:
+            shutil.rmtree(tmp)
@@ -0,0 +1,172 @@
+#!/usr/bin/python3
+"""Unit tests for the models.engine.columnar module."""
+import datetime
+import random
+import unittest
+from unittest import mock
+
+from models.base_model import BaseModel, compact
+from models.engine import columnar
+from models.engine.columnar import ColumnStore
+
+
+class Lodging(BaseModel):
+    """A lodging."""
+
+
+class TestColumnStore(unittest.TestCase):
+    """Tests for the columnar in-memory store."""
+
+    def setUp(self):
+        self.store = ColumnStore()
+        self.places = [
+            Lodging(city_id='a', price_by_night=100, number_rooms=2),
+            Lodging(city_id='b', price_by_night=80, latitude=1.5),
+            Lodging(city_id='a', price_by_night=120, number_rooms=4),
+            Lodging(price_by_night=60),
+        ]
+        self.store.extend(self.places)
+
+    def test_columns(self):
+        table = self.store._tables['Lodging']
+        self.assertEqual(table.columns['price_by_night'].values.typecode,
+                         'q')
+        self.assertEqual(table.columns['latitude'].values.typecode, 'd')
+        self.assertEqual(table.columns['city_id'].strings, ['a', 'b'])
+        self.assertEqual(list(table.columns['city_id'].codes),
+                         [0, 1, 0, -1])
+        self.assertEqual(table.columns['created_at'].values.typecode, 'q')
+
+    def test_aggregates(self):
+        store = self.store
+        for numpy in (columnar.numpy, None):
+            with mock.patch.object(columnar, 'numpy', numpy):
+                self.assertEqual(store.count(Lodging), 4)
+                self.assertEqual(store.count('Lodging', 'number_rooms'), 2)
+                self.assertEqual(store.sum(Lodging, 'price_by_night'), 360)
+                self.assertEqual(store.mean(Lodging, 'number_rooms'), 3)
+                self.assertEqual(store.min(Lodging, 'price_by_night'), 60)
+                self.assertEqual(store.max(Lodging, 'latitude'), 1.5)
+                self.assertIsNone(store.mean(Lodging, 'missing'))
+                self.assertIsNone(store.min(Lodging, 'missing'))
+                self.assertEqual(store.sum('User', 'age'), 0)
+                with self.assertRaises(TypeError):
+                    store.sum(Lodging, 'city_id')
+
+    def test_group_by(self):
+        store = self.store
+        for numpy in (columnar.numpy, None):
+            with mock.patch.object(columnar, 'numpy', numpy):
+                self.assertEqual(store.group_by(Lodging, 'city_id'),
+                                 {'a': 2, 'b': 1})
+                self.assertEqual(
+                    store.group_by(Lodging, 'city_id', 'price_by_night',
+                                   'sum'),
+                    {'a': 220, 'b': 80})
+                self.assertEqual(
+                    store.group_by(Lodging, 'city_id', 'number_rooms',
+                                   'max'),
+                    {'a': 4})
+                self.assertEqual(
+                    store.group_by(Lodging, 'number_rooms',
+                                   'price_by_night', 'min'),
+                    {2: 100, 4: 120})
+                with self.assertRaises(ValueError):
+                    store.group_by(Lodging, 'city_id', agg='median')
+                with self.assertRaises(ValueError):
+                    store.group_by(Lodging, 'city_id', agg='sum')
+
+    @unittest.skipIf(columnar.numpy is None, "NumPy is not installed")
+    def test_arrays_match_loops(self):
+        rand = random.Random(0)
+        store = ColumnStore()
+        for _ in range(300):
+            attrs = {'city_id': rand.choice('abcd'),
+                     'rooms': rand.randrange(4),
+                     'price': rand.choice([rand.randrange(100), 2.5]),
+                     'large': rand.randrange(1 << 62)}
+            for name in list(attrs):
+                if rand.random() < 0.2:
+                    del attrs[name]
+            store.add(Lodging(**attrs))
+        for key in ('city_id', 'rooms', 'price'):
+            for attr in (None, 'rooms', 'price', 'large'):
+                for agg in ('count', 'sum', 'mean', 'min', 'max'):
+                    if attr is None and agg != 'count':
+                        continue
+                    result = store.group_by(Lodging, key, attr, agg)
+                    with mock.patch.object(columnar, 'numpy', None):
+                        expected = store.group_by(Lodging, key, attr, agg)
+                    self.assertEqual(list(result.items()),
+                                     list(expected.items()))
+                    self.assertEqual(
+                        [type(v) for v in result.values()],
+                        [type(v) for v in expected.values()])
+        for attr in ('rooms', 'price', 'large'):
+            for func in ('sum', 'mean', 'min', 'max'):
+                result = getattr(store, func)(Lodging, attr)
+                with mock.patch.object(columnar, 'numpy', None):
+                    expected = getattr(store, func)(Lodging, attr)
+                self.assertAlmostEqual(result, expected)
+                self.assertIs(type(result), type(expected))
+
+    def test_views(self):
+        place = self.store.get(Lodging, self.places[1].id)
+        self.assertIsNot(place, self.places[1])
+        self.assertEqual(place.to_dict(), self.places[1].to_dict())
+        self.assertFalse(place.is_dirty())
+        self.assertEqual([p.to_dict() for p in self.store.views(Lodging)],
+                         [p.to_dict() for p in self.places])
+        self.assertIsNone(self.store.get(Lodging, 'missing'))
+
+    def test_promotion(self):
+        place = self.places[0]
+        place.price_by_night = 99.5
+        place.tags = ['quiet']
+        self.store.add(place)
+        self.store.add(Lodging(price_by_night="free", tags=None))
+        column = self.store._tables['Lodging'].columns['price_by_night']
+        self.assertEqual(column.values, [99.5, 80, 120, 60, 'free'])
+        views = list(self.store.views(Lodging))
+        self.assertEqual(views[0].to_dict(), place.to_dict())
+        self.assertIs(type(views[1].price_by_night), int)
+        self.assertEqual(self.store.count(Lodging), 5)
+
+    def test_int_to_float(self):
+        self.store.add(Lodging(number_rooms=2.5))
+        self.assertEqual(self.store.sum(Lodging, 'number_rooms'), 8.5)
+        rooms = [p.to_dict().get('number_rooms')
+                 for p in self.store.views(Lodging)]
+        self.assertEqual(rooms, [2, None, 4, None, 2.5])
+        self.assertIs(type(rooms[0]), int)
+
+    def test_update_and_remove(self):
+        place = self.places[0]
+        del place.number_rooms
+        place.price_by_night = 10
+        self.store.add(place)
+        self.assertEqual(self.store.count(Lodging), 4)
+        self.assertEqual(self.store.count(Lodging, 'number_rooms'), 1)
+        self.assertTrue(self.store.remove(Lodging, place.id))
+        self.assertFalse(self.store.remove(Lodging, place.id))
+        self.assertEqual(self.store.sum(Lodging, 'price_by_night'), 260)
+        self.assertEqual(self.store.count(Lodging, 'number_rooms'), 1)
+        self.assertEqual(self.store.get(Lodging, self.places[3].id).to_dict(),
+                         self.places[3].to_dict())
+        for p in self.places[1:]:
+            self.store.remove(Lodging, p.id)
+        self.assertEqual(self.store.count(Lodging), 0)
+        self.assertIsNone(self.store.max(Lodging, 'price_by_night'))
+
+    def test_add_dict_and_compact(self):
+        @compact
+        class Review(BaseModel):
+            """A compact model."""
+        review = Review(text="Great", rating=5)
+        self.store.add_dict(review.to_dict())
+        copy = self.store.get(Review, review.id)
+        self.assertIsInstance(copy._id, int)
+        self.assertEqual(copy.to_dict(), review.to_dict())
+        aware = datetime.datetime(2017, 1, 1, tzinfo=datetime.timezone.utc)
+        self.store.add(Review(created_at=aware.isoformat()))
+        self.assertEqual(self.store.count(Review), 2)
@@ -0,0 +1,56 @@
+#!/usr/bin/python3
+"""Unit tests for the models.engine.index module."""
+import unittest
+
+from models.engine.index import AttributeIndex
+
+
+class TestAttributeIndex(unittest.TestCase):
+    """Tests for the hash and sorted attribute index."""
+
+    def setUp(self):
+        self.index = AttributeIndex('price')
+        for i, value in enumerate([120, 80, 120, 'a', None, [1], 99.5]):
+            self.index.add('Place.{}'.format(i), value)
+
+    def test_equal(self):
+        self.assertEqual(self.index.equal(120), {'Place.0', 'Place.2'})
+        self.assertEqual(self.index.equal(None), {'Place.4'})
+        self.assertEqual(self.index.equal([1]), {'Place.5'})
+        self.assertEqual(self.index.equal(7), set())
+
+    def test_range(self):
+        self.assertEqual(list(self.index.range(80, 120)),
+                         ['Place.1', 'Place.6', 'Place.0', 'Place.2'])
+        self.assertEqual(list(self.index.range(80, 120, include_low=False,
+                                               include_high=False)),
+                         ['Place.6'])
+        self.assertEqual(list(self.index.range(high=90, reverse=True)),
+                         ['Place.1'])
+        self.assertEqual(list(self.index.range('a')), ['Place.3'])
+        with self.assertRaises(TypeError):
+            list(self.index.range())
+
+    def test_update_and_remove(self):
+        self.index.add('Place.0', 10)
+        self.assertEqual(self.index.equal(120), {'Place.2'})
+        self.assertEqual(list(self.index.range(high=50)), ['Place.0'])
+        self.index.remove('Place.5')
+        self.index.remove('missing')
+        self.assertEqual(self.index.equal([1]), set())
+        self.assertEqual(len(self.index), 6)
+
+    def test_resume(self):
+        self.assertEqual(list(self.index.ordered(after=(120, 'Place.0'))),
+                         ['Place.2', 'Place.3', 'Place.4', 'Place.5'])
+        self.assertEqual(list(self.index.ordered(True, ('a', 'Place.9'))),
+                         ['Place.3', 'Place.2', 'Place.0', 'Place.6',
+                          'Place.1'])
+        self.assertEqual(list(self.index.ordered(after=(None, 'Place.4'))),
+                         ['Place.5'])
+        self.assertEqual(list(self.index.range(80, 120,
+                                               after=(99.5, 'Place.6'))),
+                         ['Place.0', 'Place.2'])
+        self.assertEqual(list(self.index.range(high=120, reverse=True,
+                                               after=(120, 'Place.2'))),
+                         ['Place.0', 'Place.6', 'Place.1'])
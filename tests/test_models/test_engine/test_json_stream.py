@@ -0,0 +1,76 @@
+#!/usr/bin/python3
+"""Unit tests for the models.engine.json_stream module."""
+import io
+import json
+import unittest
+
+from models.base_model import BaseModel
+from models.engine import json_stream
+
+
+class TestJsonStream(unittest.TestCase):
+    """Tests for the streaming JSON encoder."""
+
+    def setUp(self):
+        self.objs = BaseModel.create_many(50, name="stream")
+
+    def test_array_matches_json(self):
+        text = ''.join(json_stream.iter_json(self.objs))
+        self.assertEqual(json.loads(text),
+                         [o.to_dict() for o in self.objs])
+        self.assertEqual(''.join(json_stream.iter_json([])), '[]')
+
+    def test_ndjson_and_mapping(self):
+        objs = {'BaseModel.' + o.id: o for o in self.objs}
+        lines = ''.join(json_stream.iter_json(objs, ndjson=True))
+        dicts = [json.loads(line) for line in lines.splitlines()]
+        self.assertEqual(dicts, [o.to_dict() for o in self.objs])
+
+    def test_dump_text_and_binary(self):
+        text, raw = io.StringIO(), io.BytesIO()
+        n = json_stream.dump(self.objs, text, buffer_size=100)
+        json_stream.dump(self.objs, raw, buffer_size=1)
+        self.assertEqual(n, len(text.getvalue()))
+        self.assertEqual(raw.getvalue().decode(), text.getvalue())
+        with self.assertRaises(ValueError):
+            json_stream.dump(self.objs, text, buffer_size=0)
+
+
+class TestIterLoad(unittest.TestCase):
+    """Tests for the incremental JSON loader."""
+
+    def setUp(self):
+        self.objs = BaseModel.create_many(20, name="load", tags=[1, {"a": 2}])
+        self.dicts = [o.to_dict() for o in self.objs]
+
+    def load(self, doc, chunk_size=7):
+        return [o.to_dict() for o in json_stream.iter_load(
+            io.StringIO(doc), chunk_size)]
+
+    def test_layouts(self):
+        array = ''.join(json_stream.iter_json(self.objs))
+        ndjson = ''.join(json_stream.iter_json(self.objs, ndjson=True))
+        mapping = json.dumps({'BaseModel.' + d['id']: d
+                              for d in self.dicts}, indent=4)
+        for doc in (array, ndjson, mapping):
+            self.assertEqual(self.load(doc), self.dicts)
+        for doc in ('', '[]', '{}', '\n'):
+            self.assertEqual(self.load(doc), [])
+
+    def test_binary_and_clean(self):
+        raw = io.BytesIO(''.join(json_stream.iter_json(self.objs)).encode())
+        objs = list(json_stream.iter_load(raw, chunk_size=3))
+        self.assertEqual([o.to_dict() for o in objs], self.dicts)
+        self.assertFalse(objs[0].is_dirty())
+        self.assertIsInstance(objs[0], BaseModel)
+
+    def test_lazy(self):
+        doc = '[' + json.dumps(self.dicts[0]) + ', {"broken'
+        it = json_stream.iter_load(io.StringIO(doc), chunk_size=16)
+        self.assertEqual(next(it).id, self.objs[0].id)
+        with self.assertRaises(ValueError):
+            next(it)
+
+    def test_unknown_class(self):
+        with self.assertRaises(ValueError):
+            self.load('[{"__class__": "Nope", "id": "1"}]')
@@ -0,0 +1,118 @@
+#!/usr/bin/python3
+"""Unit tests for the models.engine.log_reader module."""
+import os
+import shutil
+import tempfile
+import unittest
+
+from models.base_model import BaseModel
+from models.engine.log_reader import LogReader
+from models.engine.log_storage import LogStorage
+
+
+class TestLogReader(unittest.TestCase):
+    """Tests for the memory-mapped read path."""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'file.log')
+        self.storage = LogStorage(self.path, durability='none')
+        self.reader = LogReader(self.path)
+
+    def tearDown(self):
+        self.reader.close()
+        self.storage.close()
+        shutil.rmtree(self.dir)
+
+    def index_lines(self):
+        with open(self.path + '.idx') as f:
+            return len(f.readlines())
+
+    def test_missing_log(self):
+        self.assertIsNone(self.reader.get(BaseModel, 'missing'))
+
+    def test_get(self):
+        objs = BaseModel.create_many(3, number=1)
+        for obj in objs:
+            self.storage.new(obj)
+        self.storage.save()
+        found = self.reader.get(BaseModel, objs[1].id)
+        self.assertEqual(found.to_dict(), objs[1].to_dict())
+        self.assertIsNot(found, objs[1])
+        self.assertFalse(found.is_dirty())
+        self.assertIsNone(self.reader.get(BaseModel, 'missing'))
+
+    def test_incremental_index(self):
+        obj = BaseModel()
+        self.storage.new(obj)
+        self.storage.save()
+        self.reader.get(BaseModel, obj.id)
+        self.assertEqual(self.index_lines(), 2)
+        obj.number = 2
+        self.storage.save()
+        self.assertEqual(self.reader.get(BaseModel, obj.id).number, 2)
+        self.assertEqual(self.index_lines(), 3)
+        self.reader.get(BaseModel, obj.id)
+        self.assertEqual(self.index_lines(), 3)
+        self.storage.delete(obj)
+        self.storage.save()
+        self.assertIsNone(self.reader.get(BaseModel, obj.id))
+
+    def test_persisted_index(self):
+        obj = BaseModel(number=1)
+        self.storage.new(obj)
+        self.storage.save()
+        self.reader.get(BaseModel, obj.id)
+        other = LogReader(self.path)
+        log = other._log('BaseModel')
+        log._inode = os.stat(self.path).st_ino
+        log._read_index()
+        self.assertEqual(log.size, os.path.getsize(self.path))
+        self.assertEqual(log.offsets, self.reader._log('BaseModel').offsets)
+        self.assertEqual(other.get(BaseModel, obj.id).number, 1)
+        self.assertEqual(self.index_lines(), 2)
+        other.close()
+
+    def test_compaction(self):
+        obj = BaseModel()
+        self.storage.new(obj)
+        for i in range(5):
+            obj.number = i
+            self.storage.save()
+        self.reader.get(BaseModel, obj.id)
+        self.storage.compact()
+        obj.number = 10
+        self.storage.save()
+        self.assertEqual(self.reader.get(BaseModel, obj.id).number, 10)
+
+    def test_torn_record(self):
+        obj = BaseModel()
+        self.storage.new(obj)
+        self.storage.save()
+        self.storage.close()
+        with open(self.path, 'ab') as f:
+            f.write(b'["put",{"id":')
+        self.assertIsNotNone(self.reader.get(BaseModel, obj.id))
+        self.assertEqual(self.index_lines(), 2)
+
+    def test_sharded(self):
+        storage = LogStorage(self.dir, shard_by_class=True)
+        self.addCleanup(storage.close)
+        obj = BaseModel()
+        storage.new(obj)
+        storage.save()
+        storage.close()
+        reader = LogReader(self.dir)
+        self.assertEqual(reader.get('BaseModel', obj.id).id, obj.id)
+        reader.close()
+
+    def test_stale_index_rebuilt(self):
+        obj = BaseModel()
+        self.storage.new(obj)
+        self.storage.save()
+        with open(self.path + '.idx', 'w') as f:
+            f.write('[{}]\n'.format(os.stat(self.path).st_ino))
+            f.write('[{}, {{"BaseModel.{}": [3, 9]}}]\n'.format(
+                os.path.getsize(self.path), obj.id))
+        self.assertEqual(self.reader.get(BaseModel, obj.id).id, obj.id)
+        self.assertEqual(self.index_lines(), 2)
@@ -0,0 +1,377 @@
+#!/usr/bin/python3
+"""Unit tests for the models.engine.log_storage module."""
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from models.base_model import BaseModel
+from models.engine.log_storage import LogStorage, _Shard
+
+
+class TestLogStorage(unittest.TestCase):
+    """Tests for the append-only log storage engine."""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'file.log')
+        self.storage = LogStorage(self.path)
+
+    def tearDown(self):
+        self.storage.close()
+        shutil.rmtree(self.dir)
+
+    def reloaded(self):
+        storage = LogStorage(self.path)
+        self.addCleanup(storage.close)
+        storage.reload()
+        return storage
+
+    def records(self):
+        with open(self.path) as f:
+            return f.read().splitlines()
+
+    def test_round_trip(self):
+        objs = BaseModel.create_many(10, name="log")
+        for obj in objs:
+            self.storage.new(obj)
+        self.storage.save()
+        self.assertFalse(objs[0].is_dirty())
+        other = self.reloaded()
+        self.assertEqual({k: v.to_dict() for k, v in other.all().items()},
+                         {k: v.to_dict()
+                          for k, v in self.storage.all().items()})
+        self.assertEqual(len(self.storage.all(BaseModel)), 10)
+        self.assertEqual(len(self.storage.all('User')), 0)
+
+    def test_class_index(self):
+        class City(BaseModel):
+            """A city."""
+        cities = City.create_many(3)
+        for obj in cities + BaseModel.create_many(5):
+            self.storage.new(obj)
+        self.assertEqual(self.storage.count(), 8)
+        self.assertEqual(self.storage.count(City), 3)
+        self.assertEqual(self.storage.count('User'), 0)
+        self.storage.delete(cities[0])
+        self.assertEqual(set(self.storage.all('City')),
+                         {'City.' + c.id for c in cities[1:]})
+        self.storage.save()
+        self.assertEqual(self.reloaded().count(City), 2)
+
+    def test_find(self):
+        class User(BaseModel):
+            """A user."""
+            __indexes__ = ('email', 'age')
+        users = User.create_many(4, email="a@b.c", age=30)
+        users[1].email = "x@y.z"
+        for user in users:
+            self.storage.new(user)
+        users[2].email = "x@y.z"
+        users[3].age = 40
+        self.assertEqual(set(self.storage.find(User, email="x@y.z")),
+                         {'User.' + users[1].id, 'User.' + users[2].id})
+        self.assertEqual(list(self.storage.find(User, email="a@b.c",
+                                                age=40)),
+                         ['User.' + users[3].id])
+        self.assertEqual(list(self.storage.find_range(User, 'age', 35)),
+                         ['User.' + users[3].id])
+        del users[3].age
+        self.assertEqual(self.storage.find_range(User, 'age', 35), {})
+        self.storage.delete(users[1])
+        self.assertEqual(list(self.storage.find(User, email="x@y.z")),
+                         ['User.' + users[2].id])
+        self.storage.save()
+        other = self.reloaded()
+        self.assertEqual(list(other.find(User, email="x@y.z")),
+                         ['User.' + users[2].id])
+
+    def test_save_appends_changes_only(self):
+        objs = BaseModel.create_many(5)
+        for obj in objs:
+            self.storage.new(obj)
+        self.storage.save()
+        objs[1].name = "Betty"
+        self.storage.delete(objs[2])
+        self.storage.save()
+        self.storage.save()
+        self.assertEqual(len(self.records()), 7)
+        other = self.reloaded()
+        self.assertEqual(len(other.all()), 4)
+        self.assertEqual(other.all()['BaseModel.' + objs[1].id].name,
+                         "Betty")
+
+    def test_write_during_flush_kept(self):
+        base = BaseModel(name="v1")
+        self.storage.new(base)
+        append = _Shard.append
+
+        def write_then_append(shard, records):
+            base.name = "v2"
+            append(shard, records)
+        with mock.patch.object(_Shard, 'append', write_then_append):
+            self.storage.save()
+        self.assertTrue(base.is_dirty())
+        self.assertEqual(self.storage.pending(), 1)
+        self.storage.save()
+        self.assertEqual(self.reloaded().get(BaseModel, base.id).name, "v2")
+
+    def test_failed_flush_kept(self):
+        base = BaseModel()
+        self.storage.new(base)
+        with mock.patch.object(_Shard, 'append', side_effect=OSError):
+            with self.assertRaises(OSError):
+                self.storage.save()
+        self.assertEqual(self.storage.pending(), 1)
+        self.storage.save()
+        self.assertEqual(self.reloaded().count(), 1)
+
+    def test_truncated_record_dropped(self):
+        base = BaseModel()
+        self.storage.new(base)
+        self.storage.save()
+        with open(self.path, 'ab') as f:
+            f.write(b'["put",{"id":')
+        other = self.reloaded()
+        self.assertEqual(list(other.all()), ['BaseModel.' + base.id])
+        self.assertEqual(len(self.records()), 1)
+
+    def test_compaction(self):
+        self.storage.compact_min = 10
+        base = BaseModel()
+        self.storage.new(base)
+        for i in range(30):
+            base.number = i
+            self.storage.save()
+        self.storage.close()
+        self.assertLess(len(self.records()), 30)
+        self.storage.compact()
+        self.assertEqual(len(self.records()), 1)
+        self.assertEqual(self.reloaded().all()['BaseModel.' + base.id]
+                         .number, 29)
+
+    def test_compaction_skips_unsaved_changes(self):
+        objs = BaseModel.create_many(3, name="saved")
+        for obj in objs:
+            self.storage.new(obj)
+        self.storage.save()
+        objs[0].name = "unsaved"
+        self.storage.delete(objs[1])
+        self.storage.new(BaseModel())
+        self.storage.compact()
+        self.assertEqual(len(self.records()), 3)
+        other = self.reloaded()
+        self.assertEqual(set(other.all()),
+                         {'BaseModel.' + o.id for o in objs})
+        self.assertEqual(other.get(BaseModel, objs[0].id).name, "saved")
+        self.storage.save()
+        self.assertEqual(self.reloaded().count(), 3)
+
+    def test_binary_records(self):
+        with self.assertRaises(ValueError):
+            LogStorage(self.path, record_format='pickle')
+        storage = LogStorage(self.path, record_format='binary')
+        self.addCleanup(storage.close)
+        objs = BaseModel.create_many(3, name="bin")
+        for obj in objs:
+            storage.new(obj)
+        storage.save()
+        objs[0].rooms = [1, 2]
+        storage.delete(objs[1])
+        storage.save()
+        storage.close()
+        with open(self.path, 'ab') as f:
+            f.write(b'\x40\0\0\0p')
+        other = LogStorage(self.path, record_format='binary')
+        self.addCleanup(other.close)
+        other.reload()
+        self.assertEqual({k: v.to_dict() for k, v in other.all().items()},
+                         {'BaseModel.' + o.id: o.to_dict()
+                          for o in (objs[0], objs[2])})
+        self.assertFalse(other.pending())
+        self.assertEqual(other._shards[None].records, 5)
+        other.compact()
+        other.reload()
+        self.assertEqual(other._shards[None].records, 2)
+        self.assertEqual(other.count(), 2)
+        other.close()
+
+    def test_binary_layouts(self):
+        path = os.path.join(self.dir, 'bin.log')
+        storage = LogStorage(path, record_format='binary')
+        self.addCleanup(storage.close)
+        objs = BaseModel.create_many(50)
+        for obj in objs:
+            obj.city_id = BaseModel().id
+            obj.amenity_ids = [BaseModel().id, BaseModel().id]
+            storage.new(obj)
+        storage.save()
+        storage.close()
+        json = LogStorage(self.path)
+        self.addCleanup(json.close)
+        for obj in objs:
+            json.new(obj)
+        json.save()
+        json.close()
+        self.assertLess(os.path.getsize(path) * 3,
+                        os.path.getsize(self.path))
+        # Appending without a reload first reads the layouts of the log.
+        storage = LogStorage(path, record_format='binary')
+        self.addCleanup(storage.close)
+        objs[0].name = "new layout"
+        storage.new(objs[0])
+        storage.new(BaseModel(id="1"))
+        storage.save()
+        storage.close()
+        other = LogStorage(path, record_format='binary')
+        self.addCleanup(other.close)
+        other.reload()
+        self.assertEqual(other.count(), 51)
+        self.assertEqual(other.get(BaseModel, objs[0].id).to_dict(),
+                         objs[0].to_dict())
+        self.assertEqual(other._shards[None].records, 52)
+        other.compact()
+        other.reload()
+        self.assertEqual(other._shards[None].records, 51)
+        self.assertEqual(other.get(BaseModel, objs[1].id).to_dict(),
+                         objs[1].to_dict())
+        other.close()
+
+    def test_durability(self):
+        with self.assertRaises(ValueError):
+            LogStorage(self.path, durability='always')
+        for level in ('none', 'save', 'batch'):
+            storage = LogStorage(self.path, durability=level)
+            self.addCleanup(storage.close)
+            storage.new(BaseModel())
+            storage.save()
+            if level == 'batch':
+                self.assertEqual(storage._durable, 1)
+                self.assertFalse(storage._unsynced)
+            storage.close()
+        self.assertEqual(len(self.records()), 3)
+        self.storage.reload()
+        self.storage.compact()
+        self.assertEqual(os.listdir(self.dir), ['file.log'])
+
+    def test_group_commit(self):
+        objs = BaseModel.create_many(8)
+        for obj in objs:
+            self.storage.new(obj)
+        self.storage.save()
+        syncs = []
+        sync = _Shard.sync
+
+        def slow_sync(shard):
+            syncs.append(shard)
+            time.sleep(0.05)
+            sync(shard)
+
+        def update(obj):
+            obj.number = 1
+            self.storage.save()
+        with mock.patch.object(_Shard, 'sync', slow_sync):
+            threads = [threading.Thread(target=update, args=(obj,))
+                       for obj in objs]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(len(self.records()), 16)
+        self.assertLess(len(syncs), 8)
+        self.assertEqual(self.storage._durable, self.storage._appended)
+
+    def test_failed_fsync_raised(self):
+        self.storage.new(BaseModel())
+        with mock.patch.object(_Shard, 'sync', side_effect=OSError(5, 'EIO')):
+            with self.assertRaises(OSError):
+                self.storage.save()
+        self.storage.new(BaseModel())
+        self.storage.save()
+        self.assertEqual(self.storage._durable, 2)
+
+
+class TestShardedLogStorage(unittest.TestCase):
+    """Tests for the one-log-per-class layout."""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.storage = LogStorage(self.dir, shard_by_class=True)
+
+        class City(BaseModel):
+            """A city."""
+        self.City = City
+
+    def tearDown(self):
+        self.storage.close()
+        shutil.rmtree(self.dir)
+
+    def lines(self, name):
+        with open(os.path.join(self.dir, name + '.log')) as f:
+            return len(f.readlines())
+
+    def test_only_changed_shards_written(self):
+        cities = self.City.create_many(3)
+        bases = BaseModel.create_many(2)
+        for obj in cities + bases:
+            self.storage.new(obj)
+        self.storage.save()
+        self.assertEqual(sorted(os.listdir(self.dir)),
+                         ['BaseModel.log', 'City.log'])
+        cities[0].name = "Paris"
+        self.storage.delete(cities[1])
+        self.storage.save()
+        self.assertEqual(self.lines('City'), 5)
+        self.assertEqual(self.lines('BaseModel'), 2)
+
+    def test_reload_one_class(self):
+        city = self.City()
+        base = BaseModel()
+        self.storage.new(city)
+        self.storage.new(base)
+        self.storage.save()
+        other = LogStorage(self.dir, shard_by_class=True)
+        self.addCleanup(other.close)
+        other.reload(self.City)
+        self.assertEqual(list(other.all()), ['City.' + city.id])
+        other.reload('BaseModel')
+        self.assertEqual(other.count(), 2)
+        other.reload()
+        self.assertEqual(other.count(), 2)
+        other.close()
+
+    def test_compaction_per_shard(self):
+        self.storage.compact_min = 5
+        city = self.City()
+        self.storage.new(city)
+        self.storage.new(BaseModel())
+        for i in range(20):
+            city.number = i
+            self.storage.save()
+        self.storage.close()
+        self.assertLess(self.lines('City'), 20)
+        self.storage.compact()
+        self.assertEqual(self.lines('City'), 1)
+        self.assertEqual(self.lines('BaseModel'), 1)
+
+    def test_lazy_loading(self):
+        city = self.City()
+        base = BaseModel()
+        self.storage.new(city)
+        self.storage.new(base)
+        self.storage.save()
+        with self.assertRaises(ValueError):
+            LogStorage(self.dir, lazy=True)
+        other = LogStorage(self.dir, shard_by_class=True, lazy=True)
+        self.addCleanup(other.close)
+        other.reload()
+        self.assertEqual(other._shards, {})
+        self.assertIs(other.get(self.City, city.id).__class__, self.City)
+        self.assertEqual(list(other._shards), ['City'])
+        self.assertIsNone(other.get('BaseModel', 'missing'))
+        other.reload()
+        self.assertEqual(other.count(), 2)
+        other.close()
@@ -0,0 +1,59 @@
+#!/usr/bin/python3
+"""Unit tests for the models.engine.object_cache module."""
+import gc
+import unittest
+
+from models.base_model import BaseModel
+from models.engine.object_cache import ObjectCache
+
+
+class TestObjectCache(unittest.TestCase):
+    """Tests for the identity map with LRU eviction."""
+
+    def setUp(self):
+        self.cache = ObjectCache(maxsize=2)
+
+    def test_one_instance_per_key(self):
+        first = BaseModel()
+        second = BaseModel(**first.to_dict())
+        self.assertIs(self.cache.add('k', first), first)
+        self.assertIs(self.cache.add('k', second), first)
+        self.cache.replace('k', second)
+        self.assertIs(self.cache.get('k'), second)
+
+    def test_counters(self):
+        self.cache.add('k', BaseModel())
+        self.cache.get('k')
+        self.cache.get('k')
+        self.cache.get('other')
+        self.cache.peek('k')
+        self.assertEqual((self.cache.hits, self.cache.misses), (2, 1))
+
+    def test_lru_eviction(self):
+        for key in 'abc':
+            self.cache.add(key, BaseModel())
+        gc.collect()
+        self.assertNotIn('a', self.cache)
+        self.assertEqual(len(self.cache), 2)
+        self.cache.get('b')
+        self.cache.add('d', BaseModel())
+        gc.collect()
+        self.assertIn('b', self.cache)
+        self.assertNotIn('c', self.cache)
+
+    def test_referenced_instances_kept(self):
+        kept = BaseModel()
+        self.cache.add('kept', kept)
+        for key in 'abc':
+            self.cache.add(key, BaseModel())
+        gc.collect()
+        self.assertIs(self.cache.get('kept'), kept)
+
+    def test_pop_and_clear(self):
+        obj = BaseModel()
+        self.cache.add('k', obj)
+        self.cache.pop('k')
+        self.assertIsNone(self.cache.peek('k'))
+        self.cache.add('k', obj)
+        self.cache.clear()
+        self.assertEqual(len(self.cache), 0)
@@ -0,0 +1,172 @@
+#!/usr/bin/python3
+"""Unit tests for the models.engine.query module."""
+import unittest
+from unittest import mock
+
+from models.base_model import BaseModel
+from models.engine import log_storage
+from models.engine.log_storage import LogStorage
+
+
+class Place(BaseModel):
+    """A place with indexed attributes."""
+    __indexes__ = ('city_id', 'price')
+
+
+class TestQuery(unittest.TestCase):
+    """Tests for the lazy query API."""
+
+    def setUp(self):
+        self.storage = LogStorage('/dev/null', durability='none')
+        self.places = []
+        for i, (city, price) in enumerate([('a', 100), ('b', 50),
+                                           ('a', 75), ('c', 'n/a'),
+                                           ('a', None), ('b', 120)]):
+            place = Place(id=str(i), city_id=city, price=price, rooms=i)
+            self.places.append(place)
+            self.storage.new(place)
+        self.storage.new(Place(id='6', city_id='c'))
+
+    def tearDown(self):
+        self.storage.close()
+
+    def ids(self, query):
+        return [o.id for o in query]
+
+    def test_where(self):
+        q = self.storage.query(Place)
+        self.assertEqual(sorted(self.ids(q.where('city_id', '==', 'a'))),
+                         ['0', '2', '4'])
+        q = self.storage.query(Place).where('price', '>', 60)
+        self.assertEqual(self.ids(q), ['2', '0', '5'])
+        q = self.storage.query(Place).where('rooms', '<', 2)
+        self.assertEqual(sorted(self.ids(q)), ['0', '1'])
+        q = self.storage.query('Place').where('city_id', 'in', ['b', 'c'])
+        self.assertEqual(sorted(self.ids(q.where('rooms', '!=', 1))),
+                         ['3', '5'])
+        with self.assertRaises(ValueError):
+            self.storage.query(Place).where('price', '~', 1)
+
+    def test_order_by_and_limit(self):
+        q = self.storage.query(Place).order_by('price')
+        self.assertEqual(self.ids(q), ['1', '2', '0', '5', '3', '4', '6'])
+        q = self.storage.query(Place).order_by('price', reverse=True)
+        self.assertEqual(self.ids(q.limit(3)), ['6', '4', '3'])
+        q = self.storage.query(Place).order_by('rooms', reverse=True)
+        self.assertEqual(self.ids(q.limit(2)), ['6', '5'])
+        q = self.storage.query(Place).where('city_id', '==', 'a')
+        self.assertEqual(self.ids(q.order_by('price')), ['2', '0', '4'])
+
+    def test_only(self):
+        q = self.storage.query(Place).where('price', '>=', 100)
+        self.assertEqual(q.only('id', 'price', '__class__').all(),
+                         [{'id': '0', 'price': 100, '__class__': 'Place'},
+                          {'id': '5', 'price': 120, '__class__': 'Place'}])
+        d = self.storage.query(Place).only('created_at').limit(1).all()[0]
+        self.assertIsInstance(d['created_at'], str)
+
+    def test_follows_assignments(self):
+        self.places[1].price = 1000
+        q = self.storage.query(Place).where('price', '>', 110)
+        self.assertEqual(self.ids(q), ['5', '1'])
+
+    def test_lazy(self):
+        q = iter(self.storage.query(Place).where('price', '>', 0))
+        self.assertEqual(next(q).id, '1')
+        self.assertEqual(self.storage.query('User').all(), [])
+
+    def test_pagination(self):
+        def page(**kwargs):
+            q = self.storage.query(Place).order_by('rooms').limit(2)
+            if 'offset' in kwargs:
+                q.offset(kwargs['offset'])
+            if 'after' in kwargs:
+                q.after(kwargs['after'])
+            return self.ids(q)
+        self.assertEqual(page(), ['0', '1'])
+        self.assertEqual(page(offset=2), ['2', '3'])
+        self.assertEqual(page(after='3'), ['4', '5'])
+        self.assertEqual(page(after='6'), [])
+        with self.assertRaises(KeyError):
+            page(after='missing')
+        self.storage.delete(self.places[0])
+        self.assertEqual(page(after='3'), ['4', '5'])
+        self.storage.delete(self.places[3])
+        self.assertEqual(page(after=self.places[3]), ['4', '5'])
+        with self.assertRaises(KeyError):
+            page(after='3')
+
+    def test_cursor_pages(self):
+        self.storage.new(Place(id='7', city_id='a', price=75, rooms=2))
+        self.storage.new(Place(id='8', price=None))
+        q = self.storage.query(Place).after('5')
+        self.assertEqual(self.ids(q), ['6', '7', '8'])
+        for attr in ('price', 'city_id', 'rooms', 'id'):
+            for reverse in (False, True):
+                for where in ((), ('city_id', '!=', 'b'),
+                              ('price', '>=', 75), ('price', '<', 100)):
+                    def query():
+                        q = self.storage.query(Place)
+                        if where:
+                            q.where(*where)
+                        return q.order_by(attr, reverse)
+                    expected = self.ids(query())
+                    pages = []
+                    q = query().limit(2)
+                    while True:
+                        objs = q.all()
+                        pages.extend(o.id for o in objs)
+                        if not objs:
+                            break
+                        q = query().after(objs[-1]).limit(2)
+                    self.assertEqual(pages, expected,
+                                     (attr, reverse, where))
+
+    def test_aggregates(self):
+        for numpy in (log_storage.numpy, None):
+            with mock.patch.object(log_storage, 'numpy', numpy):
+                q = self.storage.query(Place)
+                self.assertEqual(q.count(), 7)
+                self.assertEqual(q.sum('rooms'), 15)
+                self.assertEqual(q.mean('rooms'), 2.5)
+                self.assertEqual((q.min('rooms'), q.max('rooms')), (0, 5))
+                q = self.storage.query(Place).where('rooms', '>=', 2)
+                self.assertEqual(q.count(), 4)
+                self.assertEqual(q.where('city_id', '==', 'a').count(), 2)
+                q = self.storage.query(Place).where('price', '<', 100)
+                self.assertEqual((q.count(), q.sum('price')), (2, 125))
+                q = self.storage.query(Place).where('rooms', '>', 9)
+                self.assertEqual((q.sum('rooms'), q.mean('rooms'),
+                                  q.max('rooms')), (0, None, None))
+                q = self.storage.query(Place).order_by('rooms').limit(2)
+                self.assertEqual((q.count(), q.sum('rooms')), (2, 1))
+                q = self.storage.query(Place)
+                with self.assertRaises(TypeError):
+                    q.sum('price')
+
+    def test_columns_follow_changes(self):
+        q = self.storage.query(Place).where('rooms', '>', 3)
+        self.assertEqual(self.ids(q), ['4', '5'])
+        self.storage.save()
+        self.places[1].rooms = 10
+        self.places[1].rooms = 11
+        self.assertEqual(self.storage.query(Place).max('rooms'), 11)
+        self.storage.save()
+        self.places[1].rooms = 1
+        self.assertEqual(self.storage.query(Place).max('rooms'), 5)
+        self.places[1].rooms = 12
+        self.storage.save()
+        self.assertEqual(self.storage.query(Place).max('rooms'), 12)
+        place = Place(id='8', rooms=0)
+        self.storage.new(place)
+        self.assertEqual(self.storage.query(Place).max('rooms'), 12)
+        place.rooms = 99
+        self.storage.save()
+        self.assertEqual(self.storage.query(Place).max('rooms'), 99)
+        q = self.storage.query(Place).where('rooms', '>', 50)
+        self.assertEqual(self.ids(q), ['8'])
+        self.storage.delete(place)
+        self.storage.delete(self.places[5])
+        self.storage.new(Place(id='7', rooms=2.5))
+        q = self.storage.query(Place).where('rooms', 'in', [2.5, 4])
+        self.assertEqual(self.ids(q), ['4', '7'])
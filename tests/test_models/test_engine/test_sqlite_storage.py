@@ -0,0 +1,135 @@
+#!/usr/bin/python3
+"""Unit tests for the models.engine.sqlite_storage module."""
+import os
+import shutil
+import tempfile
+import unittest
+
+from models.base_model import BaseModel
+from models.engine.codec import Codec
+from models.engine.sqlite_storage import SQLiteStorage
+
+
+class TestSQLiteStorage(unittest.TestCase):
+    """Tests for the SQLite storage engine."""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'file.db')
+        self.storage = SQLiteStorage(self.path)
+
+    def tearDown(self):
+        self.storage.close()
+        shutil.rmtree(self.dir)
+
+    def test_round_trip(self):
+        objs = BaseModel.create_many(10, name="sql")
+        for obj in objs:
+            self.storage.new(obj)
+        self.assertEqual(self.storage.count(BaseModel), 10)
+        self.storage.save()
+        other = SQLiteStorage(self.path)
+        self.addCleanup(other.close)
+        self.assertEqual(other.count(), 10)
+        self.assertEqual({k: v.to_dict() for k, v in other.all().items()},
+                         {'BaseModel.' + o.id: o.to_dict() for o in objs})
+        self.assertEqual(other.all('User'), {})
+        other.close()
+
+    def test_get_returns_one_instance(self):
+        base = BaseModel()
+        self.storage.new(base)
+        self.storage.save()
+        other = SQLiteStorage(self.path)
+        self.addCleanup(other.close)
+        first = other.get(BaseModel, base.id)
+        self.assertEqual(first.to_dict(), base.to_dict())
+        self.assertIs(other.get('BaseModel', base.id), first)
+        self.assertIs(other.all()['BaseModel.' + base.id], first)
+        self.assertIsNone(other.get(BaseModel, 'missing'))
+        other.close()
+
+    def test_hot_objects_cached(self):
+        objs = BaseModel.create_many(3)
+        for obj in objs:
+            self.storage.new(obj)
+        self.storage.save()
+        other = SQLiteStorage(self.path, cache_size=1)
+        self.addCleanup(other.close)
+        first = id(other.get(BaseModel, objs[0].id))
+        self.assertEqual(id(other.get(BaseModel, objs[0].id)), first)
+        self.assertEqual((other.cache.hits, other.cache.misses), (1, 1))
+        other.get(BaseModel, objs[1].id)
+        self.assertNotIn('BaseModel.' + objs[0].id, other.cache)
+        other.close()
+
+    def test_update_and_delete(self):
+        objs = BaseModel.create_many(3)
+        for obj in objs:
+            self.storage.new(obj)
+        self.storage.save()
+        objs[0].name = "Betty"
+        self.storage.delete(objs[1])
+        self.assertEqual(self.storage.count(), 2)
+        self.storage.save()
+        other = SQLiteStorage(self.path)
+        self.addCleanup(other.close)
+        self.assertEqual(other.count(BaseModel), 2)
+        self.assertEqual(other.get(BaseModel, objs[0].id).name, "Betty")
+        self.assertIsNone(other.get(BaseModel, objs[1].id))
+        other.close()
+
+    def test_writes_during_flush_kept(self):
+        objs = BaseModel.create_many(2)
+        for obj in objs:
+            self.storage.new(obj)
+        self.storage.save()
+        objs[0].name = "v1"
+        codec = self.storage.codec
+
+        def encode(value):
+            objs[0].name = "v2"
+            objs[1].name = "w"
+            return codec.encode(value)
+        self.storage.codec = Codec('test', encode, codec.decode)
+        self.storage.save()
+        self.storage.codec = codec
+        self.assertEqual(self.storage.pending(), 2)
+        self.storage.save()
+        other = SQLiteStorage(self.path)
+        self.addCleanup(other.close)
+        self.assertEqual(other.get(BaseModel, objs[0].id).name, "v2")
+        self.assertEqual(other.get(BaseModel, objs[1].id).name, "w")
+        other.close()
+
+    def test_find(self):
+        class User(BaseModel):
+            """A user."""
+            __indexes__ = ('email',)
+        users = User.create_many(3, email="a@b.c", age=30)
+        for user in users:
+            self.storage.new(user)
+        self.storage.save()
+        users[1].email = "x@y.z"
+        self.assertEqual(list(self.storage.find(User, email="x@y.z")),
+                         ['User.' + users[1].id])
+        self.storage.save()
+        other = SQLiteStorage(self.path)
+        self.addCleanup(other.close)
+        self.assertEqual(list(other.find(User, email="x@y.z", age=30)),
+                         ['User.' + users[1].id])
+        self.assertEqual(len(other.find('User', email="a@b.c")), 2)
+        plan = other._conn.execute(
+            'EXPLAIN QUERY PLAN SELECT data FROM "User" '
+            "WHERE json_extract(data, '$.email') IS ?", ('x',)).fetchall()
+        self.assertIn('User__email', str(plan))
+        other.close()
+
+    def test_indexed_columns(self):
+        self.storage.new(BaseModel())
+        self.storage.save()
+        plan = self.storage._conn.execute(
+            'EXPLAIN QUERY PLAN SELECT data FROM "BaseModel" WHERE id = ?',
+            ('x',)).fetchall()
+        self.assertNotIn('SCAN', str(plan))
+        self.assertEqual(self.storage.count('Base; DROP TABLE x'), 0)
@@ -0,0 +1,83 @@
+#!/usr/bin/python3
+"""Unit tests for the models.engine.transaction module."""
+import os
+import shutil
+import tempfile
+import unittest
+
+from models.base_model import BaseModel
+from models.engine.log_storage import LogStorage
+from models.engine.sqlite_storage import SQLiteStorage
+
+
+class TestTransactional(unittest.TestCase):
+    """Tests for begin/commit/rollback on the storage engines."""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.engines = [
+            LogStorage(os.path.join(self.dir, 'file.log')),
+            SQLiteStorage(os.path.join(self.dir, 'file.db')),
+        ]
+
+    def tearDown(self):
+        for engine in self.engines:
+            engine.close()
+        shutil.rmtree(self.dir)
+
+    def test_commit_writes_once(self):
+        storage = self.engines[0]
+        base = BaseModel()
+        storage.begin()
+        storage.new(base)
+        for i in range(5):
+            base.number = i
+            storage.save()
+        self.assertFalse(os.path.exists(storage._path))
+        storage.commit()
+        with open(storage._path) as f:
+            self.assertEqual(len(f.readlines()), 1)
+        with self.assertRaises(RuntimeError):
+            storage.commit()
+
+    def test_rollback(self):
+        for storage in self.engines:
+            base = BaseModel()
+            storage.new(base)
+            storage.save()
+            storage.begin()
+            storage.new(BaseModel())
+            storage.delete(base)
+            storage.save()
+            storage.rollback()
+            self.assertFalse(storage.in_batch())
+            self.assertEqual(list(storage.all()), ['BaseModel.' + base.id])
+            with self.assertRaises(RuntimeError):
+                storage.rollback()
+
+    def test_rollback_after_compaction(self):
+        storage = self.engines[0]
+        a = BaseModel(name="saved")
+        storage.new(a)
+        storage.save()
+        storage.begin()
+        b = BaseModel()
+        storage.new(b)
+        a.name = "uncommitted"
+        storage.compact()
+        storage.rollback()
+        self.assertIsNone(storage.get(BaseModel, b.id))
+        self.assertEqual(storage.get(BaseModel, a.id).name, "saved")
+
+    def test_batch_context(self):
+        for storage in self.engines:
+            with storage.batch():
+                with storage.batch():
+                    storage.new(BaseModel())
+                self.assertTrue(storage.in_batch())
+            self.assertEqual(storage.count(), 1)
+            with self.assertRaises(ValueError):
+                with storage.batch():
+                    storage.new(BaseModel())
+                    raise ValueError
+            self.assertEqual(storage.count(), 1)
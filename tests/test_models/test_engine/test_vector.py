@@ -0,0 +1,83 @@
+#!/usr/bin/python3
+"""Unit tests for the models.engine.vector module."""
+import operator
+import unittest
+
+from models.base_model import BaseModel
+from models.engine.vector import ColumnCache, numpy
+
+
+OPS = {'==': operator.eq, '!=': operator.ne, '<': operator.lt,
+       '>': operator.gt, 'in': lambda value, options: value in options}
+
+
+def check(obj, condition):
+    attr, op, value = condition
+    try:
+        return attr in obj.__dict__ and OPS[op](getattr(obj, attr), value)
+    except TypeError:
+        return False
+
+
+@unittest.skipIf(numpy is None, "NumPy is not installed")
+class TestColumnCache(unittest.TestCase):
+    """Tests for the NumPy columns of a class."""
+
+    def setUp(self):
+        self.objects = {}
+        for i, price in enumerate([10, 2.5, 'n/a', None, 1 << 60, 7]):
+            self.objects[str(i)] = BaseModel(price=price)
+        self.objects['6'] = BaseModel()
+        self.cache = ColumnCache(self.objects)
+
+    def keys(self, *conditions):
+        rows, rest = self.cache.filter(list(conditions), check)
+        return self.cache.keys_of(rows)
+
+    def test_filter(self):
+        self.assertEqual(self.keys(('price', '>', 5)), ['0', '4', '5'])
+        self.assertEqual(self.keys(('price', '!=', 7)),
+                         ['0', '1', '2', '3', '4'])
+        self.assertEqual(self.keys(('price', 'in', (2.5, 7))), ['1', '5'])
+        self.assertIsNone(self.cache.filter([('price', '==', 1 << 60)],
+                                            check))
+        rows, rest = self.cache.filter([('price', '>', 5),
+                                        ('price', '<', 'z')], check)
+        self.assertEqual(rest, [('price', '<', 'z')])
+        self.assertIsNone(self.cache.filter([('price', 'in', 'ab')], check))
+
+    def test_aggregate(self):
+        rows, _ = self.cache.filter([('price', '<', 100)], check)
+        self.assertEqual(self.cache.aggregate('price', 'sum', rows), 19.5)
+        rows, _ = self.cache.filter([('price', '>', 5),
+                                     ('price', '<', 100)], check)
+        self.assertEqual(self.cache.aggregate('price', 'sum', rows), 17)
+        self.assertIsInstance(self.cache.aggregate('price', 'max', rows),
+                              int)
+        self.assertEqual(self.cache.aggregate('price', 'mean', rows), 8.5)
+        self.assertIs(self.cache.aggregate('price', 'sum'), NotImplemented)
+        self.assertIsNone(self.cache.aggregate('rooms', 'min'))
+        self.objects['1'].price = float('nan')
+        self.cache.touch(['1'])
+        rows, _ = self.cache.filter([('price', '!=', 7)], check)
+        self.assertEqual(self.cache.keys_of(rows), ['0', '1', '2', '3', '4'])
+        rows = numpy.isin(numpy.arange(7), [0, 1])
+        self.assertIs(self.cache.aggregate('price', 'min', rows),
+                      NotImplemented)
+
+    def test_touch_and_invalidate(self):
+        self.assertEqual(self.keys(('price', '<', 8)), ['1', '5'])
+        self.objects['5'].price = 9
+        self.objects['0'].price = 3
+        self.assertEqual(self.keys(('price', '<', 8)), ['1', '5'])
+        self.cache.touch(['0', '5'])
+        self.assertEqual(self.keys(('price', '<', 8)), ['0', '1'])
+        self.objects['7'] = BaseModel(price=2)
+        self.assertEqual(self.keys(('price', '<', 8)), ['0', '1', '7'])
+        self.objects['8'] = self.objects.pop('1')
+        self.cache.invalidate()
+        self.assertEqual(self.keys(('price', '<', 8)), ['0', '7', '8'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+#!/usr/bin/python3
+"""Unit tests for the models.engine.write_behind module."""
+import os
+import shutil
+import signal
+import tempfile
+import time
+import unittest
+
+from models.base_model import BaseModel
+from models.engine.log_storage import LogStorage
+from models.engine.write_behind import WriteBehind
+
+
+class TestWriteBehind(unittest.TestCase):
+    """Tests for the background flusher."""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'file.log')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def records(self):
+        try:
+            with open(self.path) as f:
+                return len(f.readlines())
+        except FileNotFoundError:
+            return 0
+
+    def wait_for(self, records):
+        deadline = time.monotonic() + 5
+        while self.records() < records and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return self.records()
+
+    def test_save_is_deferred_until_close(self):
+        storage = WriteBehind(LogStorage(self.path), interval=60,
+                              handle_signals=False)
+        self.addCleanup(storage.storage.close)
+        storage.new(BaseModel())
+        storage.save()
+        self.assertEqual(self.records(), 0)
+        self.assertEqual(storage.count(), 1)
+        storage.close()
+        self.assertEqual(self.records(), 1)
+
+    def test_threshold_and_interval(self):
+        storage = WriteBehind(LogStorage(self.path), interval=60,
+                              threshold=3, handle_signals=False)
+        self.addCleanup(storage.storage.close)
+        for obj in BaseModel.create_many(3):
+            storage.new(obj)
+        storage.save()
+        self.assertEqual(self.wait_for(3), 3)
+        storage.close()
+
+        storage = WriteBehind(LogStorage(self.path), interval=0.05,
+                              handle_signals=False)
+        self.addCleanup(storage.storage.close)
+        storage.new(BaseModel())
+        self.assertEqual(self.wait_for(4), 4)
+        storage.close()
+
+    def test_signal_flushes(self):
+        received = []
+        previous = signal.signal(signal.SIGTERM,
+                                 lambda *args: received.append(args[0]))
+        try:
+            storage = WriteBehind(LogStorage(self.path), interval=60)
+            self.addCleanup(storage.storage.close)
+            storage.new(BaseModel())
+            os.kill(os.getpid(), signal.SIGTERM)
+            self.assertEqual(self.records(), 1)
+            self.assertEqual(received, [signal.SIGTERM])
+        finally:
+            signal.signal(signal.SIGTERM, previous)
+
+    def test_signal_during_save(self):
+        received = []
+        previous = signal.getsignal(signal.SIGTERM)
+        storage = WriteBehind(LogStorage(self.path), interval=60,
+                              handle_signals=False)
+        self.addCleanup(storage.storage.close)
+        storage._signals[signal.SIGTERM] = \
+            lambda *args: received.append(args[0])
+        storage.new(BaseModel())
+        try:
+            with storage._wake:
+                storage._on_signal(signal.SIGTERM, None)
+        finally:
+            signal.signal(signal.SIGTERM, previous)
+        self.assertEqual(self.records(), 1)
+        self.assertEqual(received, [signal.SIGTERM])
+        self.assertTrue(storage._stopped)
+
+    def test_signal_during_batch_sync(self):
+        received = []
+        previous = signal.getsignal(signal.SIGTERM)
+        log = LogStorage(self.path, durability='batch')
+        self.addCleanup(log.close)
+        storage = WriteBehind(log, interval=60, handle_signals=False)
+        storage._signals[signal.SIGTERM] = \
+            lambda *args: received.append(args[0])
+        storage.new(BaseModel())
+        try:
+            with log._synced:
+                storage._on_signal(signal.SIGTERM, None)
+            self.assertEqual(self.records(), 1)
+            # Interrupting the save running the fsync of a batch.
+            storage.new(BaseModel())
+            log._in_sync.active = True
+            log._syncing = True
+            try:
+                storage._finish()
+            finally:
+                log._in_sync.active = False
+                log._syncing = False
+        finally:
+            signal.signal(signal.SIGTERM, previous)
+        self.assertEqual(self.records(), 2)
+        self.assertEqual(received, [signal.SIGTERM])